@@ -1,21 +1,47 @@
 import sys
 import os
+import time
+import argparse
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from object_file import WORD_TYPE, write_object
+import stats
 
 
 op_codes = {
     "craft": "000000",     # add
     "mine": "000000",      # sub
-    "elytra": "000000",    # div
+    "elytra": "000000",    # div (three registers); with an address it is a load, see memory_op_codes
     "flint": "000010",     # addi
-    "steel": "000011",     # beq
+    "steel": "000011",     # bge
     "enderman": "000100",  # li
     "TheNether": "000101", # la
     "DiamondPickAxe": "000000", # mfhi
+    "GoldenPickAxe": "000000", # mflo
+    "Anvil": "000000",     # mult (three registers, like elytra for div)
+    "Piston": "000000",    # sll
+    "StickyPiston": "000000", # srl
+    "Observer": "000000",  # sra
+    "Comparator": "000000", # and
+    "Repeater": "001100",  # andi (zero-extended immediate)
     "CraftingTable": "000110", # j
+    "Teleport": "000000",  # move
+    "pickaxe": "001000",   # sw
+    "emerald": "001001",   # bne
+    "lapis": "001010",     # beq
+    "obsidian": "001011",  # blt
     "RedStone": "111000",  # newline / syscall
     "BedWars": "111001",
     "Steve": "111010",
-    "HappyGhast": "111011"
+    "HappyGhast": "111011",
+    "Bedrock": "111100"    # syscall: $v0 = 1 print int, 4 print string, 10 exit
+}
+
+# Load/store forms that take a register and an absolute address
+memory_op_codes = {
+    "elytra": "000111",    # lw
+    "pickaxe": "001000",   # sw
 }
 
 func_codes = {
@@ -23,11 +49,40 @@ func_codes = {
     "mine": "100010",
     "elytra": "011010",     # MIPS-style div
     "DiamondPickAxe": "010000",  # MIPS mfhi
-    "BedWars": "101001"
+    "GoldenPickAxe": "010010",   # MIPS mflo
+    "Anvil": "011000",           # MIPS mult
+    "Piston": "000000",          # MIPS sll
+    "StickyPiston": "000010",    # MIPS srl
+    "Observer": "000011",        # MIPS sra
+    "Comparator": "100100",      # MIPS and
+    "BedWars": "101001",
+    "Teleport": "100001"
+}
+
+# Spellings the compiler emits for the instructions above
+aliases = {
+    "craftingTable": "CraftingTable",
+    "diamondpickaxe": "DiamondPickAxe",
+    "goldenpickaxe": "GoldenPickAxe",
+    "piston": "Piston",
+    "stickypiston": "StickyPiston",
+    "observer": "Observer",
+    "comparator": "Comparator",
+    "repeater": "Repeater",
+    "endermen": "enderman",
+    "syscall": "Bedrock",
 }
 
 registers = {
     "$zero": "00000",
+    "$at": "00001",
+    "$v0": "00010",
+    "$v1": "00011",
+    "$a0": "00100",
+    "$a1": "00101",
+    "$a2": "00110",
+    "$a3": "00111",
+    "$t0": "01000",
     "$t1": "01001",
     "$t2": "01010",
     "$t3": "01011",
@@ -43,94 +98,415 @@ registers = {
     "$s5": "10101",
     "$s6": "10110",
     "$s7": "10111",
+    "$t8": "11000",
+    "$t9": "11001",
+    "$k0": "11010",
+    "$k1": "11011",
+    "$gp": "11100",
+    "$sp": "11101",
+    "$fp": "11110",
+    "$ra": "11111",
 }
 shift_logic_amount = "00000"
 
+# Integer views of the tables above: instruction words are built with shifts
+OPCODE_BITS = {name: int(bits, 2) for name, bits in op_codes.items()}
+MEMORY_OPCODE_BITS = {name: int(bits, 2) for name, bits in memory_op_codes.items()}
+FUNCT_BITS = {name: int(bits, 2) for name, bits in func_codes.items()}
+REGISTER_NUMBERS = {name: int(bits, 2) for name, bits in registers.items()}
+
+BRANCHES = {"steel", "emerald", "lapis", "obsidian"}
+
+# Shifts take rd, rt and a constant shift amount
+SHIFTS = {"Piston", "StickyPiston", "Observer"}
+
+# Segment layout: code starts at address 0 and the .data segment at
+# DATA_BASE, above the variables the compiler places from address 5000.
+TEXT_BASE = 0
+DATA_BASE = 0x8000
+# la and load/store take a 16-bit address, so data must lie below this
+ADDRESS_LIMIT = 0x10000
+
+# Values each field can hold: the 16-bit immediate is sign-extended for
+# addi, li and branch offsets and zero-extended for andi, la and addresses
+SIGNED_IMMEDIATE = range(-0x8000, 0x8000)
+UNSIGNED_IMMEDIATE = range(ADDRESS_LIMIT)
+JUMP_TARGETS = range(0x4000000)
+
+# Byte order of .word values in the data image (little-endian, as SPIM on x86)
+DATA_BYTEORDER = "little"
+
+ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "0": "\0", "\\": "\\", '"': '"'}
+
+
+def interpret_line(mips_file: str, output_format="binary", byteorder="big",
+                   output_file="program1.bin", jobs=1, chunk_lines=None):
+    with open(mips_file, "r", encoding="utf-8") as input_file:
+        if jobs == 1:
+            program = assemble_program(input_file)
+        else:
+            program = assemble_parallel(input_file, jobs, chunk_lines)
+    with stats.phase("assemble.write"):
+        if output_format == "text":
+            with open(output_file, "w") as output:
+                write_text(program, output)
+        else:
+            with open(output_file, "wb") as output:
+                write_object(output, program.text, program.data, program.symbols,
+                             TEXT_BASE, DATA_BASE, byteorder)
+    if stats.is_enabled():
+        stats.count("output.bytes_written", os.path.getsize(output_file))
+    return program
+
+
+def write_text(program, output_file):
+    """Write one 32-character '0'/'1' line per instruction word."""
+    output_file.writelines(format(word, "032b") + "\n" for word in program.text)
+
+
+class AssembledProgram:
+    """Result of assembling a whole file: encoded .text words, .data bytes and symbols."""
+
+    def __init__(self, text, data, symbols):
+        self.text = text          # array of 32-bit instruction words
+        self.data = data          # bytearray laid out from DATA_BASE
+        self.symbols = symbols    # label -> absolute address
+
+
+def strip_comment(line):
+    """Remove a trailing # comment, ignoring # characters inside string literals."""
+    if "#" not in line:
+        return line.strip()
+    if '"' not in line:
+        return line.split("#")[0].strip()
+    in_string = False
+    escaped = False
+    for i, char in enumerate(line):
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = in_string
+        elif char == '"':
+            in_string = not in_string
+        elif char == "#" and not in_string:
+            return line[:i].strip()
+    return line.strip()
+
+
+def parse_string_literal(text):
+    text = text.strip()
+    if len(text) < 2 or text[0] != '"' or text[-1] != '"':
+        raise ValueError(f"Expected a string literal, got {text}")
+    chars = []
+    i = 1
+    while i < len(text) - 1:
+        char = text[i]
+        if char == "\\" and i + 1 < len(text) - 1:
+            i += 1
+            chars.append(ESCAPES.get(text[i], text[i]))
+        else:
+            chars.append(char)
+        i += 1
+    return "".join(chars).encode("utf-8")
+
+
+def split_label(line):
+    """Split 'name: rest' into (name, rest); name is None when there is no label."""
+    head, sep, rest = line.partition(":")
+    if sep and head and " " not in head.strip() and '"' not in head:
+        return head.strip(), rest.strip()
+    return None, line
+
+
+def first_pass(lines):
+    """Lay out both segments and collect the symbol table.
+
+    Returns (instructions, data, symbols) where instructions is a list of
+    (address, source line, line number) for every .text instruction.
+    """
+    symbols = {}
+    instructions = []
+    data = bytearray()
+    word_fixups = []
+    segment = "text"
+    pc = TEXT_BASE
+    line_no = 0
+
+    for line_no, raw in enumerate(lines, 1):
+        line = strip_comment(raw)
+        while ":" in line:
+            label, rest = split_label(line)
+            if label is None:
+                break
+            symbols[label] = pc if segment == "text" else DATA_BASE + len(data)
+            line = rest
+        if not line:
+            continue
+
+        if line.startswith("."):
+            directive, _, args = line.partition(" ")
+            args = args.strip()
+            if directive == ".text":
+                segment = "text"
+            elif directive == ".data":
+                segment = "data"
+            elif directive in (".globl", ".global"):
+                pass
+            elif directive == ".asciiz":
+                data += parse_string_literal(args) + b"\0"
+            elif directive == ".ascii":
+                data += parse_string_literal(args)
+            elif directive == ".space":
+                data += bytes(int(args, 0))
+            elif directive == ".align":
+                alignment = 1 << int(args, 0)
+                data += bytes(-len(data) % alignment)
+            elif directive == ".word":
+                for value in args.split(","):
+                    word_fixups.append((len(data), value.strip(), line_no))
+                    data += bytes(4)
+            else:
+                print(f"Unknown directive: {directive} (line {line_no})")
+            continue
+
+        if segment != "text":
+            print(f"Instruction outside .text ignored: {line} (line {line_no})")
+            continue
+        instructions.append((pc, line, line_no))
+        pc += 4
+
+    for offset, value, line_no in word_fixups:
+        number = resolve_value(value, symbols, line_no) & 0xFFFFFFFF
+        data[offset:offset + 4] = number.to_bytes(4, DATA_BYTEORDER)
 
-def interpret_line(mips_file: str):
-    input_file = open(mips_file, "r", encoding="utf-8")
-    output_file = open("program1.bin", "w")
-    for instruction in input_file:
-        bin = assemble(instruction)
-        output_file.write(bin + "\n")
+    if stats.is_enabled():
+        stats.count("assembler.lines", line_no)
+        stats.count("assembler.instructions", len(instructions))
+        stats.count("assembler.symbols", len(symbols))
+        stats.count("assembler.data_bytes", len(data))
+    return instructions, data, symbols
 
 
-def assemble(line):
-    line = line.split("#")[0].strip()
+def resolve_value(operand, symbols, line_no=None):
+    """Numeric value of an immediate operand: a literal or a label's address."""
+    try:
+        return int(operand, 0)
+    except ValueError:
+        pass
+    if operand in symbols:
+        return symbols[operand]
+    where = f" (line {line_no})" if line_no is not None else ""
+    print(f"Undefined label: {operand}{where}")
+    return 0
+
+
+def assemble_program(lines):
+    """Two-pass assembly of an iterable of source lines.
+
+    The first pass assigns addresses and records every label in a dict so
+    the second pass resolves each reference with a single lookup: branch
+    targets become word offsets relative to the next instruction, jumps
+    and address operands become absolute addresses.
+    """
+    with stats.phase("assemble.first-pass"):
+        instructions, data, symbols = first_pass(lines)
+    with stats.phase("assemble.encode"):
+        text = array(WORD_TYPE)
+        for pc, line, line_no in instructions:
+            word = encode(line, symbols, pc, line_no)
+            text.append(word if word is not None else 0)
+    return AssembledProgram(text, data, symbols)
+
+
+# Instructions per task when encoding in a process pool
+CHUNK_LINES = 50000
+
+# Symbol table of a pool worker, set once by init_encode_worker
+_symbols = {}
+
+
+def init_encode_worker(symbols):
+    global _symbols
+    _symbols = symbols
+
+
+def encode_chunk(start_pc, lines, line_numbers):
+    """Encode consecutive .text instructions starting at start_pc."""
+    text = array(WORD_TYPE)
+    pc = start_pc
+    for line, line_no in zip(lines, line_numbers):
+        word = encode(line, _symbols, pc, line_no)
+        text.append(word if word is not None else 0)
+        pc += 4
+    return text
+
+
+def assemble_parallel(lines, jobs=None, chunk_lines=None):
+    """Two-pass assembly with the encoding pass spread over a process pool.
+
+    The serial first pass lays out the segments and collects every label,
+    then the instruction list is cut into chunks that workers encode
+    against that symbol table (shipped once per worker); the chunks are
+    concatenated back in order.
+    """
+    with stats.phase("assemble.first-pass"):
+        instructions, data, symbols = first_pass(lines)
+    chunk_lines = chunk_lines or CHUNK_LINES
+    text = array(WORD_TYPE)
+    with stats.phase("assemble.encode"), ProcessPoolExecutor(max_workers=jobs, initializer=init_encode_worker,
+                             initargs=(symbols,)) as pool:
+        futures = []
+        for i in range(0, len(instructions), chunk_lines):
+            chunk = instructions[i:i + chunk_lines]
+            futures.append(pool.submit(encode_chunk, chunk[0][0],
+                                       [line for _, line, _ in chunk], [line_no for _, _, line_no in chunk]))
+        for future in futures:
+            text.extend(future.result())
+    return AssembledProgram(text, data, symbols)
+
+
+def check_range(value, allowed, what, line_no=None):
+    """Return value, or raise ValueError when its field cannot hold it."""
+    if value not in allowed:
+        where = f" (line {line_no})" if line_no is not None else ""
+        raise ValueError(f"{what} out of range: {value}{where}")
+    return value
+
+
+def r_type(op, rs, rt, rd, funct, shamt=0):
+    return (op << 26) | (rs << 21) | (rt << 16) | (rd << 11) | (shamt << 6) | funct
+
+
+def i_type(op, rs, rt, imm):
+    return (op << 26) | (rs << 21) | (rt << 16) | (imm & 0xFFFF)
+
+
+def j_type(op, address):
+    return (op << 26) | (address & 0x3FFFFFF)
+
+
+def branch_offset(target, symbols, pc, line_no):
+    """Encode a branch target: labels become word offsets from pc + 4, numbers are used as is."""
+    try:
+        return int(target, 0)
+    except ValueError:
+        pass
+    if target not in symbols:
+        print(f"Undefined label: {target} (line {line_no})")
+        return 0
+    return (symbols[target] - (pc + 4)) >> 2
+
+
+def assemble(line, symbols=None, pc=0, line_no=None):
+    """Encode one line as a 32-character bit string ("" for blank or unknown lines)."""
+    word = encode(line, symbols, pc, line_no)
+    return "" if word is None else format(word, "032b")
+
+
+def encode(line, symbols=None, pc=0, line_no=None):
+    """Encode one line as an integer instruction word, or None for blank or unknown lines."""
+    line = strip_comment(line)
     if not line:
-        return ""
+        return None
+    if symbols is None:
+        symbols = {}
+
+    parts = line.replace(",", " ").split()
+
+    op_code = aliases.get(parts[0], parts[0])
 
-    parts = [p.strip(",") for p in line.split()]
+    # div / mult rs, rt are elytra / Anvil with no destination register
+    if op_code == "div":
+        parts = ["elytra", "$zero"] + parts[1:]
+        op_code = "elytra"
+    elif op_code == "mult":
+        parts = ["Anvil", "$zero"] + parts[1:]
+        op_code = "Anvil"
 
-    op_code = parts[0]
+    # Memory instructions: elytra (load) / pickaxe (store) rt, address
+    if op_code in MEMORY_OPCODE_BITS and len(parts) == 3:
+        address = check_range(resolve_value(parts[2], symbols, line_no), UNSIGNED_IMMEDIATE, "Address", line_no)
+        return i_type(MEMORY_OPCODE_BITS[op_code], 0, REGISTER_NUMBERS[parts[1]], address)
 
     # Handle R-type instructions with funct codes
-    if op_code in ["craft", "mine", "elytra", "DiamondPickAxe", "BedWars"]:
-        if op_code == "DiamondPickAxe":
-            rd = parts[1]
-            return (
-                op_codes[op_code]
-                + "00000"  # rs
-                + "00000"  # rt
-                + registers[rd]
-                + shift_logic_amount
-                + func_codes[op_code]
-            )
-        elif op_code == "BedWars":
-            rd, rs = parts[1].replace(",", ""), parts[2]
-            return (
-                op_codes[op_code]
-                + registers[rs]
-                + "00000"
-                + registers[rd]
-                + shift_logic_amount
-                + func_codes[op_code]
-            )
+    if op_code in FUNCT_BITS:
+        if op_code in ("DiamondPickAxe", "GoldenPickAxe"):
+            rd = REGISTER_NUMBERS[parts[1]]
+            return r_type(OPCODE_BITS[op_code], 0, 0, rd, FUNCT_BITS[op_code])
+        elif op_code in SHIFTS:
+            rd, rt = REGISTER_NUMBERS[parts[1]], REGISTER_NUMBERS[parts[2]]
+            shamt = resolve_value(parts[3], symbols, line_no) & 31
+            return r_type(OPCODE_BITS[op_code], 0, rt, rd, FUNCT_BITS[op_code], shamt)
+        elif op_code in ("BedWars", "Teleport"):
+            rd, rs = REGISTER_NUMBERS[parts[1]], REGISTER_NUMBERS[parts[2]]
+            return r_type(OPCODE_BITS[op_code], rs, 0, rd, FUNCT_BITS[op_code])
         else:
-            rd, rs, rt = (
-                parts[1].replace(",", ""),
-                parts[2].replace(",", ""),
-                parts[3].replace(",", ""),
-            )
-            return (
-                op_codes[op_code]
-                + registers[rs]
-                + registers[rt]
-                + registers[rd]
-                + shift_logic_amount
-                + func_codes[op_code]
-            )
+            rd, rs, rt = (REGISTER_NUMBERS[name] for name in parts[1:4])
+            return r_type(OPCODE_BITS[op_code], rs, rt, rd, FUNCT_BITS[op_code])
 
     # I-type instructions
-    elif op_code in ["flint", "steel", "enderman", "TheNether"]:
-        rt, rs, imm = (
-            parts[1].replace(",", ""),
-            parts[2].replace(",", ""),
-            parts[3]
-        )
-        imm_bin = bin(int(imm)).replace("0b", "").zfill(16)
-        return op_codes[op_code] + registers[rs] + registers[rt] + imm_bin
+    elif op_code in ["flint", "enderman", "TheNether", "Repeater"] or op_code in BRANCHES:
+        if len(parts) == 3:
+            # Two-operand forms (li / la rt, value) read no source register
+            rt, rs, imm = parts[1], "$zero", parts[2]
+        else:
+            rt, rs, imm = parts[1], parts[2], parts[3]
+        if op_code in BRANCHES:
+            value = check_range(branch_offset(imm, symbols, pc, line_no), SIGNED_IMMEDIATE,
+                                "Branch offset", line_no)
+        elif op_code in ("TheNether", "Repeater"):
+            value = check_range(resolve_value(imm, symbols, line_no), UNSIGNED_IMMEDIATE, "Immediate", line_no)
+        else:
+            value = check_range(resolve_value(imm, symbols, line_no), SIGNED_IMMEDIATE, "Immediate", line_no)
+        return i_type(OPCODE_BITS[op_code], REGISTER_NUMBERS[rs], REGISTER_NUMBERS[rt], value)
 
     # J-type instruction
     elif op_code == "CraftingTable":
-        address = int(parts[1], 0)
-        address_bin = bin(address).replace("0b", "").zfill(26)
-        return op_codes[op_code] + address_bin
+        address = check_range(resolve_value(parts[1], symbols, line_no), JUMP_TARGETS, "Jump target", line_no)
+        return j_type(OPCODE_BITS[op_code], address)
 
-    # S-type (no operand) instructions like Steve, RedStone, HappyGhast
-    elif op_code in ["Steve", "RedStone"]:
-        return op_codes[op_code] + "0" * 26
+    # S-type (no operand) instructions like Steve, RedStone, Bedrock
+    elif op_code in ["Steve", "RedStone", "Bedrock"]:
+        return OPCODE_BITS[op_code] << 26
 
     elif op_code == "HappyGhast":
-        rt = parts[1]
-        return op_codes[op_code] + "00000" + registers[rt] + "0" * 16
+        return i_type(OPCODE_BITS[op_code], 0, REGISTER_NUMBERS[parts[1]], 0)
 
     else:
         print(f"Unknown instruction: {op_code}")
-        return ""
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Assemble Minecraft MIPS source into machine code")
+    parser.add_argument("input_file", nargs="?", default="program1.mips")
+    parser.add_argument("output_file", nargs="?", default="program1.bin")
+    parser.add_argument("--format", choices=("binary", "text"), default="binary",
+                        help="packed object file (default) or one '0'/'1' line per word")
+    parser.add_argument("--byteorder", choices=("big", "little"), default="big",
+                        help="byte order of words in the packed format")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="encode in this many processes (0: one per CPU)")
+    parser.add_argument("--chunk-lines", type=int, default=CHUNK_LINES,
+                        help="instructions per parallel task (default: %(default)s)")
+    stats.add_arguments(parser)
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    # mips_file = sys.argv[1]
-    mips_file = "program1.mips"
-    interpret_line(mips_file)
+    args = parse_args()
+    stats.enable_from_args(args)
+    start = time.perf_counter()
+    try:
+        program = interpret_line(args.input_file, args.format, args.byteorder, args.output_file,
+                                 args.jobs or None, args.chunk_lines)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+    with open(args.input_file, "rb") as source:
+        lines = sum(block.count(b"\n") for block in iter(lambda: source.read(1 << 20), b""))
+    rate = lines / elapsed if elapsed > 0 else float("inf")
+    print(f"Assembled {lines} lines ({len(program.text)} instructions) into {args.output_file} "
+          f"in {elapsed:.2f}s ({rate:,.0f} lines/s)")
+    stats.publish_from_args(args)
@@ -0,0 +1,74 @@
+"""Measure how Compiler.compile scales with source size.
+
+Usage: python benchmarks/bench_compiler.py [max_lines]
+
+Generates programs of increasing size built from deeply nested while/if
+blocks and reports the compile time per source line for each size. With a
+linear-time front end the per-line cost stays flat as the program grows.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compiler3 import Compiler
+
+
+def generate_nested_program(target_lines, depth=8):
+    """Build a C-subset program of roughly target_lines lines of nested loops."""
+    lines = [f"int v{d};" for d in range(depth)]
+    lines.append("int total;")
+    while len(lines) < target_lines:
+        for d in range(depth):
+            indent = "    " * d
+            keyword = "while" if d % 2 == 0 else "if"
+            op = "<" if keyword == "while" else "=="
+            lines.append(f"{indent}{keyword} (v{d} {op} 10) {{")
+            lines.append(f"{indent}    total = total + v{d};")
+        for d in reversed(range(depth)):
+            indent = "    " * d
+            if d % 2 == 0:
+                lines.append(f"{indent}    v{d} = v{d} + 1;")
+            lines.append(f"{indent}}}")
+    lines.append("print_int(total);")
+    return "\n".join(lines) + "\n"
+
+
+def time_compile(source, repeat=3):
+    compiler = Compiler()
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compiler.compile(source)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    max_lines = int(sys.argv[1]) if len(sys.argv) >= 2 else 100_000
+    sizes = []
+    size = 1_000
+    while size <= max_lines:
+        sizes.append(size)
+        size *= 10
+    if sizes[-1] != max_lines:
+        sizes.append(max_lines)
+
+    print(f"{'lines':>10} {'seconds':>10} {'us/line':>10}")
+    per_line = []
+    for size in sizes:
+        source = generate_nested_program(size)
+        line_count = source.count("\n")
+        elapsed = time_compile(source, repeat=3 if size <= 10_000 else 1)
+        per_line.append(elapsed / line_count)
+        print(f"{line_count:>10} {elapsed:>10.3f} {elapsed / line_count * 1e6:>10.2f}")
+
+    growth = per_line[-1] / per_line[0]
+    print(f"per-line cost ratio (largest / smallest): {growth:.2f}x "
+          f"({'linear' if growth < 2 else 'super-linear'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Compare the integer table-driven decoder with the old bit-string decoder.
+
+Usage: python benchmarks/bench_disassembler.py [words]
+
+Decodes the same random instruction words with the previous per-character
+bin_to_mips (kept below as legacy_bin_to_mips), the per-word integer
+decoder and decode_words (numpy field extraction when numpy is installed),
+checks the three agree and reports words per second for each.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import disassembler
+from disassembler import (decode_word, decode_words, op_codes, func_codes, registers,
+                          two_register_ops, shift_ops, memory_ops, signed_immediate_ops)
+
+
+def legacy_bin_to_mips(line):
+    """The string-slicing decoder disassembler.bin_to_mips used before the integer tables."""
+    mips = []
+    bit_string = ""
+
+    for i in range(len(line)):
+        bit_string += line[i]
+        if len(bit_string) == 32:
+            op_code = bit_string[0:6]
+
+            if op_code == "000000":
+                rs = bit_string[6:11]
+                rt = bit_string[11:16]
+                rd = bit_string[16:21]
+                func_code = bit_string[26:32]
+                instr = func_codes.get(func_code, "UNKNOWN")
+                if instr in ("DiamondPickAxe", "GoldenPickAxe"):
+                    mips.append(f"{instr} {registers[rd]}")
+                elif instr in two_register_ops:
+                    mips.append(f"{instr} {registers[rd]}, {registers[rs]}")
+                elif instr in shift_ops:
+                    mips.append(f"{instr} {registers[rd]}, {registers[rt]}, {int(bit_string[21:26], 2)}")
+                else:
+                    mips.append(f"{instr} {registers[rd]}, {registers[rs]}, {registers[rt]}")
+            elif op_code == "111001":
+                mips.append(f"BedWars {registers[bit_string[16:21]]}, {registers[bit_string[6:11]]}")
+            elif op_code == "111011":
+                mips.append(f"HappyGhast {registers[bit_string[11:16]]}")
+            elif op_code == "111010":
+                mips.append("Steve")
+            elif op_code == "111000":
+                mips.append("RedStone")
+            elif op_code == "111100":
+                mips.append("Bedrock")
+            elif op_code == "000110":
+                mips.append(f"CraftingTable {int(bit_string[6:], 2)}")
+            else:
+                rs = bit_string[6:11]
+                rt = bit_string[11:16]
+                instr = op_codes.get(op_code, "UNKNOWN")
+                value = int(bit_string[16:32], 2)
+                if instr in signed_immediate_ops and value >= 0x8000:
+                    value -= 0x10000
+                if instr in memory_ops:
+                    mips.append(f"{instr} {registers[rt]}, {value}")
+                else:
+                    mips.append(f"{instr} {registers[rt]}, {registers[rs]}, {value}")
+
+            bit_string = ""
+
+    return mips
+
+
+def random_words(count, seed=1):
+    rng = random.Random(seed)
+    opcodes = [int(bits, 2) for bits in op_codes]
+    functs = [int(bits, 2) for bits in func_codes]
+    words = []
+    for _ in range(count):
+        op = rng.choice(opcodes)
+        word = (op << 26) | rng.getrandbits(26)
+        if op == 0:
+            word = (word & ~63) | rng.choice(functs)
+        words.append(word)
+    return words
+
+
+def best_of(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    words = random_words(count)
+    lines = [format(word, "032b") for word in words]
+
+    legacy_time, legacy = best_of(lambda: [text for line in lines for text in legacy_bin_to_mips(line)])
+    word_time, per_word = best_of(lambda: [decode_word(word) for word in words])
+    buffer_time, buffered = best_of(lambda: decode_words(words))
+
+    if not legacy == per_word == buffered:
+        print("Decoders disagree!")
+        return 1
+
+    backend = "numpy" if disassembler.numpy is not None else "pure Python"
+    print(f"{count} words")
+    print(f"{'legacy bit strings':>26} {legacy_time:8.3f}s {count / legacy_time:12,.0f} words/s")
+    print(f"{'decode_word':>26} {word_time:8.3f}s {count / word_time:12,.0f} words/s")
+    print(f"{'decode_words (' + backend + ')':>26} {buffer_time:8.3f}s {count / buffer_time:12,.0f} words/s")
+    print(f"speedup over legacy: {legacy_time / buffer_time:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
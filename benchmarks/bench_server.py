@@ -0,0 +1,121 @@
+"""Compare compile requests/sec through the CLI and through compile_server.py.
+
+Usage: python benchmarks/bench_server.py [requests] [lines] [-j JOBS] [--clients N]
+
+Writes `requests` small generated programs of about `lines` lines each,
+then compiles them four ways:
+
+    cli            one `python compiler3.py` process per file
+    client         one `python compile_client.py` process per file
+    connection     a single in-process connection, one request at a time
+    concurrent     N in-process connections sharing the requests
+
+The first two include interpreter startup on every request, as a build
+script calling the tools would see it; the difference between them is the
+import and warm-up cost the server saves.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from compile_client import Client
+from bench_compiler import generate_nested_program
+
+
+def run_processes(commands):
+    for command in commands:
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+
+
+def run_connection(socket_path, jobs):
+    with Client(socket_path) as client:
+        for input_file, output_file in jobs:
+            response = client.request("compile", input_file=input_file, output_file=output_file)
+            if not response["ok"]:
+                raise RuntimeError(response["error"])
+
+
+def run_concurrent(socket_path, jobs, clients):
+    threads = [threading.Thread(target=run_connection, args=(socket_path, jobs[i::clients]))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def wait_for_server(socket_path, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with Client(socket_path) as client:
+                return client.request("ping")
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"server did not start on {socket_path}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare compile requests/sec via the CLI and the server")
+    parser.add_argument("requests", nargs="?", type=int, default=40)
+    parser.add_argument("lines", nargs="?", type=int, default=50)
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="server worker processes")
+    parser.add_argument("--clients", type=int, default=4, help="connections in the concurrent case")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as workdir:
+        jobs = []
+        for i in range(args.requests):
+            input_file = os.path.join(workdir, f"p{i}.c")
+            with open(input_file, "w") as f:
+                f.write(generate_nested_program(args.lines, depth=2 + i % 4))
+            jobs.append((input_file, os.path.join(workdir, f"p{i}.asm")))
+
+        socket_path = os.path.join(workdir, "server.sock")
+        command = [sys.executable, os.path.join(ROOT, "compile_server.py"), "--socket", socket_path]
+        if args.jobs:
+            command += ["-j", str(args.jobs)]
+        server = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+        try:
+            info = wait_for_server(socket_path)
+            cases = [
+                ("cli", lambda: run_processes(
+                    [sys.executable, os.path.join(ROOT, "compiler3.py"), input_file, output_file]
+                    for input_file, output_file in jobs)),
+                ("client", lambda: run_processes(
+                    [sys.executable, os.path.join(ROOT, "compile_client.py"), "--socket", socket_path,
+                     "compile", input_file, output_file]
+                    for input_file, output_file in jobs)),
+                ("connection", lambda: run_connection(socket_path, jobs)),
+                (f"concurrent x{args.clients}", lambda: run_concurrent(socket_path, jobs, args.clients)),
+            ]
+            print(f"{args.requests} requests of ~{args.lines} lines, server with {info['jobs']} worker(s)")
+            print(f"{'mode':<16} {'seconds':>10} {'req/s':>10} {'speedup':>10}")
+            baseline = None
+            for name, run in cases:
+                start = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - start
+                baseline = baseline or elapsed
+                print(f"{name:<16} {elapsed:>10.3f} {args.requests / elapsed:>10.1f} {baseline / elapsed:>9.1f}x")
+        finally:
+            try:
+                with Client(socket_path) as client:
+                    client.request("shutdown")
+            except OSError:
+                server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""Benchmark suite for the compiler, assembler and disassembler.
+
+Usage: python benchmarks/suite.py [--scale quick|full] [--output results.json]
+                                  [--baseline baseline.json] [--save-baseline]
+                                  [--threshold 0.25]
+
+Every case generates a synthetic workload at several sizes, times the tool
+on it (best of a few runs) and records seconds and cost per unit (source
+line, instruction or word) in a JSON results file. With --baseline, each
+case is compared against the stored numbers and flagged when its per-unit
+cost grew by more than the threshold; the exit status is 1 when anything
+regressed. --save-baseline writes the current results as the new baseline.
+Baselines are machine specific, so keep them next to the machine that made them.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compiler3 import Compiler
+import assembler
+import disassembler
+from bench_compiler import generate_nested_program
+
+
+# Results and baselines go outside the source tree unless --output / --baseline say otherwise
+DEFAULT_OUTPUT = os.path.join(tempfile.gettempdir(), "compiler3-benchmark-results.json")
+DEFAULT_BASELINE = os.path.join(tempfile.gettempdir(), "compiler3-benchmark-baseline.json")
+
+SCALES = {
+    "quick": {"compile": [1_000, 5_000], "variables": [200, 1_000], "strings": [100, 500],
+              "mips": [20_000, 100_000], "bin": [20_000, 100_000]},
+    "full": {"compile": [1_000, 10_000, 50_000], "variables": [1_000, 5_000], "strings": [500, 5_000],
+             "mips": [100_000, 1_000_000], "bin": [100_000, 1_000_000]},
+}
+
+
+# ---------------------------------------------------------------------------
+# Workload generators
+# ---------------------------------------------------------------------------
+
+def generate_many_variables(count):
+    """A program declaring count variables and chaining additions through all of them."""
+    lines = [f"int v{i} = {i % 100};" for i in range(count)]
+    lines += [f"v{i} = v{i} + v{i - 1};" for i in range(1, count)]
+    lines += [f"print_int(v{i});" for i in range(0, count, max(1, count // 20))]
+    return "\n".join(lines) + "\n"
+
+
+def generate_long_strings(count, length=200, distinct=100, seed=7):
+    """count print_str calls on long literals, some with escapes.
+
+    At most `distinct` literals are new text; the rest repeat one of them or
+    print a suffix of one, so the merged pool stays near distinct * length
+    bytes and fits the .data addresses la can reach at any count.
+    """
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyz ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+    roots = []
+    literals = []
+    for i in range(count):
+        if not roots or (len(roots) < distinct and i % 4 != 0):
+            text = "".join(rng.choice(alphabet) for _ in range(length))
+            roots.append((text, "\\n" if i % 3 == 0 else ""))
+            literals.append("".join(roots[-1]))
+        elif i % 2 == 0:
+            literals.append(rng.choice(literals))
+        else:
+            text, escape = rng.choice(roots)
+            literals.append(text[rng.randrange(length):] + escape)
+    return "\n".join(f'print_str("{text}");' for text in literals) + "\n"
+
+
+def generate_mips(instruction_count, seed=11):
+    """Assembly mixing every instruction form, with a label every few instructions.
+
+    Branches target labels within a few thousand instructions, which their
+    16-bit offsets reach; jumps go anywhere.
+    """
+    rng = random.Random(seed)
+    regs = [f"$t{i}" for i in range(8)] + [f"$s{i}" for i in range(8)]
+    labels = max(1, instruction_count // 8)
+    lines = [".data", 'msg: .asciiz "benchmark\\n"', ".text", ".globl main", "main:"]
+    for i in range(instruction_count):
+        if i % 8 == 0:
+            lines.append(f"L{i // 8}:")
+        r1, r2, r3 = rng.choice(regs), rng.choice(regs), rng.choice(regs)
+        target = f"L{rng.randrange(labels)}"
+        near = f"L{rng.randrange(max(0, i // 8 - 1000), min(labels, i // 8 + 1000))}"
+        kind = i % 10
+        if kind == 0:
+            lines.append(f"    craft {r1}, {r2}, {r3}")
+        elif kind == 1:
+            lines.append(f"    flint {r1}, {r2}, {rng.randint(-100, 100)}")
+        elif kind == 2:
+            lines.append(f"    enderman {r1}, {rng.randint(0, 30000)}")
+        elif kind == 3:
+            lines.append(f"    elytra {r1}, {5000 + 4 * rng.randrange(100)}")
+        elif kind == 4:
+            lines.append(f"    pickaxe {r1}, {5000 + 4 * rng.randrange(100)}")
+        elif kind == 5:
+            lines.append(f"    steel {r1}, {r2}, {near}  # loop test")
+        elif kind == 6:
+            lines.append(f"    Teleport {r1}, {r2}")
+        elif kind == 7:
+            lines.append(f"    craftingTable {target}")
+        elif kind == 8:
+            lines.append(f"    div {r1}, {r2}")
+        else:
+            lines.append("    TheNether $a0, msg")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# Timing
+# ---------------------------------------------------------------------------
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def repeats_for(units):
+    return 3 if units <= 100_000 else 1
+
+
+def compile_case(name, generator, sizes):
+    results = []
+    compiler = Compiler()
+    for size in sizes:
+        source = generator(size)
+        units = source.count("\n")
+        elapsed = best_of(lambda: compiler.compile(source), repeats_for(units * 10))
+        results.append((f"{name}/{size}", units, "line", elapsed))
+    return results
+
+
+def assembler_cases(sizes, workdir):
+    results = []
+    for size in sizes:
+        source = generate_mips(size)
+        lines = source.splitlines()
+        path = os.path.join(workdir, f"bench_{size}.mips")
+        with open(path, "w") as f:
+            f.write(source)
+        repeat = repeats_for(size)
+        instructions, _, symbols = assembler.first_pass(lines)
+        sample = instructions[:10_000]
+        elapsed = best_of(lambda: [assembler.assemble(line, symbols, pc, line_no)
+                                   for pc, line, line_no in sample], repeat)
+        results.append((f"assembler.assemble/{size}", len(sample), "line", elapsed))
+        elapsed = best_of(lambda: assembler.interpret_line(path, "binary", "big",
+                                                          os.path.join(workdir, "out.bin")), repeat)
+        results.append((f"assembler.interpret_line/{size}", len(lines), "line", elapsed))
+    return results
+
+
+def disassembler_cases(sizes, workdir):
+    results = []
+    for size in sizes:
+        path = os.path.join(workdir, f"bench_{size}.mips")
+        if not os.path.exists(path):
+            with open(path, "w") as f:
+                f.write(generate_mips(size))
+        packed = os.path.join(workdir, f"bench_{size}.bin")
+        text = os.path.join(workdir, f"bench_{size}.txt")
+        program = assembler.interpret_line(path, "binary", "big", packed)
+        assembler.interpret_line(path, "text", "big", text)
+        words = len(program.text)
+        sample = [format(word, "032b") for word in program.text[:10_000]]
+        repeat = repeats_for(words)
+        output = os.path.join(workdir, "out.txt")
+
+        elapsed = best_of(lambda: [disassembler.bin_to_mips(line) for line in sample], repeat)
+        results.append((f"disassembler.bin_to_mips/{size}", len(sample), "word", elapsed))
+        elapsed = best_of(lambda: disassembler.stream_disassemble(packed, output), repeat)
+        results.append((f"disassembler.handle_lines.packed/{size}", words, "word", elapsed))
+        elapsed = best_of(lambda: disassembler.stream_disassemble(text, output), repeat)
+        results.append((f"disassembler.handle_lines.text/{size}", words, "word", elapsed))
+    return results
+
+
+def run_suite(scale):
+    sizes = SCALES[scale]
+    cases = []
+    cases += compile_case("compile.nested", generate_nested_program, sizes["compile"])
+    cases += compile_case("compile.variables", generate_many_variables, sizes["variables"])
+    cases += compile_case("compile.strings", generate_long_strings, sizes["strings"])
+    with tempfile.TemporaryDirectory() as workdir:
+        cases += assembler_cases(sizes["mips"], workdir)
+        cases += disassembler_cases(sizes["bin"], workdir)
+
+    results = {}
+    for name, units, unit, elapsed in cases:
+        results[name] = {"units": units, "unit": unit, "seconds": elapsed,
+                         "us_per_unit": elapsed / units * 1e6 if units else 0.0}
+        print(f"{name:<44} {units:>10} {unit}s {elapsed:>9.3f}s {results[name]['us_per_unit']:>9.2f} us/{unit}")
+    return {
+        "meta": {"scale": scale, "python": platform.python_version(), "platform": platform.platform(),
+                 "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Names of cases whose per-unit cost exceeds the baseline by more than threshold."""
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None or not base["us_per_unit"]:
+            continue
+        ratio = result["us_per_unit"] / base["us_per_unit"]
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            print(f"REGRESSION {name}: {result['us_per_unit']:.2f} vs {base['us_per_unit']:.2f} "
+                  f"us/{result['unit']} ({ratio:.2f}x)")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the compiler, assembler and disassembler")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="quick")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="results JSON (default: %(default)s)")
+    parser.add_argument("--baseline", default=None,
+                        help=f"compare against this results file (e.g. {DEFAULT_BASELINE})")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="also store the results as the baseline file")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed per-unit slowdown before flagging (default: %(default)s)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    current = run_suite(args.scale)
+
+    with open(args.output, "w") as f:
+        json.dump(current, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        baseline_path = args.baseline or DEFAULT_BASELINE
+        with open(baseline_path, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline written to {baseline_path}")
+        return 0
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+            return 1
+        print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+import re
+
+import stats
+
+
+# One master pattern scanned left to right: every character of the source is
+# consumed by exactly one match, so tokenizing is linear in the source size.
+TOKEN_PATTERN = re.compile(r"""
+    (?P<ws>[ \t\r\n]+)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<num>\d+)
+  | (?P<id>[A-Za-z_]\w*)
+  | (?P<str>"(?:[^"\\\n]|\\.)*")
+  | (?P<op>==|!=|<=|>=|&&|\|\||[-+*/%<>=!(){};,])
+""", re.VERBOSE | re.DOTALL)
+
+KEYWORDS = {"int", "while", "if", "else"}
+PRINT_FUNCTIONS = {"print_str": "str", "print_int": "int"}
+
+# Binary operator precedence, lowest first
+BINARY_PRECEDENCE = {
+    "||": 1,
+    "&&": 2,
+    "==": 3, "!=": 3,
+    "<": 4, ">": 4, "<=": 4, ">=": 4,
+    "+": 5, "-": 5,
+    "*": 6, "/": 6, "%": 6,
+}
+
+
+class Token:
+    __slots__ = ("kind", "value", "line")
+
+    def __init__(self, kind, value, line):
+        self.kind = kind
+        self.value = value
+        self.line = line
+
+    def __repr__(self):
+        return f"Token({self.kind}, {self.value!r}, line {self.line})"
+
+
+def tokenize(code):
+    """Yield the tokens of a C-subset source, ending with an 'eof' token."""
+    line = 1
+    pos = 0
+    end = len(code)
+    match = TOKEN_PATTERN.match
+    matches = 0
+    while pos < end:
+        m = match(code, pos)
+        matches += 1
+        if m is None:
+            raise SyntaxError(f"Unexpected character {code[pos]!r} on line {line}")
+        kind = m.lastgroup
+        value = m.group()
+        if kind == "ws" or kind == "comment":
+            line += value.count("\n")
+        elif kind == "id" and value in KEYWORDS:
+            yield Token(value, value, line)
+        else:
+            yield Token(kind, value, line)
+        pos = m.end()
+    stats.count("lexer.regex_matches", matches)
+    stats.count("lexer.source_lines", line)
+    yield Token("eof", "", line)
+
+
+# ---------------------------------------------------------------------------
+# AST nodes
+# ---------------------------------------------------------------------------
+
+class Node:
+    __slots__ = ("line",)
+
+
+class Program(Node):
+    __slots__ = ("body",)
+
+    def __init__(self, body, line=1):
+        self.body = body
+        self.line = line
+
+
+class VarDecl(Node):
+    __slots__ = ("name", "init")
+
+    def __init__(self, name, init, line):
+        self.name = name
+        self.init = init
+        self.line = line
+
+
+class Assign(Node):
+    __slots__ = ("target", "value")
+
+    def __init__(self, target, value, line):
+        self.target = target
+        self.value = value
+        self.line = line
+
+
+class While(Node):
+    __slots__ = ("condition", "body")
+
+    def __init__(self, condition, body, line):
+        self.condition = condition
+        self.body = body
+        self.line = line
+
+
+class If(Node):
+    __slots__ = ("condition", "body", "orelse")
+
+    def __init__(self, condition, body, orelse, line):
+        self.condition = condition
+        self.body = body
+        self.orelse = orelse
+        self.line = line
+
+
+class Print(Node):
+    __slots__ = ("kind", "value")
+
+    def __init__(self, kind, value, line):
+        self.kind = kind    # 'str' (value is the raw literal text) or 'int' (value is an expression)
+        self.value = value
+        self.line = line
+
+
+class Num(Node):
+    __slots__ = ("value",)
+
+    def __init__(self, value, line):
+        self.value = value
+        self.line = line
+
+
+class Var(Node):
+    __slots__ = ("name",)
+
+    def __init__(self, name, line):
+        self.name = name
+        self.line = line
+
+
+class BinOp(Node):
+    __slots__ = ("op", "left", "right")
+
+    def __init__(self, op, left, right, line):
+        self.op = op
+        self.left = left
+        self.right = right
+        self.line = line
+
+
+def expr_to_str(node):
+    """Render an expression node back to C-like source text (used for comments)."""
+    if isinstance(node, Num):
+        return str(node.value)
+    if isinstance(node, Var):
+        return node.name
+    left = expr_to_str(node.left)
+    right = expr_to_str(node.right)
+    if isinstance(node.left, BinOp) and BINARY_PRECEDENCE[node.left.op] < BINARY_PRECEDENCE[node.op]:
+        left = f"({left})"
+    if isinstance(node.right, BinOp) and BINARY_PRECEDENCE[node.right.op] <= BINARY_PRECEDENCE[node.op]:
+        right = f"({right})"
+    return f"{left} {node.op} {right}"
+
+
+# ---------------------------------------------------------------------------
+# Recursive-descent parser
+# ---------------------------------------------------------------------------
+
+class Parser:
+    def __init__(self, code, tokens=None):
+        # tokens: the already lexed tokens of code, e.g. from computing a cache key
+        self.tokens = tokenize(code) if tokens is None else iter(tokens)
+        self.current = next(self.tokens)
+
+    def advance(self):
+        token = self.current
+        self.current = next(self.tokens)
+        return token
+
+    def expect(self, kind, value=None):
+        token = self.current
+        if token.kind != kind or (value is not None and token.value != value):
+            wanted = value if value is not None else kind
+            found = token.value or token.kind
+            raise SyntaxError(f"Expected '{wanted}' but found '{found}' on line {token.line}")
+        return self.advance()
+
+    def accept_op(self, value):
+        if self.current.kind == "op" and self.current.value == value:
+            return self.advance()
+        return None
+
+    def parse_program(self):
+        return Program(list(self.iter_statements()))
+
+    def iter_statements(self):
+        """Yield top-level statements one at a time as they are parsed."""
+        while self.current.kind != "eof":
+            yield from self.parse_statement()
+
+    def parse_block(self):
+        self.expect("op", "{")
+        body = []
+        while not self.accept_op("}"):
+            if self.current.kind == "eof":
+                raise SyntaxError(f"Missing '}}' at end of input (line {self.current.line})")
+            body.extend(self.parse_statement())
+        return body
+
+    def parse_statement(self):
+        """Parse one statement and return the list of nodes it produces.
+
+        Most statements produce a single node; `int a, b;` produces one
+        declaration per name and an empty statement produces none.
+        """
+        token = self.current
+        kind = token.kind
+
+        if kind == "int":
+            return self.parse_declaration()
+        if kind == "while":
+            self.advance()
+            condition = self.parse_condition()
+            return [While(condition, self.parse_block(), token.line)]
+        if kind == "if":
+            self.advance()
+            condition = self.parse_condition()
+            body = self.parse_block()
+            orelse = []
+            if self.current.kind == "else":
+                self.advance()
+                if self.current.kind == "if":
+                    orelse = self.parse_statement()
+                else:
+                    orelse = self.parse_block()
+            return [If(condition, body, orelse, token.line)]
+        if kind == "id":
+            self.advance()
+            if token.value in PRINT_FUNCTIONS:
+                return [self.parse_print(token)]
+            self.expect("op", "=")
+            value = self.parse_expression()
+            self.expect("op", ";")
+            return [Assign(token.value, value, token.line)]
+        if kind == "op" and token.value == ";":
+            self.advance()
+            return []
+
+        raise SyntaxError(f"Unexpected '{token.value or token.kind}' on line {token.line}")
+
+    def parse_declaration(self):
+        line = self.advance().line
+        decls = []
+        while True:
+            name = self.expect("id").value
+            init = None
+            if self.accept_op("="):
+                init = self.parse_expression()
+            decls.append(VarDecl(name, init, line))
+            if not self.accept_op(","):
+                break
+        self.expect("op", ";")
+        return decls
+
+    def parse_print(self, name_token):
+        kind = PRINT_FUNCTIONS[name_token.value]
+        self.expect("op", "(")
+        if kind == "str":
+            value = self.expect("str").value[1:-1]
+        else:
+            value = self.parse_expression()
+        self.expect("op", ")")
+        self.expect("op", ";")
+        return Print(kind, value, name_token.line)
+
+    def parse_condition(self):
+        self.expect("op", "(")
+        condition = self.parse_expression()
+        self.expect("op", ")")
+        return condition
+
+    def parse_expression(self, min_precedence=1):
+        left = self.parse_unary()
+        while True:
+            token = self.current
+            if token.kind != "op":
+                return left
+            precedence = BINARY_PRECEDENCE.get(token.value)
+            if precedence is None or precedence < min_precedence:
+                return left
+            self.advance()
+            right = self.parse_expression(precedence + 1)
+            left = BinOp(token.value, left, right, token.line)
+
+    def parse_unary(self):
+        token = self.current
+        if token.kind == "num":
+            self.advance()
+            return Num(int(token.value), token.line)
+        if token.kind == "id":
+            self.advance()
+            return Var(token.value, token.line)
+        if token.kind == "op":
+            if token.value == "(":
+                self.advance()
+                expr = self.parse_expression()
+                self.expect("op", ")")
+                return expr
+            if token.value == "-":
+                self.advance()
+                operand = self.parse_unary()
+                if isinstance(operand, Num):
+                    return Num(-operand.value, token.line)
+                return BinOp("-", Num(0, token.line), operand, token.line)
+        raise SyntaxError(f"Expected an expression but found '{token.value or token.kind}' on line {token.line}")
+
+
+def parse(code):
+    """Parse C-subset source into a Program node."""
+    return Parser(code).parse_program()
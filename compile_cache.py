@@ -0,0 +1,136 @@
+import os
+import json
+import hashlib
+import tempfile
+
+from c_parser import tokenize
+
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+ENTRY_SUFFIX = ".json"
+# Eviction trims the cache to this fraction of its bound, so the next
+# directory scan is only due after that much new output
+EVICT_TO = 0.75
+
+
+def source_tokens(c_code):
+    """The tokens of c_code as a list, or None when it does not lex."""
+    try:
+        return list(tokenize(c_code))
+    except SyntaxError:
+        return None
+
+
+def normalized_source(c_code, keep_lines=False, tokens=None):
+    """Source reduced to its tokens, so comments and layout do not change the key.
+
+    Outputs that record source line numbers pass keep_lines=True. tokens
+    are the result of source_tokens(c_code) when the caller has them.
+    """
+    if tokens is None:
+        tokens = source_tokens(c_code)
+    if tokens is None:
+        # Not valid input: fall back to the raw text so the compiler reports the error
+        return c_code
+    if keep_lines:
+        return "\0".join(f"{token.line}:{token.value}" for token in tokens)
+    return "\0".join(token.value for token in tokens)
+
+
+def cache_key(c_code, version, options, keep_lines=False, tokens=None):
+    """Content address of a compilation: source tokens, compiler version and options."""
+    digest = hashlib.sha256()
+    digest.update(version.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalized_source(c_code, keep_lines, tokens).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CompileCache:
+    """On-disk cache of compiler output, one JSON file per entry.
+
+    Entries are evicted least-recently-used first once the directory grows
+    past max_bytes; a hit refreshes the entry's modification time, which is
+    what the eviction order is based on.
+
+    The directory is scanned when the cache is opened and again only when
+    total_bytes, the size found by the last scan plus every entry stored
+    since, passes max_bytes. Processes sharing a directory each keep their
+    own estimate, so between scans it can grow past the bound by what the
+    others stored.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self.evict()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        """Return the stored entry dict, or None on a miss."""
+        path = self.entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        """Store an entry atomically, then trim the cache if it may be over its size bound."""
+        data = json.dumps(entry).encode("utf-8")
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self.entry_path(key))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        # A replaced entry is counted twice; that only brings the next scan forward
+        self.total_bytes += len(data)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Scan the directory and, if it is over max_bytes, remove the oldest entries.
+
+        Returns the number of entries removed.
+        """
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if item.name.endswith(ENTRY_SUFFIX):
+                    stat = item.stat()
+                    entries.append((stat.st_mtime, stat.st_size, item.path))
+                    total += stat.st_size
+        removed = 0
+        if total > self.max_bytes:
+            target = self.max_bytes * EVICT_TO
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+        self.total_bytes = total
+        return removed
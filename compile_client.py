@@ -0,0 +1,167 @@
+"""Thin client for compile_server.py.
+
+Usage: python compile_client.py compile INPUT [OUTPUT] [-O N] [--target mips|python]
+       python compile_client.py assemble INPUT [OUTPUT] [--format binary|text]
+       python compile_client.py disassemble INPUT [OUTPUT]
+       python compile_client.py ping | shutdown
+
+Only the standard library is imported, so a call costs interpreter startup
+plus one round trip; the compiling happens in the warm server. Paths are
+sent as absolute paths and the server reads and writes the files itself.
+
+Frames: every message either way is a 4-byte big-endian length followed by
+that many bytes of UTF-8 JSON. A request is an object with an "op" and the
+op's fields; the response echoes the request's "id" and carries "ok" plus
+either the results or an "error" string.
+"""
+import os
+import sys
+import json
+import socket
+import struct
+import argparse
+import tempfile
+
+
+FRAME = struct.Struct(">I")
+MAX_FRAME = 256 * 1024 * 1024
+DEFAULT_SOCKET = os.environ.get("COMPILER3_SOCKET") or \
+    os.path.join(tempfile.gettempdir(), f"compiler3-{os.getuid()}.sock")
+
+
+class FrameError(Exception):
+    pass
+
+
+def encode_frame(message):
+    payload = json.dumps(message).encode("utf-8")
+    if len(payload) > MAX_FRAME:
+        raise FrameError(f"message of {len(payload)} bytes exceeds the {MAX_FRAME} byte frame limit")
+    return FRAME.pack(len(payload)) + payload
+
+
+def decode_payload(payload):
+    try:
+        message = json.loads(payload.decode("utf-8"))
+    except ValueError as e:
+        raise FrameError(f"malformed frame: {e}")
+    if not isinstance(message, dict):
+        raise FrameError("a frame must hold a JSON object")
+    return message
+
+
+class Client:
+    """A connection to the compile server; requests on it are answered in order."""
+
+    def __init__(self, path=DEFAULT_SOCKET, timeout=None):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(path)
+        except OSError:
+            self.sock.close()
+            raise
+        self.next_id = 0
+
+    def recv_exactly(self, size):
+        chunks = []
+        while size:
+            chunk = self.sock.recv(min(size, 1 << 20))
+            if not chunk:
+                raise ConnectionError("server closed the connection")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def request(self, op, **fields):
+        """Send one request and wait for its response dict."""
+        self.next_id += 1
+        self.sock.sendall(encode_frame({"op": op, "id": self.next_id, **fields}))
+        (length,) = FRAME.unpack(self.recv_exactly(FRAME.size))
+        if length > MAX_FRAME:
+            raise FrameError(f"response of {length} bytes exceeds the frame limit")
+        return decode_payload(self.recv_exactly(length))
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Send compile, assemble and disassemble jobs to compile_server.py")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="server socket (default: %(default)s)")
+    commands = parser.add_subparsers(dest="op", required=True)
+
+    compile_parser = commands.add_parser("compile", help="compile C to Minecraft MIPS (or Python)")
+    compile_parser.add_argument("input_file")
+    compile_parser.add_argument("output_file", nargs="?",
+                                help="defaults to the input name with an .asm (or .py) extension")
+    compile_parser.add_argument("-O", dest="opt_level", type=int, choices=[0, 1, 2], default=1)
+    compile_parser.add_argument("--target", choices=["mips", "python"], default="mips")
+    compile_parser.add_argument("--schedule", action=argparse.BooleanOptionalAction, default=None)
+    compile_parser.add_argument("--pipeline", metavar="NAME|FILE")
+
+    assemble_parser = commands.add_parser("assemble", help="assemble source into machine code")
+    assemble_parser.add_argument("input_file")
+    assemble_parser.add_argument("output_file", nargs="?", default="program1.bin")
+    assemble_parser.add_argument("--format", choices=("binary", "text"), default="binary")
+    assemble_parser.add_argument("--byteorder", choices=("big", "little"), default="big")
+
+    disassemble_parser = commands.add_parser("disassemble", help="disassemble machine code")
+    disassemble_parser.add_argument("input_file")
+    disassemble_parser.add_argument("output_file", nargs="?", default="BACK_TO_MIPS.txt")
+
+    commands.add_parser("ping", help="check that the server is up")
+    commands.add_parser("shutdown", help="stop the server")
+    return parser.parse_args(argv)
+
+
+def build_request(args):
+    fields = {}
+    if args.op in ("compile", "assemble", "disassemble"):
+        fields["input_file"] = os.path.abspath(args.input_file)
+        output_file = args.output_file
+        if output_file is None:
+            output_file = os.path.splitext(args.input_file)[0] + (".py" if args.target == "python" else ".asm")
+        fields["output_file"] = os.path.abspath(output_file)
+    if args.op == "compile":
+        fields.update(opt_level=args.opt_level, target=args.target, schedule=args.schedule,
+                      pipeline=args.pipeline and (os.path.abspath(args.pipeline)
+                                                  if os.path.exists(args.pipeline) else args.pipeline))
+    elif args.op == "assemble":
+        fields.update(format=args.format, byteorder=args.byteorder)
+    return fields
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        with Client(args.socket) as client:
+            response = client.request(args.op, **build_request(args))
+    except (OSError, FrameError) as e:
+        print(f"Error: no compile server at {args.socket} ({e}); start one with python compile_server.py")
+        return 2
+
+    if response.get("messages"):
+        print(response["messages"], end="")
+    if not response.get("ok"):
+        print(f"Error: {response.get('error')}")
+        return 1
+    if args.op == "compile":
+        print(f"Compilation successful! Output written to {response['output_file']}")
+        for report in response.get("reports", ()):
+            print(report)
+    elif args.op in ("assemble", "disassemble"):
+        print(f"Wrote {response['output_file']}")
+    elif args.op == "ping":
+        print(f"Server {response['version']} (pid {response['pid']}, {response['jobs']} workers) is up")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+"""Long-lived compile server: warm compilers behind a local Unix socket.
+
+Usage: python compile_server.py [--socket PATH] [-j JOBS] [--stats] [--stats-json PATH]
+
+Every CLI invocation pays for interpreter startup and for importing the
+compiler, assembler and optimizer before it does any work; on small inputs
+that is most of the time. The server pays it once. Requests arrive over a
+Unix socket in the framed protocol of compile_client.py (4-byte big-endian
+length + UTF-8 JSON) and run in a pool of worker processes, each of which
+imports everything up front and keeps one Compiler per option set.
+
+Ops and their fields:
+    compile      source or input_file, output_file, opt_level, target,
+                 source_name, schedule, pipeline
+                 -> output (when no output_file), reports
+    assemble     source or input_file, output_file, format, byteorder
+                 -> output_file, or output (base64) and words
+    disassemble  data (base64) or input_file, output_file
+                 -> output_file, or output; and count
+    ping         -> pid, version, jobs
+    shutdown     stops the server once the running requests finish
+
+Responses carry "ok", the request's "id", any text the tool printed as
+"messages", and "error" when ok is false. Requests on one connection are
+answered in order; connections are served concurrently with at most JOBS
+requests running at a time.
+"""
+import io
+import os
+import sys
+import base64
+import signal
+import socket
+import asyncio
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+import stats
+from object_file import MAGIC, parse_object
+from compile_client import FRAME, MAX_FRAME, DEFAULT_SOCKET, FrameError, encode_frame, decode_payload
+
+
+# Worker state, set up by init_worker
+_worker = {}
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+def init_worker(collect_stats=False):
+    """Process initializer: import the tools and build the default compiler."""
+    import compiler3
+    import assembler
+    import disassembler
+    stats.enable(collect_stats)
+    _worker["compiler3"] = compiler3
+    _worker["assembler"] = assembler
+    _worker["disassembler"] = disassembler
+    _worker["compilers"] = {}
+    warm_compiler(1, "mips", None, None)
+
+
+def warm_compiler(opt_level, target, schedule, pipeline):
+    """The worker's compiler for these options, built on first use."""
+    key = (opt_level, target, schedule, pipeline)
+    compiler = _worker["compilers"].get(key)
+    if compiler is None:
+        compiler3 = _worker["compiler3"]
+        if target == "python":
+            compiler = compiler3.PythonBackend()
+        else:
+            compiler = compiler3.Compiler(opt_level=opt_level, schedule=schedule, pipeline=pipeline)
+        _worker["compilers"][key] = compiler
+    return compiler
+
+
+def read_source(request):
+    if request.get("source") is not None:
+        return request["source"]
+    with open(request["input_file"], 'r', encoding="utf-8") as f:
+        return f.read()
+
+
+def write_output(path, output):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(output)
+
+
+def do_compile(request):
+    compiler3 = _worker["compiler3"]
+    opt_level = int(request.get("opt_level", 1))
+    target = request.get("target", "mips")
+    if target not in ("mips", "python"):
+        raise ValueError(f"unknown target '{target}'")
+    c_code = read_source(request)
+    source_name = request.get("source_name") or os.path.basename(request.get("input_file") or "program.c")
+    compiler = warm_compiler(opt_level, target, request.get("schedule"), request.get("pipeline"))
+    output, reports = compiler3.compile_source(c_code, opt_level, target, source_name, compiler)
+    response = {"reports": reports}
+    if request.get("output_file"):
+        write_output(request["output_file"], output)
+        response["output_file"] = request["output_file"]
+    else:
+        response["output"] = output
+    return response
+
+
+def do_assemble(request):
+    assembler = _worker["assembler"]
+    output_format = request.get("format", "binary")
+    byteorder = request.get("byteorder", "big")
+    if request.get("source") is None:
+        if not request.get("output_file"):
+            raise ValueError("assemble from input_file needs an output_file")
+        program = assembler.interpret_line(request["input_file"], output_format, byteorder,
+                                           request["output_file"])
+        return {"output_file": request["output_file"], "words": len(program.text)}
+
+    program = assembler.assemble_program(request["source"].splitlines())
+    if output_format == "text":
+        buffer = io.StringIO()
+        assembler.write_text(program, buffer)
+        output = buffer.getvalue().encode("ascii")
+    else:
+        buffer = io.BytesIO()
+        assembler.write_object(buffer, program.text, program.data, program.symbols,
+                               assembler.TEXT_BASE, assembler.DATA_BASE, byteorder)
+        output = buffer.getvalue()
+    if request.get("output_file"):
+        with open(request["output_file"], 'wb') as f:
+            f.write(output)
+        return {"output_file": request["output_file"], "words": len(program.text)}
+    return {"output": base64.b64encode(output).decode("ascii"), "words": len(program.text)}
+
+
+def do_disassemble(request):
+    disassembler = _worker["disassembler"]
+    if request.get("data") is None:
+        if not request.get("output_file"):
+            raise ValueError("disassemble from input_file needs an output_file")
+        count = disassembler.stream_disassemble(request["input_file"], request["output_file"])
+        return {"output_file": request["output_file"], "count": count}
+
+    # Packed objects and '0'/'1' text are told apart as read_words does
+    raw = base64.b64decode(request["data"])
+    if raw.startswith(MAGIC):
+        words = parse_object(raw).text
+    else:
+        words = []
+        for line in raw.decode("ascii").splitlines():
+            words.extend(disassembler.text_words(line.strip()))
+    instructions = disassembler.decode_words(words)
+    output = "".join(instruction + "\n" for instruction in instructions)
+    if request.get("output_file"):
+        write_output(request["output_file"], output)
+        return {"output_file": request["output_file"], "count": len(instructions)}
+    return {"output": output, "count": len(instructions)}
+
+
+OPERATIONS = {
+    "compile": do_compile,
+    "assemble": do_assemble,
+    "disassemble": do_disassemble,
+}
+
+
+def run_request(request):
+    """Pool task: run one request; returns (response, stats snapshot or None)."""
+    captured = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(captured):
+            response = OPERATIONS[request["op"]](request)
+        response["ok"] = True
+    except FileNotFoundError as e:
+        response = {"ok": False, "error": f"file not found: {e.filename}"}
+    except Exception as e:
+        response = {"ok": False, "error": str(e) or type(e).__name__}
+    response["messages"] = captured.getvalue()
+    snapshot = None
+    if stats.is_enabled():
+        stats.count(f"server.{request['op']}")
+        snapshot = stats.snapshot()
+        stats.reset()
+    return response, snapshot
+
+
+# ---------------------------------------------------------------------------
+# Server side
+# ---------------------------------------------------------------------------
+
+class CompileServer:
+    def __init__(self, path=DEFAULT_SOCKET, jobs=None, collect_stats=False):
+        self.path = path
+        self.jobs = jobs or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(self.jobs, initializer=init_worker, initargs=(collect_stats,))
+        self.slots = asyncio.Semaphore(self.jobs)
+        self.stopping = None
+        self.clients = set()
+
+    async def read_frame(self, reader):
+        """The next request dict, or None when the client hung up."""
+        try:
+            header = await reader.readexactly(FRAME.size)
+        except asyncio.IncompleteReadError:
+            return None
+        (length,) = FRAME.unpack(header)
+        if length > MAX_FRAME:
+            raise FrameError(f"request of {length} bytes exceeds the {MAX_FRAME} byte frame limit")
+        return decode_payload(await reader.readexactly(length))
+
+    async def dispatch(self, request):
+        op = request.get("op")
+        if op == "ping":
+            from compiler3 import COMPILER_VERSION
+            return {"ok": True, "pid": os.getpid(), "version": COMPILER_VERSION, "jobs": self.jobs}
+        if op == "shutdown":
+            self.stopping.set()
+            return {"ok": True}
+        if op not in OPERATIONS:
+            return {"ok": False, "error": f"unknown op '{op}'"}
+        if self.stopping.is_set():
+            return {"ok": False, "error": "server is shutting down"}
+        async with self.slots:
+            loop = asyncio.get_running_loop()
+            response, snapshot = await loop.run_in_executor(self.executor, run_request, request)
+        if snapshot is not None:
+            stats.merge(snapshot)
+        return response
+
+    async def handle_client(self, reader, writer):
+        self.clients.add(writer)
+        try:
+            while True:
+                try:
+                    request = await self.read_frame(reader)
+                except (FrameError, asyncio.IncompleteReadError) as e:
+                    writer.write(encode_frame({"ok": False, "error": str(e)}))
+                    break
+                if request is None:
+                    break
+                stats.count("server.requests")
+                response = await self.dispatch(request)
+                response["id"] = request.get("id")
+                writer.write(encode_frame(response))
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+    def claim_socket(self):
+        """Remove a stale socket file; refuse to start over a live server."""
+        if not os.path.exists(self.path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            os.unlink(self.path)
+        else:
+            raise RuntimeError(f"a server is already listening on {self.path}")
+        finally:
+            probe.close()
+
+    async def serve(self):
+        self.stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self.stopping.set)
+
+        self.claim_socket()
+        # Start the workers before accepting so the first requests find them warm
+        await asyncio.gather(*(loop.run_in_executor(self.executor, os.getpid) for _ in range(self.jobs)))
+        server = await asyncio.start_unix_server(self.handle_client, self.path)
+        os.chmod(self.path, 0o600)
+        print(f"Compile server listening on {self.path} with {self.jobs} worker(s)")
+        try:
+            await self.stopping.wait()
+        finally:
+            server.close()
+            # Let running requests finish and send their responses
+            for _ in range(self.jobs):
+                await self.slots.acquire()
+            writers = list(self.clients)
+            for writer in writers:
+                writer.close()
+            # Closing flushes whatever responses are still buffered
+            await asyncio.gather(*(writer.wait_closed() for writer in writers), return_exceptions=True)
+            await server.wait_closed()
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.path)
+            self.executor.shutdown()
+        print("Compile server stopped")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve compile, assemble and disassemble requests "
+                                                 "from warm worker processes over a Unix socket")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET,
+                        help="socket path (default: $COMPILER3_SOCKET or %(default)s)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="requests run at once, one worker process each (default: one per CPU)")
+    stats.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    stats.enable_from_args(args)
+    server = CompileServer(args.socket, args.jobs, stats.is_enabled())
+    try:
+        asyncio.run(server.serve())
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return 1
+    stats.publish_from_args(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,34 +1,133 @@
 import re
+import io
 import sys
 import os
+import glob
+import time
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from assembler import DATA_BASE, ADDRESS_LIMIT
+from c_parser import Parser, VarDecl, Assign, While, If, Print, Num, Var, BinOp, expr_to_str
+from regalloc import allocate_registers, declared_names
+from optimizer import optimize_code
+from scheduler import load_pipeline, schedule_code
+from muldiv import load_constant, lower
+from string_pool import plain_layout, merged_layout
+from profiling import BlockCounter, increment_instructions, data_lines, write_counter_map
+from loop_opt import reduce_induction_variables
+from py_backend import PythonBackend
+from compile_cache import CompileCache, cache_key, source_tokens, DEFAULT_MAX_BYTES
+import ir
+import stats
+
+
+# Bump whenever generated code changes so cached output from older
+# compilers is never reused
+COMPILER_VERSION = "3.22"
+
+# Variables and spill slots get one word each from here up to DATA_BASE
+VARIABLE_BASE = 5000
+
+
+# Branch used for each comparison, indexed by whether to jump when the
+# comparison is false or true, as (mnemonic, swap operands):
+# emerald = bne, lapis = beq, steel = bge, obsidian = blt
+BRANCHES = {
+    '==': {False: ('emerald', False), True: ('lapis', False)},
+    '!=': {False: ('lapis', False), True: ('emerald', False)},
+    '<': {False: ('steel', False), True: ('obsidian', False)},
+    '>=': {False: ('obsidian', False), True: ('steel', False)},
+    '>': {False: ('steel', True), True: ('obsidian', True)},
+    '<=': {False: ('obsidian', True), True: ('steel', True)},
+}
+
+# Expression temporaries, handed out by get_temp_reg and returned with
+# release_temp_reg once their value has been consumed
+TEMP_REGISTERS = ["$t0", "$t1", "$t2", "$t3", "$t4", "$t5", "$t6", "$t7", "$t8", "$t9"]
+
+# Arithmetic operators and the instructions computing them into a register;
+# * and / leave their result in lo (goldenpickaxe = mflo), % in hi (diamondpickaxe = mfhi)
+ARITHMETIC = {
+    '+': ("craft",),
+    '-': ("mine",),
+    '*': ("mult", "goldenpickaxe"),
+    '/': ("div", "goldenpickaxe"),
+    '%': ("div", "diamondpickaxe"),
+}
 
 
 class Compiler:
-    def __init__(self):
+    def __init__(self, opt_level=1, schedule=None, pipeline=None, instrument=False):
+        # -O0 emits code literally, -O1 keeps variables in $s registers and
+        # runs the basic cleanup passes, -O2 runs the full pass pipeline and
+        # schedules the result for the pipeline (a name or JSON description).
+        # instrument counts the entries to every basic block (see profiling.py)
+        self.opt_level = opt_level
+        self.register_allocation = opt_level >= 1
+        self.schedule = opt_level >= 2 if schedule is None else schedule
+        self.pipeline = load_pipeline(pipeline)
+        self.instrument = instrument
         self.reset_compiler()
 
     #Set the data and memory address
     def reset_compiler(self):
-        self.memory_address = 5000
-        self.t_register = 0
+        self.memory_address = VARIABLE_BASE
+        self.free_temps = list(TEMP_REGISTERS)
+        self.spill_slots = []
+        self.spill_depth = 0
         self.vars = {}
         self.labels = 0
         self.string_data = {}
+        self.string_layout = None
         self.data_section = []
         self.text_section = []
         self.current_while_stack = []
+        self.statement_index = 0
+        self.var_registers = {}
+        self.spilled_vars = []
+        self.register_inits = {}
+        self.loads_eliminated = 0
+        self.stores_eliminated = 0
+        self.constants_lowered = 0
+        self.pass_report = {}
+        self.cycles_before = None
+        self.cycles_after = None
+        self.counters = []
+        self.current_line = None
+        self.streamed = False
 
     def get_temp_reg(self):
-        reg = f"$t{self.t_register}"
-        self.t_register += 1
-        if self.t_register > 7:  # Reset to avoid running out of t registers (t0-t7)
-            self.t_register = 0
-        return reg
+        # Released temps go to the back of the list, so consecutive
+        # statements use different registers and stay independent
+        stats.count("compiler.temp_registers")
+        if not self.free_temps:
+            raise RuntimeError("out of temporary registers")
+        return self.free_temps.pop(0)
+
+    def release_temp_reg(self, reg):
+        if reg in TEMP_REGISTERS and reg not in self.free_temps:
+            self.free_temps.append(reg)
+
+    def spill_slot(self, depth):
+        """Memory word for the depth-th value spilled while evaluating one expression."""
+        while len(self.spill_slots) <= depth:
+            self.spill_slots.append(self.allocate_word())
+        return self.spill_slots[depth]
+
+    def allocate_word(self):
+        """Address of the next free word below the .data segment."""
+        if self.memory_address + 4 > DATA_BASE:
+            raise RuntimeError(f"more than {(DATA_BASE - VARIABLE_BASE) // 4} variables and spill slots; "
+                               f"they would overlap the .data segment at {DATA_BASE:#x}")
+        address = self.memory_address
+        self.memory_address += 4
+        return address
 
     def declare_variable(self, var_name):
         if var_name not in self.vars:
-            self.vars[var_name] = {'addr': self.memory_address}
-            self.memory_address += 4
+            self.vars[var_name] = {'addr': self.allocate_word()}
             # Add comment for variable declaration
             # self.text_section.append(f"# Declare variable {var_name} at address {self.vars[var_name]['addr']}")
 
@@ -38,9 +137,32 @@ class Compiler:
         return None
 
     def new_label(self):
+        stats.count("compiler.labels")
         self.labels += 1
         return f"L{self.labels}"
 
+    def emit(self, op, *operands):
+        self.text_section.append(ir.instruction(op, *operands))
+
+    def emit_label(self, label):
+        self.text_section.append(ir.label(label))
+
+    def emit_comment(self, text):
+        self.text_section.append(ir.comment(text))
+
+    def place_label(self, label, kind):
+        """Start the block at label; kind names it in the counter map."""
+        self.emit_label(label)
+        self.count_block(kind)
+
+    def count_block(self, kind):
+        """With instrumentation on, count the entries to the block starting here."""
+        if not self.instrument:
+            return
+        counter = BlockCounter(f"count_{len(self.counters)}", kind, self.current_line)
+        self.counters.append(counter)
+        self.text_section.extend(increment_instructions(counter.label))
+
     def process_escape_sequences(self, string):
         """Process escape sequences for MIPS string storage."""
         # Handle \n specially for MIPS
@@ -48,20 +170,34 @@ class Compiler:
         return processed
 
     def add_string(self, value):
-        """Store a string in the data section and return its label."""
+        """Record a string for the data section and return its label."""
 
         if value not in self.string_data:
             label = f"str_{len(self.string_data)}"
             self.string_data[value] = label
 
-            # Properly process escape sequences for MIPS
-            # Keep the string as is - MIPS assembler will handle standard escape sequences
-            # Just ensure proper formatting for the .asciiz directive
-
-            self.data_section.append(f'{label}: .asciiz "{value}"')
-
         return self.string_data[value]
 
+    def layout_strings(self):
+        """Lay out the recorded strings; -O1 and up share the bytes of common suffixes."""
+        strings = [(label, value) for value, label in self.string_data.items()]
+        # Keep the string as is - the MIPS assembler handles standard escape sequences
+        if self.opt_level >= 1:
+            self.string_layout = merged_layout(strings)
+        else:
+            self.string_layout = plain_layout(strings)
+        self.data_section = self.string_layout.lines
+        stats.count("compiler.data_bytes_saved", self.string_layout.bytes_saved())
+
+    def finish_data(self):
+        """Put the block counters ahead of the strings and check la can reach all of .data."""
+        # Counters go first so their words are aligned at the start of .data
+        self.data_section = data_lines(self.counters) + self.data_section
+        size = 4 * len(self.counters) + self.string_layout.pool_bytes
+        if DATA_BASE + size > ADDRESS_LIMIT:
+            raise RuntimeError(f"the .data segment needs {size} bytes, but addresses only reach "
+                               f"{ADDRESS_LIMIT - DATA_BASE} bytes past {DATA_BASE:#x}")
+
     def extract_minecraft_instructions(self, c_code):
         """Extract Minecraft-themed instructions from C code."""
         # Check for special case first
@@ -87,291 +223,301 @@ class Compiler:
         """Add a minecraft instruction to the tracking list."""
         self.minecraft_instructions.append(instruction)
         # Also add a placeholder comment in the standard MIPS assembly
-        self.text_section.append(f"# Minecraft Instruction: {instruction}")
+        self.emit_comment(f"Minecraft Instruction: {instruction}")
+
+    def load_operand(self, reg, operand):
+        """Load a constant or variable operand into a register."""
+        if isinstance(operand, Num):
+            self.text_section.extend(load_constant(reg, operand.value))
+        elif operand.name in self.var_registers:
+            self.emit("Teleport", reg, self.var_registers[operand.name])
+            self.loads_eliminated += 1
+        else:
+            self.emit("elytra", reg, self.get_var_addr(operand.name))
+
+    def operand_reg(self, operand):
+        """Return a register holding the operand, loading it into a temp if needed."""
+        if isinstance(operand, Var) and operand.name in self.var_registers:
+            self.loads_eliminated += 1
+            return self.var_registers[operand.name]
+        reg = self.get_temp_reg()
+        self.load_operand(reg, operand)
+        return reg
 
-    def compile_statement(self, statement):
-        statement = statement.strip()
+    def store_variable(self, reg, target):
+        """Write a computed value back to the variable's home (register or memory)."""
+        target_reg = self.var_registers.get(target)
+        if target_reg is None:
+            self.emit("pickaxe", reg, self.get_var_addr(target))
+        else:
+            self.stores_eliminated += 1
+            if reg != target_reg:
+                self.emit("Teleport", target_reg, reg)
+
+    def is_atom(self, node):
+        return isinstance(node, (Num, Var))
+
+    def check_expression(self, node):
+        """Warn and return False unless node is arithmetic over declared variables."""
+        pending = [node]
+        while pending:
+            current = pending.pop()
+            if isinstance(current, Var):
+                if self.get_var_addr(current.name) is None:
+                    print(f"Warning: Variable '{current.name}' not declared")
+                    return False
+            elif isinstance(current, BinOp):
+                if current.op not in ARITHMETIC:
+                    print(f"Warning: Unsupported expression '{expr_to_str(node)}' on line {node.line}")
+                    return False
+                pending.append(current.left)
+                pending.append(current.right)
+        return True
+
+    def immediate_operand(self, node):
+        """The addi immediate for `x + c` / `x - c` with a 16-bit constant c, else None."""
+        if node.op in ('+', '-') and isinstance(node.right, Num):
+            value = node.right.value if node.op == '+' else -node.right.value
+            if -32768 <= value <= 32767:
+                return value
+        return None
 
-        # Handle empty statements
-        if not statement:
-            return
+    def constant_operand(self, node):
+        """(other operand, constant) when node multiplies, divides or takes a modulo by a constant."""
+        if self.opt_level < 1 or node.op not in ('*', '/', '%'):
+            return None
+        if isinstance(node.right, Num):
+            return node.left, node.right.value
+        if node.op == '*' and isinstance(node.left, Num):
+            return node.right, node.left.value
+        return None
 
-        # Handle Minecraft custom instructions
-        if statement.startswith('Steve;'):
-            self.add_minecraft_instruction("Steve")
-        elif statement.startswith('EnderDragon;'):
-            self.add_minecraft_instruction("EnderDragon")
-        elif statement.startswith('LavaChicken;'):
-            self.add_minecraft_instruction("LavaChicken")
-        elif statement.startswith('GoldenApple;'):
-            self.add_minecraft_instruction("GoldenApple")
-        elif statement.startswith('Creeper;'):
-            self.add_minecraft_instruction("Creeper")
-        elif statement.startswith('BedWars '):
-            args = statement[7:].split(';')[0].strip()
-            self.add_minecraft_instruction(f"BedWars {args}")
-        elif statement.startswith('ChickenJockey '):
-            args = statement[13:].split(';')[0].strip()
-            self.add_minecraft_instruction(f"ChickenJockey {args}")
-        elif statement.startswith('CrushinLoaf '):
-            args = statement[12:].split(';')[0].strip()
-            self.add_minecraft_instruction(f"CrushinLoaf {args}")
-        elif statement.startswith('IronGolem '):
-            args = statement[10:].split(';')[0].strip()
-            self.add_minecraft_instruction(f"IronGolem {args}")
-        elif statement.startswith('HappyGhast '):
-            args = statement[11:].split(';')[0].strip()
-            self.add_minecraft_instruction(f"HappyGhast {args}")
-        # Variable declaration
-        elif statement.startswith('int '):
-            var_name = statement[4:].split(';')[0].strip()
-            self.declare_variable(var_name)
-        # Assignment
-        elif '=' in statement and not statement.startswith('if') and not statement.startswith('while'):
-            parts = statement.split('=', 1)
-            target = parts[0].strip()
-            value = parts[1].split(';')[0].strip()
-            self.compile_assignment(target, value)
-        # While loop
-        elif statement.startswith('while ('):
-            condition = re.search(r'while\s*\((.*?)\)', statement).group(1).strip()
-            body_start = statement.find('{') + 1
-            body_end = self.find_matching_brace(statement, body_start - 1)
-            body = statement[body_start:body_end].strip()
-            self.compile_while(condition, body)
-        # If statement
-        elif statement.startswith('if ('):
-            condition = re.search(r'if\s*\((.*?)\)', statement).group(1).strip()
-            body_start = statement.find('{') + 1
-            body_end = self.find_matching_brace(statement, body_start - 1)
-            body = statement[body_start:body_end].strip()
-            self.compile_if(condition, body)
-        # Print string statement
-        elif 'print_str' in statement:
-            try:
-                match = re.search(r'print_str\s*\(\s*"(.*?)"\s*\)', statement, re.DOTALL)
-                if match:
-                    value = match.group(1)
-                else:
-                    value = self.extract_string_from_print(statement)
-                self.compile_print('str', value)
-            except Exception as e:
-                print(f"Error extracting string: {e}\nStatement: {statement}")
-        # Print int statement
-        elif 'print_int' in statement:
-            try:
-                value = re.search(r'print_int\s*\(\s*(.*?)\s*\)', statement).group(1).strip()
-                self.compile_print('int', value)
-            except Exception as e:
-                print(f"Error extracting int: {e}\nStatement: {statement}")
-        # Multiple statements (separated by semicolons)
-        elif ';' in statement and not re.search(r'".*;.*"', statement):  # Avoid splitting inside string literals
-            statements = self.split_statements_by_semicolon(statement)
-            for stmt in statements:
-                if stmt.strip():
-                    self.compile_statement(stmt.strip() + ';')
+    def register_needs(self, node, needs=None):
+        """Sethi-Ullman numbers: temporaries needed to evaluate each subtree, by id().
+
+        Variables living in registers need none, other leaves one; an
+        operator needs the larger of its operands' numbers, or one more
+        when they are equal, since the first result is held while the
+        second operand is computed.
+        """
+        if needs is None:
+            needs = {}
+        if isinstance(node, Var) and node.name in self.var_registers:
+            need = 0
+        elif not isinstance(node, BinOp):
+            need = 1
+        else:
+            left = self.register_needs(node.left, needs)[id(node.left)]
+            if self.immediate_operand(node) is not None:
+                right = 0
+            else:
+                right = self.register_needs(node.right, needs)[id(node.right)]
+            need = max(1, left + 1 if left == right else max(left, right))
+        needs[id(node)] = need
+        return needs
+
+    def evaluate_operands(self, left, right, needs):
+        """Registers holding left and right, computing the costlier side first.
+
+        If the side computed second needs more temporaries than are free,
+        the first result is spilled to memory and reloaded afterwards.
+        """
+        swap = needs[id(right)] > needs[id(left)]
+        first, second = (right, left) if swap else (left, right)
+        reg1 = self.evaluate(first, needs)
+        spilled = None
+        if reg1 in TEMP_REGISTERS and len(self.free_temps) < min(needs[id(second)], len(TEMP_REGISTERS)):
+            stats.count("compiler.expression_spills")
+            spilled = self.spill_slot(self.spill_depth)
+            self.spill_depth += 1
+            self.emit("pickaxe", reg1, spilled)
+            self.release_temp_reg(reg1)
+        reg2 = self.evaluate(second, needs)
+        if spilled is not None:
+            self.spill_depth -= 1
+            reg1 = self.get_temp_reg()
+            self.emit("elytra", reg1, spilled)
+        return (reg2, reg1) if swap else (reg1, reg2)
+
+    def evaluate(self, node, needs, result=None):
+        """Emit code computing node; returns the register holding its value.
+
+        The value goes to result when one is given, otherwise to a fresh
+        temporary (or, for a variable kept in a register, that register).
+        Operand temporaries are released as soon as they are consumed.
+        """
+        if self.is_atom(node):
+            if result is None:
+                return self.operand_reg(node)
+            self.load_operand(result, node)
+            return result
+
+        immediate = self.immediate_operand(node)
+        if immediate is not None:
+            reg = self.evaluate(node.left, needs)
+            self.release_temp_reg(reg)
+            result = result or self.get_temp_reg()
+            self.emit("flint", result, reg, immediate)
+            return result
+
+        constant = self.constant_operand(node)
+        if constant is not None:
+            return self.evaluate_by_constant(node.op, constant, needs, result)
+
+        reg1, reg2 = self.evaluate_operands(node.left, node.right, needs)
+        self.release_temp_reg(reg1)
+        self.release_temp_reg(reg2)
+        result = result or self.get_temp_reg()
+        instructions = ARITHMETIC[node.op]
+        if len(instructions) == 1:
+            self.emit(instructions[0], result, reg1, reg2)
+        else:
+            self.emit(instructions[0], reg1, reg2)
+            self.emit(instructions[1], result)
+        return result
+
+    def evaluate_by_constant(self, op, constant, needs, result=None):
+        """Multiply, divide or modulo by a constant with the cheapest sequence for the pipeline.
+
+        Shift/add sequences, magic-number multiplies and masks use whatever
+        temporaries are free; with none to spare the hardware instruction
+        is used, loading the constant into the destination.
+        """
+        operand, value = constant
+        src = self.evaluate(operand, needs)
+        dest = result or (src if src in TEMP_REGISTERS else self.get_temp_reg())
+        scratch = []
+        while self.free_temps and len(scratch) < 3:
+            scratch.append(self.get_temp_reg())
+        lowering = lower(op, dest, src, value, scratch, self.pipeline)
+        if lowering is None:
+            lowering = lower(op, dest, src, value, [dest], self.pipeline)
+        code, lowered = lowering
+        self.text_section.extend(code)
+        self.constants_lowered += lowered
+        stats.count("compiler.constants_lowered", lowered)
+        for reg in scratch:
+            self.release_temp_reg(reg)
+        if src != dest:
+            self.release_temp_reg(src)
+        return dest
 
     def compile_assignment(self, target, value):
+        if self.get_var_addr(target) is None:
+            print(f"Warning: Variable '{target}' not declared")
+            return
+
         # Add comment
-        self.text_section.append(f"# {target} = {value}")
-
-        # Handle constant assignments
-        if value.isdigit() or (value.startswith('-') and value[1:].isdigit()):
-            reg = self.get_temp_reg()
-            self.text_section.append(f"enderman {reg}, {value}")
-            self.text_section.append(f"pickaxe {reg}, {self.get_var_addr(target)}")
-        # Handle variable assignments
-        elif value in self.vars:
-            reg1 = self.get_temp_reg()
-            self.text_section.append(f"elytra {reg1}, {self.get_var_addr(value)}")
-            self.text_section.append(f"pickaxe {reg1}, {self.get_var_addr(target)}")
+        self.emit_comment(f"{target} = {expr_to_str(value)}")
+
+        # Handle constant and variable assignments
+        if self.is_atom(value):
+            if target in self.var_registers:
+                self.load_operand(self.var_registers[target], value)
+                self.stores_eliminated += 1
+            elif self.check_expression(value):
+                reg = self.operand_reg(value)
+                self.store_variable(reg, target)
+                self.release_temp_reg(reg)
         # Handle arithmetic operations
-        elif any(op in value for op in ['+', '-', '*', '/', '%']):
+        else:
             self.compile_arithmetic(target, value)
 
     def compile_arithmetic(self, target, expr):
-        # Handle modulus operation
-        if '%' in expr:
-            var1, var2 = expr.split('%')
-            var1 = var1.strip()
-            var2 = var2.strip()
-
-            self.text_section.append(f"# Compute {var1} % {var2}")
-            reg1 = self.get_temp_reg()
-            reg2 = self.get_temp_reg()
-            result = self.get_temp_reg()
-
-            # Load first operand
-            if var1.isdigit() or (var1.startswith('-') and var1[1:].isdigit()):
-                self.text_section.append(f"endermen {reg1}, {var1}")
-            else:
-                self.text_section.append(f"elytra {reg1}, {self.get_var_addr(var1)}")
-
-            # Load second operand
-            if var2.isdigit() or (var2.startswith('-') and var2[1:].isdigit()):
-                self.text_section.append(f"endermen {reg2}, {var2}")
-            else:
-                self.text_section.append(f"elytra {reg2}, {self.get_var_addr(var2)}")
-
-            #put all of the operands together
-            self.text_section.append(f"div {reg1}, {reg2}")
-            self.text_section.append(f"diamondpickaxe {result}")  # Get remainder
-            self.text_section.append(f"pickaxe {result}, {self.get_var_addr(target)}")
-
-        # Handle addition
-        elif '+' in expr:
-            var1, var2 = expr.split('+')
-            var1 = var1.strip()
-            var2 = var2.strip()
-
-            self.text_section.append(f"# Compute {var1} + {var2}")
-            reg1 = self.get_temp_reg()
-            reg2 = self.get_temp_reg()
-            result = self.get_temp_reg()
-
-            # Load first operand
-            if var1.isdigit() or (var1.startswith('-') and var1[1:].isdigit()):
-                self.text_section.append(f"enderman {reg1}, {var1}")
-            else:
-                self.text_section.append(f"elytra {reg1}, {self.get_var_addr(var1)}")
-
-            # Load second operand
-            if var2.isdigit() or (var2.startswith('-') and var2[1:].isdigit()):
-                self.text_section.append(f"endermen {reg2}, {var2}")
-            else:
-                self.text_section.append(f"elytra {reg2}, {self.get_var_addr(var2)}")
-
-            self.text_section.append(f"craft {result}, {reg1}, {reg2}")
-            self.text_section.append(f"pickaxe {result}, {self.get_var_addr(target)}")
-
-    def compile_if(self, condition, body):
-        end_label = self.new_label()
-
-        # Print the original condition and body for debugging
-        # print(f"Compiling if condition: '{condition}' with body: '{body}'")
-
-        # Handle equality condition
-        if '==' in condition:
-            var1, var2 = condition.split('==')
-            var1 = var1.strip()
-            var2 = var2.strip()
-
-            self.text_section.append(f"# if ({var1} == {var2})")
-            reg1 = self.get_temp_reg()
-            reg2 = self.get_temp_reg()
-
-            # Load first operand
-            if var1.isdigit() or (var1.startswith('-') and var1[1:].isdigit()):
-                self.text_section.append(f"endermen {reg1}, {var1}")
-            else:
-                self.text_section.append(f"elytra {reg1}, {self.get_var_addr(var1)}")
-
-            # Load second operand
-            if var2.isdigit() or (var2.startswith('-') and var2[1:].isdigit()):
-                self.text_section.append(f"endermen {reg2}, {var2}")
-            else:
-                self.text_section.append(f"elytra {reg2}, {self.get_var_addr(var2)}")
-
-            # Branch if not equal (skip the if body)
-            self.text_section.append(f"emerald {reg1}, {reg2}, {end_label}")
-
-        # Handle logical AND
-        elif '&&' in condition:
-            parts = condition.split('&&')
-            left = parts[0].strip()
-            right = parts[1].strip()
-
-            self.text_section.append(f"# if ({left} && {right})")
-
-            # We need to check both conditions, if either fails, skip the body
-            left_var, left_val = left.split('==')
-            right_var, right_val = right.split('==')
-
-            left_var = left_var.strip()
-            left_val = left_val.strip()
-            right_var = right_var.strip()
-            right_val = right_val.strip()
-
-            reg1 = self.get_temp_reg()
-            reg2 = self.get_temp_reg()
-            reg3 = self.get_temp_reg()
-            reg4 = self.get_temp_reg()
+        if not self.check_expression(expr):
+            return
 
-            # First condition
-            if left_var.isdigit() or (left_var.startswith('-') and left_var[1:].isdigit()):
-                self.text_section.append(f"enderman {reg1}, {left_var}")
+        self.emit_comment(f"Compute {expr_to_str(expr)}")
+        # Compute straight into the target's register when it has one
+        result = self.evaluate(expr, self.register_needs(expr), self.var_registers.get(target))
+        self.store_variable(result, target)
+        self.release_temp_reg(result)
+
+    def compile_condition(self, condition, label, jump_if=False):
+        """Emit branches that jump to label when the condition equals jump_if.
+
+        With the default jump_if=False this skips to label when the condition
+        fails; loops tested at the bottom use jump_if=True.
+        """
+        if isinstance(condition, BinOp) and condition.op in ('&&', '||'):
+            # Short circuit: && jumps on the first false side, || on the first true one
+            decisive = condition.op == '||'
+            if jump_if == decisive:
+                self.compile_condition(condition.left, label, jump_if)
+                self.compile_condition(condition.right, label, jump_if)
             else:
-                self.text_section.append(f"elytra {reg1}, {self.get_var_addr(left_var)}")
+                skip_label = self.new_label()
+                self.compile_condition(condition.left, skip_label, decisive)
+                self.compile_condition(condition.right, label, jump_if)
+                self.place_label(skip_label, "condition")
+            return
 
-            if left_val.isdigit() or (left_val.startswith('-') and left_val[1:].isdigit()):
-                self.text_section.append(f"endermen {reg2}, {left_val}")
-            else:
-                self.text_section.append(f"elytra {reg2}, {self.get_var_addr(left_val)}")
+        if not isinstance(condition, BinOp) or condition.op not in BRANCHES:
+            # Any other expression is true when non-zero
+            if not self.check_expression(condition):
+                return
+            reg = self.evaluate(condition, self.register_needs(condition))
+            self.release_temp_reg(reg)
+            self.emit('emerald' if jump_if else 'lapis', reg, "$zero", label)
+            return
 
-            # If first condition fails, skip
-            self.text_section.append(f"emerald {reg1}, {reg2}, {end_label}")
+        if not self.check_expression(condition.left) or not self.check_expression(condition.right):
+            return
+        needs = self.register_needs(condition.left)
+        self.register_needs(condition.right, needs)
+        reg1, reg2 = self.evaluate_operands(condition.left, condition.right, needs)
+        self.release_temp_reg(reg1)
+        self.release_temp_reg(reg2)
 
-            # Second condition
-            if right_var.isdigit() or (right_var.startswith('-') and right_var[1:].isdigit()):
-                self.text_section.append(f"endermen {reg3}, {right_var}")
-            else:
-                self.text_section.append(f"elytra {reg3}, {self.get_var_addr(right_var)}")
+        branch, swap = BRANCHES[condition.op][jump_if]
+        if swap:
+            reg1, reg2 = reg2, reg1
+        self.emit(branch, reg1, reg2, label)
 
-            if right_val.isdigit() or (right_val.startswith('-') and right_val[1:].isdigit()):
-                self.text_section.append(f"endermen {reg4}, {right_val}")
-            else:
-                self.text_section.append(f"elytra {reg4}, {self.get_var_addr(right_val)}")
+    def compile_if(self, condition, body, orelse=()):
+        false_label = self.new_label()
 
-            # If second condition fails, skip
-            self.text_section.append(f"emerald {reg3}, {reg4}, {end_label}")
+        self.emit_comment(f"if ({expr_to_str(condition)})")
+        self.compile_condition(condition, false_label)
 
         # Compile the if body
-        body_statements = self.split_compound_statement(body)
-        # print(f"If body split into {len(body_statements)} statements: {body_statements}")
-
-        for stmt in body_statements:
-            self.compile_statement(stmt)
-
-        self.text_section.append(f"{end_label}:")
+        self.count_block("if-body")
+        self.compile_block(body)
+
+        if orelse:
+            end_label = self.new_label()
+            self.emit("craftingTable", end_label)
+            self.place_label(false_label, "else-body")
+            self.compile_block(orelse)
+            self.place_label(end_label, "after-if")
+        else:
+            self.place_label(false_label, "after-if")
 
     def compile_while(self, condition, body):
         start_label = self.new_label()
         end_label = self.new_label()
 
-        self.text_section.append(f"# while ({condition})")
-        self.text_section.append(f"{start_label}:")
-
-        # Handle less than condition
-        if '<' in condition:
-            var1, var2 = condition.split('<')
-            var1 = var1.strip()
-            var2 = var2.strip()
-
-            reg1 = self.get_temp_reg()
-            reg2 = self.get_temp_reg()
+        self.emit_comment(f"while ({expr_to_str(condition)})")
 
-            # Load first operand
-            if var1.isdigit() or (var1.startswith('-') and var1[1:].isdigit()):
-                self.text_section.append(f"enderman {reg1}, {var1}")
-            else:
-                self.text_section.append(f"elytra {reg1}, {self.get_var_addr(var1)}")
-
-            # Load second operand
-            if var2.isdigit() or (var2.startswith('-') and var2[1:].isdigit()):
-                self.text_section.append(f"enderman {reg2}, {var2}")
-            else:
-                self.text_section.append(f"elytra {reg2}, {self.get_var_addr(var2)}")
+        if self.opt_level >= 2:
+            # Rotated loop: test once on entry, then at the bottom, so each
+            # iteration takes a single branch instead of a branch plus a jump
+            self.compile_condition(condition, end_label)
+            self.place_label(start_label, "loop-body")
+            self.compile_block(body)
+            self.compile_condition(condition, start_label, jump_if=True)
+            self.place_label(end_label, "after-loop")
+            return
 
-            # Branch if greater or equal (opposite of less than)
-            self.text_section.append(f"steel {reg1}, {reg2}, {end_label}")
+        self.place_label(start_label, "loop-header")
+        self.compile_condition(condition, end_label)
 
-        # Compile body - splitting compound statements
-        for stmt in self.split_compound_statement(body):
-            self.compile_statement(stmt)
+        self.count_block("loop-body")
+        self.compile_block(body)
 
         # Jump back to start
-        self.text_section.append(f"craftingTable {start_label}")
-        self.text_section.append(f"{end_label}:")
+        self.emit("craftingTable", start_label)
+        self.place_label(end_label, "after-loop")
 
     def extract_string_from_print(self, statement):
         """Extract the string from a print_str statement, handling escaped quotes."""
@@ -399,279 +545,575 @@ class Compiler:
 
     def compile_print(self, print_type, value):
         if print_type == 'str':
-            self.text_section.append(f"# print_str(\"{value}\")")
+            self.emit_comment(f"print_str(\"{value}\")")
             label = self.add_string(value)
             # Check if the string was added successfully
             if label:
-                self.text_section.append(f"endermen $v0, 4")
-                self.text_section.append(f"TheNether $a0, {label}")
-                self.text_section.append(f"syscall")
+                self.emit("enderman", "$v0", 4)
+                self.emit("TheNether", "$a0", label)
+                self.emit("syscall")
             else:
                 print(f"Warning: Failed to add string: '{value}'")
         elif print_type == 'int':
-            self.text_section.append(f"# print_int({value})")
-            reg = self.get_temp_reg()
-
-            if value.isdigit() or (value.startswith('-') and value[1:].isdigit()):
-                self.text_section.append(f"endermen {reg}, {value}")
-            else:
-                addr = self.get_var_addr(value)
-                if addr is not None:
-                    self.text_section.append(f"elytra {reg}, {addr}")
-                else:
-                    print(f"Warning: Variable '{value}' not declared")
-                    return
-
-            self.text_section.append(f"Teleport $a0, {reg}")
-            self.text_section.append(f"endermen $v0, 1")
-            self.text_section.append(f"Bedrock")
-
-    def compile_statement(self, statement):
-        statement = statement.strip()
-
-        # print(f"Compiling statement: '{statement}'")
-
-        # Handle empty statements
-        if not statement:
-            return
+            self.emit_comment(f"print_int({expr_to_str(value)})")
+
+            if not self.check_expression(value):
+                return
+            reg = self.evaluate(value, self.register_needs(value))
+            self.release_temp_reg(reg)
+
+            self.emit("Teleport", "$a0", reg)
+            self.emit("enderman", "$v0", 1)
+            self.emit("Bedrock")
+
+    def compile_statement(self, node):
+        # Zero registers of variables whose live range starts here, matching
+        # the zeroed memory they would otherwise read
+        position = self.statement_index
+        self.statement_index += 1
+        for reg in self.register_inits.get(position, ()):
+            self.emit("enderman", reg, 0)
+
+        # Blocks opened while compiling this statement belong to its line
+        enclosing_line = self.current_line
+        self.current_line = node.line
+        if self.counters:
+            self.counters[-1].lines.append(node.line)
 
         # Variable declaration
-        if statement.startswith('int '):
-            var_name = statement[4:].split(';')[0].strip()
-            self.declare_variable(var_name)
+        if isinstance(node, VarDecl):
+            self.declare_variable(node.name)
+            if node.init is not None:
+                self.compile_assignment(node.name, node.init)
 
         # Assignment
-        elif '=' in statement and not statement.startswith('if') and not statement.startswith('while'):
-            parts = statement.split('=', 1)
-            target = parts[0].strip()
-            value = parts[1].split(';')[0].strip()
-            self.compile_assignment(target, value)
+        elif isinstance(node, Assign):
+            self.compile_assignment(node.target, node.value)
 
         # While loop
-        elif statement.startswith('while ('):
-            condition = re.search(r'while\s*\((.*?)\)', statement).group(1).strip()
-            body_start = statement.find('{') + 1
-            body_end = self.find_matching_brace(statement, body_start - 1)
-            body = statement[body_start:body_end].strip()
-            self.compile_while(condition, body)
+        elif isinstance(node, While):
+            self.compile_while(node.condition, node.body)
 
         # If statement
-        elif statement.startswith('if ('):
-            condition = re.search(r'if\s*\((.*?)\)', statement).group(1).strip()
-            body_start = statement.find('{') + 1
-            body_end = self.find_matching_brace(statement, body_start - 1)
-            body = statement[body_start:body_end].strip()
-            self.compile_if(condition, body)
-
-        # Print string statement
-        elif 'print_str' in statement:
-            # Use the improved string extraction method
-            try:
-                # First try standard regex but it might fail with complex strings
-                match = re.search(r'print_str\s*\(\s*"(.*?)"\s*\)', statement, re.DOTALL)
-                if match:
-                    value = match.group(1)
-                else:
-                    # Fallback to manual extraction
-                    value = self.extract_string_from_print(statement)
-                # print(f"Extracted string: '{value}'")
-                self.compile_print('str', value)
-            except Exception as e:
-                print(f"Error extracting string: {e}\nStatement: {statement}")
-
-        # Print int statement
-        elif 'print_int' in statement:
-            try:
-                value = re.search(r'print_int\s*\(\s*(.*?)\s*\)', statement).group(1).strip()
-                self.compile_print('int', value)
-            except Exception as e:
-                print(f"Error extracting int: {e}\nStatement: {statement}")
-
-        # Multiple statements (separated by semicolons)
-        elif ';' in statement and not re.search(r'".*;.*"', statement):  # Avoid splitting inside string literals
-            statements = self.split_statements_by_semicolon(statement)
-            for stmt in statements:
-                if stmt.strip():
-                    self.compile_statement(stmt.strip() + ';')
-
-    def split_statements_by_semicolon(self, text):
-        """Split by semicolons outside of string literals"""
-        result = []
-        current = ""
-        in_string = False
-
-        for char in text:
-            if char == '"' and not in_string:
-                in_string = True
-                current += char
-            elif char == '"' and in_string:
-                in_string = False
-                current += char
-            elif char == ';' and not in_string:
-                result.append(current)
-                current = ""
-            else:
-                current += char
-
-        if current:
-            result.append(current)
-        return result
-
-    def find_matching_brace(self, text, open_pos):
-        depth = 1
-        for i in range(open_pos + 1, len(text)):
-            if text[i] == '{':
-                depth += 1
-            elif text[i] == '}':
-                depth -= 1
-                if depth == 0:
-                    return i
-        return len(text)  # If no matching brace is found
-
-    def split_statements(self, code):
-        # Split code into individual statements
-        statements = []
-        current = ""
-        brace_level = 0
-        in_string = False
-
-        i = 0
-        while i < len(code):
-            char = code[i]
-
-            # Handle strings with proper escaped quote handling
-            if char == '"' and (i == 0 or code[i - 1] != '\\'):
-                in_string = not in_string
-
-            # Only count braces outside of strings
-            if not in_string:
-                if char == '{':
-                    brace_level += 1
-                elif char == '}':
-                    brace_level -= 1
-
-            current += char
-
-            # End of statement if semicolon or closing brace at top level
-            if not in_string and brace_level == 0 and (char == ';' or char == '}'):
-                statements.append(current.strip())
-                current = ""
-
-            i += 1
-
-        # Add the last statement if it exists
-        if current.strip():
-            statements.append(current.strip())
-
-        return statements
-
-    def split_compound_statement(self, body):
-        """Split a compound statement (code block) into individual statements"""
-        result = []
-        current = ""
-        in_string = False
-        brace_level = 0
-
-        # Debug
-        # print(f"Splitting compound statement: {body}")
-
-        i = 0
-        while i < len(body):
-            char = body[i]
-
-            # Track string literals with proper escaped quote handling
-            if char == '"' and (i == 0 or body[i - 1] != '\\'):
-                in_string = not in_string
-
-            # Track nested braces
-            if not in_string:
-                if char == '{':
-                    brace_level += 1
-                elif char == '}':
-                    brace_level -= 1
-
-            current += char
-
-            # End of statement
-            if not in_string and brace_level == 0 and char == ';':
-                result.append(current.strip())
-                current = ""
-
-            i += 1
-
-        # Add any remaining statement
-        if current.strip():
-            result.append(current.strip())
-
-        # Debug
-        # print(f"Split result: {result}")
-        return result
-
-    def compile(self, c_code):
-        self.reset_compiler()
+        elif isinstance(node, If):
+            self.compile_if(node.condition, node.body, node.orelse)
 
-        # Remove comments
-        c_code = re.sub(r'\/\/.*$', '', c_code, flags=re.MULTILINE)
+        # Print statements
+        elif isinstance(node, Print):
+            self.compile_print(node.kind, node.value)
 
-        # Add header to assembly
-        self.text_section.append("# MIPS Assembly")
+        self.current_line = enclosing_line
 
-        # Process each statement
-        statements = self.split_statements(c_code)
+    def compile_block(self, statements):
         for stmt in statements:
             self.compile_statement(stmt)
 
-        # Add program exit
-        self.text_section.append("# Exit program")
-        self.text_section.append("enderman $v0, 10")
-        self.text_section.append("TheNether")
+    def compile(self, c_code, tokens=None):
+        self.reset_compiler()
+
+        # Add header to assembly
+        self.emit_comment("MIPS Assembly")
+
+        # Tokenize and parse in a single pass (the lexer also drops comments)
+        with stats.phase("compile.parse"):
+            program = Parser(c_code, tokens).parse_program()
+
+        reduced = 0
+        if self.opt_level >= 2:
+            with stats.phase("compile.strength-reduction"):
+                reduced = reduce_induction_variables(program)
+
+        if self.register_allocation:
+            with stats.phase("compile.register-allocation"):
+                self.var_registers, self.spilled_vars, self.register_inits = \
+                    allocate_registers(program, declared_names(program))
+
+        with stats.phase("compile.codegen"):
+            self.count_block("entry")
+            self.compile_block(program.body)
+
+            # Add program exit
+            self.emit_comment("Exit program")
+            self.emit("enderman", "$v0", 10)
+            self.emit("Bedrock")
+            self.layout_strings()
+            self.finish_data()
+        stats.count("compiler.statements", self.statement_index)
+        stats.count("compiler.lines_generated", len(self.text_section))
+
+        with stats.phase("compile.optimize"):
+            self.text_section, self.pass_report = optimize_code(self.text_section, self.opt_level)
+        if self.opt_level >= 2:
+            self.pass_report = {"strength-reduction": reduced, **self.pass_report}
+        if self.opt_level >= 1:
+            self.pass_report = {"constant-arithmetic": self.constants_lowered, **self.pass_report}
+        stats.count("compiler.lines_after_optimization", len(self.text_section))
+
+        if self.schedule:
+            with stats.phase("compile.schedule"):
+                self.text_section, self.cycles_before, self.cycles_after = \
+                    schedule_code(self.text_section, self.pipeline)
 
         # Generate final assembly
-        asm = ".data\n"
-        asm += "\n".join(self.data_section) + "\n\n"
-        asm += ".text\n.globl main\nmain:\n"
-        asm += "\n".join(["    " + line for line in self.text_section])
+        with stats.phase("compile.render"):
+            asm = ".data\n"
+            asm += "\n".join(self.data_section) + "\n\n"
+            asm += ".text\n.globl main\nmain:\n"
+            asm += "\n".join(ir.render_lines(self.text_section, "    "))
 
         return asm
 
-
-def main():
-    # Default filenames
-    input_file = "program.c"
-    output_file = "program.asm"
-
-    # Check if input file is provided as argument
-    if len(sys.argv) >= 2:
-        input_file = sys.argv[1]
-
-    # Check if output file is provided as argument
-    if len(sys.argv) >= 3:
-        output_file = sys.argv[2]
+    def compile_stream(self, c_code, out):
+        """Compile c_code into the text file out, one top-level statement at a time.
+
+        Each statement's code is rendered and written as soon as it is
+        compiled, so memory holds the largest statement rather than the
+        whole listing; the .data segment is only known at the end and
+        follows .text. Register allocation, induction-variable strength
+        reduction and the optimizer passes need the whole program and are
+        skipped. Scheduling is block-local and runs on each statement's
+        code. Returns the number of characters written.
+        """
+        self.reset_compiler()
+        self.streamed = True
+        written = out.write(".text\n.globl main\nmain:\n")
+        self.emit_comment("MIPS Assembly")
+
+        with stats.phase("compile.codegen"):
+            self.count_block("entry")
+            for statement in Parser(c_code).iter_statements():
+                self.compile_statement(statement)
+                written += self.flush_text(out)
+
+            self.emit_comment("Exit program")
+            self.emit("enderman", "$v0", 10)
+            self.emit("Bedrock")
+            written += self.flush_text(out)
+            self.layout_strings()
+            self.finish_data()
+        stats.count("compiler.statements", self.statement_index)
+        if self.opt_level >= 1:
+            self.pass_report = {"constant-arithmetic": self.constants_lowered}
+
+        written += out.write("\n.data\n" + "".join(line + "\n" for line in self.data_section))
+        return written
+
+    def flush_text(self, out):
+        """Schedule, render and write the pending text_section, then drop it."""
+        code = self.text_section
+        stats.count("compiler.lines_generated", len(code))
+        if self.schedule:
+            with stats.phase("compile.schedule"):
+                code, before, after = schedule_code(code, self.pipeline)
+            self.cycles_before = (self.cycles_before or 0) + before
+            self.cycles_after = (self.cycles_after or 0) + after
+        with stats.phase("compile.render"):
+            written = out.write("".join(line + "\n" for line in ir.render_lines(code, "    ")))
+        self.text_section = []
+        # Nothing written is kept, so records shared with it would only pile up
+        ir.clear_records()
+        return written
+
+    def allocation_report(self):
+        """Summarize register allocation and the memory traffic it removed."""
+        loads = sum(1 for instr in self.text_section if instr[0] == "elytra")
+        stores = sum(1 for instr in self.text_section if instr[0] == "pickaxe")
+        return (f"Register allocation: {len(self.var_registers)} variables in registers, "
+                f"{len(self.spilled_vars)} spilled; "
+                f"{self.loads_eliminated} loads and {self.stores_eliminated} stores eliminated "
+                f"({loads} loads, {stores} stores remain)")
+
+    def optimization_report(self):
+        """One line per optimization pass with the instructions it removed."""
+        lines = []
+        for name, count in self.pass_report.items():
+            if name == "loop-invariant":
+                lines.append(f"  {name}: {count} instructions hoisted out of loops")
+            elif name == "strength-reduction":
+                lines.append(f"  {name}: {count} loop modulo operations replaced")
+            elif name == "jump-threading":
+                lines.append(f"  {name}: {count} branches, jumps and labels removed")
+            elif name == "constant-arithmetic":
+                lines.append(f"  {name}: {count} multiplies, divides and modulos by constants lowered")
+            else:
+                lines.append(f"  {name}: {count} instructions removed")
+        return "\n".join(lines)
+
+    def string_pool_report(self):
+        layout = self.string_layout
+        return (f"String pool: {layout.literals} literals in {layout.pool_bytes} bytes "
+                f"({layout.bytes_saved()} bytes saved by suffix merging)")
+
+    def instrumentation_report(self):
+        lines = {line for counter in self.counters for line in counter.lines}
+        return (f"Instrumentation: {len(self.counters)} block counters "
+                f"covering {len(lines)} source lines")
+
+    def schedule_report(self):
+        """Estimated cycles of the straight-line listing before and after scheduling."""
+        saved = self.cycles_before - self.cycles_after
+        return (f"Pipeline scheduling ({self.pipeline.name}): {self.cycles_before} -> "
+                f"{self.cycles_after} estimated cycles ({saved} stall cycles removed)")
+
+
+def compile_source(c_code, opt_level=1, target="mips", source_name="program.c", compiler=None,
+                   schedule=None, pipeline=None, instrument=False, tokens=None):
+    """Compile one source; returns (output text, report lines to print).
+
+    compiler may be a Compiler (or, for the python target, a PythonBackend)
+    to reuse instead of building a new one; schedule, pipeline and
+    instrument are only used when a new Compiler is built. tokens, when
+    given, are the source already lexed and are parsed instead of c_code.
+    """
+    if target == "python":
+        return (compiler or PythonBackend()).compile(c_code, source_name, tokens), []
+
+    compiler = compiler or Compiler(opt_level=opt_level, schedule=schedule, pipeline=pipeline,
+                                    instrument=instrument)
+    asm_output = compiler.compile(c_code, tokens)
+    return asm_output, compiler_reports(compiler)
+
+
+def compiler_reports(compiler):
+    """Report lines for the program the compiler just compiled."""
+    reports = []
+    if compiler.register_allocation and not compiler.streamed:
+        reports.append(compiler.allocation_report())
+    if compiler.pass_report:
+        reports.append(f"Optimization passes (-O{compiler.opt_level}):")
+        reports.append(compiler.optimization_report())
+    if compiler.opt_level >= 1 and compiler.string_layout.literals:
+        reports.append(compiler.string_pool_report())
+    if compiler.cycles_before is not None:
+        reports.append(compiler.schedule_report())
+    if compiler.instrument:
+        reports.append(compiler.instrumentation_report())
+    return reports
+
+
+def cached_compile(cache, c_code, opt_level=1, target="mips", source_name="program.c", compiler=None,
+                   schedule=None, pipeline=None):
+    """compile_source through an on-disk cache; returns (output, reports, hit).
+
+    Warnings the compiler prints are stored with the output and printed again on a hit.
+    """
+    options = {"opt_level": opt_level, "target": target}
+    if target == "python":
+        options["source_name"] = source_name
+    else:
+        if compiler is None:
+            scheduled = opt_level >= 2 if schedule is None else schedule
+            described = load_pipeline(pipeline).describe()
+        else:
+            scheduled, described = compiler.schedule, compiler.pipeline.describe()
+        options["schedule"] = scheduled
+        # Scheduling and, from -O1, the multiply/divide lowering both depend on the pipeline
+        if scheduled or opt_level >= 1:
+            options["pipeline"] = described
+    # Lex once: the key is built from the tokens and a miss parses the same list
+    tokens = source_tokens(c_code)
+    key = cache_key(c_code, COMPILER_VERSION, options, keep_lines=target == "python", tokens=tokens)
+    with stats.phase("cache.lookup"):
+        entry = cache.get(key)
+    if entry is not None:
+        stats.count("cache.hits")
+        # Replay the warnings the compiler printed when the entry was made
+        sys.stdout.write(entry["messages"])
+        return entry["output"], entry["reports"], True
+    stats.count("cache.misses")
+    captured = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(captured):
+            output, reports = compile_source(c_code, opt_level, target, source_name, compiler, schedule,
+                                             pipeline, tokens=tokens)
+    finally:
+        sys.stdout.write(captured.getvalue())
+    cache.put(key, {"output": output, "reports": reports, "messages": captured.getvalue()})
+    return output, reports, False
+
+
+def default_output_path(input_file, target, output_dir=None):
+    """The input name with an .asm (or .py) extension, optionally under output_dir."""
+    base_name = os.path.splitext(input_file)[0]
+    if output_dir is not None:
+        # Keep the layout of relative inputs; paths outside the tree keep just their name
+        relative = os.path.normpath(base_name)
+        if os.path.isabs(relative) or relative.startswith(os.pardir):
+            relative = os.path.basename(relative)
+        base_name = os.path.join(output_dir, relative)
+    return base_name + (".py" if target == "python" else ".asm")
+
+
+# ---------------------------------------------------------------------------
+# Batch mode: many inputs compiled across a process pool
+# ---------------------------------------------------------------------------
+
+# Files handed to a worker per task; larger chunks mean less IPC per file
+BATCH_CHUNK_SIZE = 8
+
+# Per-process state of a batch worker, filled in by init_batch_worker
+_worker = {}
+
+
+class BatchResult:
+    def __init__(self, input_file, output_file, lines, error=None, messages="", cached=False, stats=None):
+        self.input_file = input_file
+        self.output_file = output_file
+        self.lines = lines
+        self.error = error
+        self.messages = messages      # warnings the compiler printed for this file
+        self.cached = cached
+        self.stats = stats            # worker stats snapshot for this result, when enabled
+
+
+def init_batch_worker(opt_level, target, cache_dir, cache_size, collect_stats=False,
+                      schedule=None, pipeline=None):
+    """Process initializer: build one warm compiler (and cache handle) per worker."""
+    stats.enable(collect_stats)
+    _worker["options"] = (opt_level, target)
+    if target == "python":
+        _worker["compiler"] = PythonBackend()
     else:
-        # If no output file is specified, use the same name with .asm extension
-        base_name = os.path.splitext(input_file)[0]
-        output_file = base_name + ".asm"
+        _worker["compiler"] = Compiler(opt_level=opt_level, schedule=schedule, pipeline=pipeline)
+    _worker["cache"] = CompileCache(cache_dir, cache_size) if cache_dir else None
+
 
+def compile_file(input_file, output_file):
+    """Compile one file with the worker's compiler and write its output."""
+    opt_level, target = _worker["options"]
+    captured = io.StringIO()
+    lines = 0
     try:
-        # Read C code from input file
         with open(input_file, 'r') as f:
             c_code = f.read()
+        lines = c_code.count("\n")
+        source_name = os.path.basename(input_file)
+        with contextlib.redirect_stdout(captured):
+            if _worker["cache"] is not None:
+                output, _, hit = cached_compile(_worker["cache"], c_code, opt_level, target,
+                                                source_name, _worker["compiler"])
+            else:
+                output, _ = compile_source(c_code, opt_level, target, source_name, _worker["compiler"])
+                hit = False
+        output_dir = os.path.dirname(output_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(output_file, 'w') as f:
+            f.write(output)
+        stats.count("output.bytes_written", len(output))
+        stats.count("batch.files")
+    except Exception as e:
+        return BatchResult(input_file, output_file, lines, str(e) or type(e).__name__, captured.getvalue())
+    return BatchResult(input_file, output_file, lines, None, captured.getvalue(), hit)
+
+
+def compile_chunk(jobs):
+    """Pool task: compile a chunk of (input, output) pairs."""
+    results = [compile_file(input_file, output_file) for input_file, output_file in jobs]
+    if stats.is_enabled() and results:
+        # Ship this worker's stats for the chunk back with its last result
+        results[-1].stats = stats.snapshot()
+        stats.reset()
+    return results
+
+
+def expand_inputs(patterns, manifest=None):
+    """Input files from glob patterns and an optional manifest (one path per line)."""
+    inputs = []
+    for pattern in patterns or ():
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches:
+            print(f"Warning: '{pattern}' matched no files")
+        inputs.extend(matches)
+    if manifest:
+        with open(manifest, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    inputs.append(line)
+    return list(dict.fromkeys(inputs))
+
+
+def run_batch(inputs, opt_level=1, target="mips", output_dir=None, jobs=None,
+              cache_dir=None, cache_size=DEFAULT_MAX_BYTES, schedule=None, pipeline=None):
+    """Compile every input across a process pool, reporting each file as it finishes.
+
+    Returns the number of files that failed. When two inputs map to the
+    same output file, nothing is compiled and both count as failed.
+    """
+    work = [(input_file, default_output_path(input_file, target, output_dir)) for input_file in inputs]
+    # Inputs from different directories can map to one output; refuse rather than overwrite
+    writers = {}
+    for input_file, output_file in work:
+        writers.setdefault(os.path.abspath(output_file), {}).setdefault(os.path.abspath(input_file), input_file)
+    clashes = [(output_file, list(names.values())) for output_file, names in writers.items() if len(names) > 1]
+    for output_file, names in clashes:
+        print(f"Error: {', '.join(names)} would be written to the same file {output_file}")
+    if clashes:
+        return sum(len(names) for _, names in clashes)
+
+    chunks = [work[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(work), BATCH_CHUNK_SIZE)]
+    jobs = jobs or os.cpu_count() or 1
+    init_args = (opt_level, target, cache_dir, cache_size, stats.is_enabled(), schedule, pipeline)
+
+    start = time.perf_counter()
+    compiled = failed = cached = lines = 0
+
+    def report(results):
+        nonlocal compiled, failed, cached, lines
+        for result in results:
+            lines += result.lines
+            if result.stats is not None:
+                stats.merge(result.stats)
+            if result.messages:
+                print(result.messages, end="" if result.messages.endswith("\n") else "\n")
+            if result.error is not None:
+                failed += 1
+                print(f"Error: {result.input_file}: {result.error}")
+            else:
+                compiled += 1
+                cached += result.cached
+                print(f"{result.input_file} -> {result.output_file}" + (" (cached)" if result.cached else ""))
+
+    if jobs == 1:
+        init_batch_worker(*init_args)
+        for input_file, output_file in work:
+            report([compile_file(input_file, output_file)])
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_batch_worker, initargs=init_args) as pool:
+            futures = [pool.submit(compile_chunk, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                report(future.result())
+
+    elapsed = time.perf_counter() - start
+    rate = elapsed if elapsed > 0 else float("inf")
+    print(f"Batch: {compiled} compiled ({cached} cached), {failed} failed, {lines} lines "
+          f"in {elapsed:.2f}s with {jobs} workers "
+          f"({len(work) / rate:.1f} files/s, {lines / rate:,.0f} lines/s)")
+    return failed
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Compile a C subset to Minecraft MIPS assembly.")
+    parser.add_argument("input_file", nargs="?", default="program.c")
+    parser.add_argument("output_file", nargs="?",
+                        help="defaults to the input name with an .asm (or .py) extension")
+    parser.add_argument("-O", dest="opt_level", type=int, choices=[0, 1, 2], default=1,
+                        help="optimization level (default: -O1)")
+    parser.add_argument("--target", choices=["mips", "python"], default="mips",
+                        help="emit Minecraft MIPS assembly (default) or a Python program")
+    parser.add_argument("--schedule", action=argparse.BooleanOptionalAction, default=None,
+                        help="reorder instructions to avoid pipeline stalls (default: on at -O2)")
+    parser.add_argument("--pipeline", metavar="NAME|FILE",
+                        help="pipeline to schedule for: classic5 (default), late-branch, "
+                             "no-forwarding, or a JSON file of latencies")
+    parser.add_argument("--instrument", action="store_true",
+                        help="count basic-block entries at run time and write the counter map "
+                             "to OUTPUT.counters.json (see profiling.py)")
+    parser.add_argument("--stream", action="store_true",
+                        help="write code to the output as each top-level statement is compiled, "
+                             "in memory bounded by the largest statement; skips register "
+                             "allocation and the optimizer passes, and the cache")
+    parser.add_argument("--cache-dir", default=os.environ.get("COMPILER3_CACHE_DIR"),
+                        help="reuse output for unchanged sources from this directory "
+                             "(default: $COMPILER3_CACHE_DIR, caching is off when unset)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="cache size limit in MiB (default: %(default)s)")
+    batch = parser.add_argument_group("batch mode")
+    batch.add_argument("--batch", nargs="+", metavar="PATTERN",
+                       help="compile every file matching these paths or globs")
+    batch.add_argument("--manifest", help="file listing one input path per line")
+    batch.add_argument("-j", "--jobs", type=int, default=None,
+                       help="worker processes (default: one per CPU)")
+    batch.add_argument("--output-dir", help="write batch outputs under this directory")
+    stats.add_arguments(parser)
+    return parser.parse_args(argv)
 
-        # Compile the code
-        compiler = Compiler()
-        asm_output = compiler.compile(c_code)
 
-        # Write assembly output to file
-        with open(output_file, 'w') as f:
-            f.write(asm_output)
+def main():
+    args = parse_args(sys.argv[1:])
+    stats.enable_from_args(args)
+    if args.instrument and (args.target != "mips" or args.batch or args.manifest):
+        print("Error: --instrument compiles a single file for the mips target.")
+        return 1
+    if args.stream and (args.target != "mips" or args.batch or args.manifest):
+        print("Error: --stream compiles a single file for the mips target.")
+        return 1
+    if args.batch or args.manifest:
+        inputs = expand_inputs(args.batch, args.manifest)
+        if not inputs:
+            print("Error: no input files for batch mode.")
+            return 1
+        failed = run_batch(inputs, args.opt_level, args.target, args.output_dir, args.jobs,
+                           args.cache_dir, args.cache_size * 1024 * 1024, args.schedule, args.pipeline)
+        stats.publish_from_args(args)
+        return 1 if failed else 0
+
+    input_file = args.input_file
+    output_file = args.output_file
+    if output_file is None:
+        # If no output file is specified, use the same name with .asm (or .py) extension
+        output_file = default_output_path(input_file, args.target)
 
-        print(f"Compilation successful! Output written to {output_file}")
+    try:
+        # Read C code from input file
+        with stats.phase("read"), open(input_file, 'r') as f:
+            c_code = f.read()
+
+        # Compile the code, reusing cached output when the source is unchanged
+        source_name = os.path.basename(input_file)
+        if args.stream:
+            # Code goes straight to the file, so there is no output to cache
+            compiler = Compiler(args.opt_level, args.schedule, args.pipeline, instrument=args.instrument)
+            try:
+                with stats.phase("write"), open(output_file, 'w') as f:
+                    written = compiler.compile_stream(c_code, f)
+            except Exception:
+                # Leave no truncated listing behind
+                with contextlib.suppress(OSError):
+                    os.unlink(output_file)
+                raise
+            output = None
+            reports = compiler_reports(compiler)
+            hit = False
+        elif args.instrument:
+            # The counter map comes from the compiler itself, so bypass the cache
+            compiler = Compiler(args.opt_level, args.schedule, args.pipeline, instrument=True)
+            output, reports = compile_source(c_code, compiler=compiler)
+            hit = False
+        elif args.cache_dir:
+            cache = CompileCache(args.cache_dir, args.cache_size * 1024 * 1024)
+            output, reports, hit = cached_compile(cache, c_code, args.opt_level, args.target, source_name,
+                                                  schedule=args.schedule, pipeline=args.pipeline)
+        else:
+            output, reports = compile_source(c_code, args.opt_level, args.target, source_name,
+                                             schedule=args.schedule, pipeline=args.pipeline)
+            hit = False
+
+        if args.instrument:
+            counter_map = output_file + ".counters.json"
+            write_counter_map(counter_map, compiler.counters, os.path.abspath(input_file))
+            reports.append(f"Counter map written to {counter_map}")
+
+        # Write the output to file
+        if output is not None:
+            with stats.phase("write"), open(output_file, 'w') as f:
+                written = f.write(output)
+        stats.count("output.bytes_written", written)
+
+        print(f"Compilation successful! Output written to {output_file}" + (" (cached)" if hit else ""))
+        for report in reports:
+            print(report)
+        stats.publish_from_args(args)
 
     except FileNotFoundError:
         print(f"Error: Input file '{input_file}' not found.")
+        return 1
     except Exception as e:
         print(f"Error during compilation: {e}")
+        return 1
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
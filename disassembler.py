@@ -1,4 +1,15 @@
 import sys
+import mmap
+import time
+import argparse
+
+try:
+    import numpy
+except ImportError:  # the pure-Python decoder handles everything numpy does
+    numpy = None
+
+from object_file import MAGIC, bytes_to_words, is_object_file, read_header, read_object
+import stats
 
 
 op_codes = {
@@ -8,10 +19,17 @@ op_codes = {
     "000100": "enderman",
     "000101": "TheNether",
     "000110": "CraftingTable",
+    "000111": "elytra",
+    "001000": "pickaxe",
+    "001001": "emerald",
+    "001010": "lapis",
+    "001011": "obsidian",
+    "001100": "Repeater",
     "111000": "RedStone",
     "111001": "BedWars",
     "111010": "Steve",
-    "111011": "HappyGhast"
+    "111011": "HappyGhast",
+    "111100": "Bedrock"
 }
 
 func_codes = {
@@ -19,11 +37,26 @@ func_codes = {
     "100010": "mine",
     "011010": "elytra",
     "010000": "DiamondPickAxe",
-    "101001": "BedWars"
+    "010010": "GoldenPickAxe",
+    "011000": "Anvil",
+    "000000": "Piston",
+    "000010": "StickyPiston",
+    "000011": "Observer",
+    "100100": "Comparator",
+    "101001": "BedWars",
+    "100001": "Teleport"
 }
 
 registers = {
     "00000": "$zero",
+    "00001": "$at",
+    "00010": "$v0",
+    "00011": "$v1",
+    "00100": "$a0",
+    "00101": "$a1",
+    "00110": "$a2",
+    "00111": "$a3",
+    "01000": "$t0",
     "01001": "$t1",
     "01010": "$t2",
     "01011": "$t3",
@@ -39,80 +72,212 @@ registers = {
     "10101": "$s5",
     "10110": "$s6",
     "10111": "$s7",
+    "11000": "$t8",
+    "11001": "$t9",
+    "11010": "$k0",
+    "11011": "$k1",
+    "11100": "$gp",
+    "11101": "$sp",
+    "11110": "$fp",
+    "11111": "$ra",
 }
 
+# Operand layouts that differ from the default "rd, rs, rt" / "rt, rs, imm"
+two_register_ops = {"BedWars", "Teleport"}
+shift_ops = {"Piston", "StickyPiston", "Observer"}
+memory_ops = {"elytra", "pickaxe"}
+signed_immediate_ops = {"flint", "enderman", "steel", "emerald", "lapis", "obsidian"}
 
-def handle_lines(bin_file: str):
-    with open(bin_file, "r", encoding="utf-8") as input_file:
-        lines = [line.strip() for line in input_file.readlines() if line.strip()]
 
-    if not lines:
-        print("⚠️ program1.bin is empty!")
-        return
+# Buffers at least this long have their fields split out with numpy
+NUMPY_MIN_WORDS = 4096
 
-    print(f"✅ Read {len(lines)} valid lines from {bin_file}")
+# Words decoded and written per chunk when streaming
+CHUNK_WORDS = 1 << 16
 
-    all_mips = []
+REGISTER_NAMES = [registers[format(number, "05b")] for number in range(32)]
 
-    for line in lines:
-        instructions = bin_to_mips(line)
-        all_mips.extend(instructions)
 
-    if not all_mips:
-        print("⚠️ No instructions were decoded!")
-        return
+def r_type_decoder(name):
+    if name in ("DiamondPickAxe", "GoldenPickAxe"):
+        return lambda rs, rt, rd, shamt: f"{name} {REGISTER_NAMES[rd]}"
+    if name in two_register_ops:
+        return lambda rs, rt, rd, shamt: f"{name} {REGISTER_NAMES[rd]}, {REGISTER_NAMES[rs]}"
+    if name in shift_ops:
+        return lambda rs, rt, rd, shamt: f"{name} {REGISTER_NAMES[rd]}, {REGISTER_NAMES[rt]}, {shamt}"
+    return lambda rs, rt, rd, shamt: f"{name} {REGISTER_NAMES[rd]}, {REGISTER_NAMES[rs]}, {REGISTER_NAMES[rt]}"
 
-    with open("BACK_TO_MIPS.txt", "w", encoding="utf-8") as output_file:
-        for instruction in all_mips:
-            print(instruction)  # TEMP: See output
-            output_file.write(instruction + "\n")
 
+def i_type_decoder(name):
+    if name in memory_ops:
+        return lambda rs, rt, imm: f"{name} {REGISTER_NAMES[rt]}, {imm}"
+    if name in signed_immediate_ops:
+        return lambda rs, rt, imm: (f"{name} {REGISTER_NAMES[rt]}, {REGISTER_NAMES[rs]}, "
+                                    f"{imm - 0x10000 if imm & 0x8000 else imm}")
+    return lambda rs, rt, imm: f"{name} {REGISTER_NAMES[rt]}, {REGISTER_NAMES[rs]}, {imm}"
 
 
-def bin_to_mips(line):
-    mips = []
-    bit_string = ""
+FUNCT_TABLE = [r_type_decoder(func_codes.get(format(funct, "06b"), "UNKNOWN")) for funct in range(64)]
+
+
+def decode_r_type(rs, rt, rd, funct, imm):
+    return FUNCT_TABLE[funct](rs, rt, rd, imm >> 6 & 31)
+
+
+def build_opcode_table():
+    """One decoder per 6-bit opcode, each taking the (rs, rt, rd, funct, imm) fields."""
+    table = []
+    for op in range(64):
+        name = op_codes.get(format(op, "06b"), "UNKNOWN")
+        if name == "R":
+            table.append(decode_r_type)
+        elif name == "BedWars":
+            table.append(lambda rs, rt, rd, funct, imm: f"BedWars {REGISTER_NAMES[rd]}, {REGISTER_NAMES[rs]}")
+        elif name == "HappyGhast":
+            table.append(lambda rs, rt, rd, funct, imm: f"HappyGhast {REGISTER_NAMES[rt]}")
+        elif name in ("Steve", "RedStone", "Bedrock"):
+            table.append(lambda rs, rt, rd, funct, imm, name=name: name)
+        elif name == "CraftingTable":
+            table.append(lambda rs, rt, rd, funct, imm: f"CraftingTable {rs << 21 | rt << 16 | imm}")
+        else:
+            decode = i_type_decoder(name)
+            table.append(lambda rs, rt, rd, funct, imm, decode=decode: decode(rs, rt, imm))
+    return table
+
+
+OPCODE_TABLE = build_opcode_table()
+
+
+def decode_word(word):
+    """Decode one 32-bit instruction word."""
+    return OPCODE_TABLE[word >> 26](word >> 21 & 31, word >> 16 & 31, word >> 11 & 31, word & 63, word & 0xFFFF)
+
+
+def numpy_fields(words):
+    """Column lists (op, rs, rt, rd, funct, imm) for a whole buffer, split with vector shifts."""
+    w = numpy.asarray(words, dtype=numpy.uint32)
+    return ((w >> 26).tolist(), (w >> 21 & 31).tolist(), (w >> 16 & 31).tolist(),
+            (w >> 11 & 31).tolist(), (w & 63).tolist(), (w & 0xFFFF).tolist())
 
-    for i in range(len(line)):
-        bit_string += line[i]
-        if len(bit_string) == 32:
-            op_code = bit_string[0:6]
 
-            if op_code == "000000":  # R-type
-                rs = bit_string[6:11]
-                rt = bit_string[11:16]
-                rd = bit_string[16:21]
-                shift = bit_string[21:26]
-                func_code = bit_string[26:32]
-                instr = func_codes.get(func_code, "UNKNOWN")
-                mips.append(f"{instr} {registers[rd]}, {registers[rs]}, {registers[rt]}")
+def decode_words(words):
+    """Decode a whole buffer of instruction words in one pass."""
+    if numpy is None or len(words) < NUMPY_MIN_WORDS:
+        return [decode_word(word) for word in words]
+    table = OPCODE_TABLE
+    return [table[op](rs, rt, rd, funct, imm) for op, rs, rt, rd, funct, imm in zip(*numpy_fields(words))]
 
-            elif op_code == "111011":  # HappyGhast
-                rt = bit_string[11:16]
-                mips.append(f"HappyGhast {registers[rt]}")
 
-            elif op_code == "111010":  # Steve
-                mips.append("Steve")
+def text_words(line):
+    """Integer words of a '0'/'1' text line, which may hold several 32-bit words."""
+    return [int(line[i:i + 32], 2) for i in range(0, len(line) - 31, 32)]
 
-            elif op_code == "111000":  # RedStone
-                mips.append("RedStone")
 
-            elif op_code == "000110":  # CraftingTable (J-type)
-                address = int(bit_string[6:], 2)
-                mips.append(f"CraftingTable {address}")
+def read_words(bin_file: str):
+    """Instruction words of a packed object file or a text '0'/'1' listing."""
+    if is_object_file(bin_file):
+        return read_object(bin_file).text
+    words = []
+    with open(bin_file, "r", encoding="utf-8") as input_file:
+        for line in input_file:
+            words.extend(text_words(line.strip()))
+    return words
+
+
+def iter_word_chunks(bin_file: str, chunk_words=CHUNK_WORDS):
+    """Yield the instruction words of a packed or text file in chunks.
+
+    The file is memory-mapped and only one chunk is materialised at a
+    time, so memory use does not grow with the size of the input.
+    """
+    with open(bin_file, "rb") as input_file:
+        if not input_file.seek(0, 2):
+            return
+        with mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if mapped[:len(MAGIC)] == MAGIC:
+                byteorder, _, _, text_count, _, _, offset = read_header(mapped)
+                end = offset + text_count * 4
+                for start in range(offset, end, chunk_words * 4):
+                    yield bytes_to_words(mapped[start:min(start + chunk_words * 4, end)], byteorder)
+                return
+
+            # Text listing: cut chunks at line boundaries
+            chunk_bytes = chunk_words * 33
+            start = 0
+            size = len(mapped)
+            while start < size:
+                end = mapped.find(b"\n", start + chunk_bytes)
+                end = size if end == -1 else end + 1
+                words = []
+                for token in mapped[start:end].split():
+                    words.extend(text_words(token.decode("ascii")))
+                yield words
+                start = end
+
+
+def iter_instructions(bin_file: str, chunk_words=CHUNK_WORDS):
+    """Lazily decode a binary, yielding one list of instruction strings per chunk."""
+    for words in iter_word_chunks(bin_file, chunk_words):
+        yield decode_words(words)
+
+
+def stream_disassemble(bin_file: str, output_path="BACK_TO_MIPS.txt", chunk_words=CHUNK_WORDS):
+    """Disassemble bin_file into output_path in constant memory; returns the instruction count."""
+    count = 0
+    clock = time.perf_counter
+    read_time = decode_time = write_time = 0.0
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as output_file:
+        chunks = iter_word_chunks(bin_file, chunk_words)
+        while True:
+            start = clock()
+            words = next(chunks, None)
+            read_done = clock()
+            if words is None:
+                read_time += read_done - start
+                break
+            instructions = decode_words(words)
+            decoded = clock()
+            if instructions:
+                output_file.write("\n".join(instructions) + "\n")
+                count += len(instructions)
+            read_time += read_done - start
+            decode_time += decoded - read_done
+            write_time += clock() - decoded
+        written = output_file.tell()
+    stats.add_time("disassemble.read", read_time)
+    stats.add_time("disassemble.decode", decode_time)
+    stats.add_time("disassemble.write", write_time)
+    stats.count("disassembler.instructions", count)
+    stats.count("output.bytes_written", written)
+    return count
 
-            else:  # I-type fallback
-                rs = bit_string[6:11]
-                rt = bit_string[11:16]
-                imm = bit_string[16:32]
-                instr = op_codes.get(op_code, "UNKNOWN")
-                mips.append(f"{instr} {registers[rt]}, {registers[rs]}, {int(imm, 2)}")
 
-            bit_string = ""
+def handle_lines(bin_file: str, output_path="BACK_TO_MIPS.txt"):
+    count = stream_disassemble(bin_file, output_path)
+
+    if not count:
+        print("⚠️ No instructions were decoded!")
+        return
+
+    print(f"✅ Decoded {count} instructions from {bin_file} into {output_path}")
+
+
+def bin_to_mips(line):
+    return [decode_word(word) for word in text_words(line)]
+
 
-    return mips
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Disassemble machine code back to Minecraft MIPS")
+    parser.add_argument("input_file", nargs="?", default="program1.bin",
+                        help="packed object file or '0'/'1' listing")
+    parser.add_argument("output_file", nargs="?", default="BACK_TO_MIPS.txt")
+    stats.add_arguments(parser)
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    handle_lines("program1.bin")
+    args = parse_args()
+    stats.enable_from_args(args)
+    handle_lines(args.input_file, args.output_file)
+    stats.publish_from_args(args)
@@ -0,0 +1,82 @@
+"""Compact instruction records for Compiler.text_section.
+
+Codegen appends records, the optimizer and scheduler rewrite lists of
+them, and only the final render turns them into text. A record is a tuple:
+
+    (op, operand, ...)     instruction, e.g. ("craft", "$t0", "$s1", "$t2")
+    (':', name)            label
+    ('#', text)            comment line, text including its leading '#'
+
+Operands are interned strings and the records themselves are shared
+through one table, so the loads, moves, syscalls and comments a large
+program repeats thousands of times are stored once and a text_section
+entry costs a pointer. Tuples index at C speed and are immutable: passes
+replace entries, never edit them.
+"""
+import sys
+
+
+# Shared records; the table starts over when it reaches this size so a
+# long-lived process compiling many programs does not grow without bound
+MAX_RECORDS = 1 << 20
+
+_records = {}
+
+
+def record(entry):
+    """The shared copy of a record tuple."""
+    shared = _records.get(entry)
+    if shared is None:
+        if len(_records) >= MAX_RECORDS:
+            clear_records()
+        shared = tuple(sys.intern(part) for part in entry)
+        _records[shared] = shared
+    return shared
+
+
+def clear_records():
+    """Forget the shared records; ones still in use elsewhere are unaffected."""
+    _records.clear()
+
+
+def instruction(op, *operands):
+    """Record of op applied to operands; non-string operands are formatted with str()."""
+    entry = (op,) + operands
+    shared = _records.get(entry)
+    if shared is None:
+        shared = record(tuple(part if type(part) is str else str(part) for part in entry))
+        # Also file it under the operands as given: codegen passes the
+        # same int immediates again and again
+        _records[entry] = shared
+    return shared
+
+
+def label(name):
+    return record((':', name))
+
+
+def comment(text):
+    return record(('#', f"# {text}"))
+
+
+def render_line(instr):
+    op = instr[0]
+    if op == '#':
+        return instr[1]
+    if op == ':':
+        return f"{instr[1]}:"
+    if len(instr) == 1:
+        return op
+    return f"{op} {', '.join(instr[1:])}"
+
+
+def render_lines(code, indent=""):
+    """Text of every record, each distinct record rendered once."""
+    rendered = {}
+    lines = []
+    for instr in code:
+        text = rendered.get(instr)
+        if text is None:
+            text = rendered[instr] = indent + render_line(instr)
+        lines.append(text)
+    return lines
@@ -0,0 +1,201 @@
+from c_parser import VarDecl, Assign, While, If, Print, Num, Var, BinOp
+
+
+def assigned_names(statements, out):
+    """Collect every variable written anywhere in a statement list."""
+    for stmt in statements:
+        if isinstance(stmt, VarDecl) and stmt.init is not None:
+            out[stmt.name] = out.get(stmt.name, 0) + 1
+        elif isinstance(stmt, Assign):
+            out[stmt.target] = out.get(stmt.target, 0) + 1
+        elif isinstance(stmt, While):
+            assigned_names(stmt.body, out)
+        elif isinstance(stmt, If):
+            assigned_names(stmt.body, out)
+            assigned_names(stmt.orelse, out)
+    return out
+
+
+def induction_step(stmt):
+    """Return (variable, step) if stmt is `i = i + c` with a constant c > 0."""
+    if not isinstance(stmt, Assign) or not isinstance(stmt.value, BinOp) or stmt.value.op != '+':
+        return None
+    left, right = stmt.value.left, stmt.value.right
+    if isinstance(right, Var) and isinstance(left, Num):
+        left, right = right, left
+    if isinstance(left, Var) and left.name == stmt.target and isinstance(right, Num) and right.value > 0:
+        return stmt.target, right.value
+    return None
+
+
+def known_start(preceding, name):
+    """Value of name on loop entry when the last preceding write is a non-negative constant."""
+    for stmt in reversed(preceding):
+        if isinstance(stmt, (VarDecl, Assign)):
+            target = stmt.name if isinstance(stmt, VarDecl) else stmt.target
+            value = stmt.init if isinstance(stmt, VarDecl) else stmt.value
+            if target == name:
+                if isinstance(value, Num) and value.value >= 0:
+                    return value.value
+                return None
+        elif isinstance(stmt, (While, If)) and name in assigned_names([stmt], {}):
+            return None
+    return None
+
+
+def is_modulo_of(node, name, step):
+    return (isinstance(node, BinOp) and node.op == '%' and isinstance(node.left, Var)
+            and node.left.name == name and isinstance(node.right, Num) and node.right.value >= step)
+
+
+def collect_modulos(node, name, step, out):
+    """Collect the divisors K of every `name % K` inside an expression."""
+    if is_modulo_of(node, name, step):
+        out.add(node.right.value)
+    elif isinstance(node, BinOp):
+        collect_modulos(node.left, name, step, out)
+        collect_modulos(node.right, name, step, out)
+    return out
+
+
+def rewrite_expression(node, name, replacements):
+    if isinstance(node, BinOp):
+        if isinstance(node.left, Var) and node.left.name == name and node.op == '%' \
+                and isinstance(node.right, Num) and node.right.value in replacements:
+            return Var(replacements[node.right.value], node.line)
+        node.left = rewrite_expression(node.left, name, replacements)
+        node.right = rewrite_expression(node.right, name, replacements)
+    return node
+
+
+def statement_expressions(stmt):
+    """The (node, attribute) slots holding expressions directly in a statement."""
+    if isinstance(stmt, VarDecl) and stmt.init is not None:
+        return [(stmt, 'init')]
+    if isinstance(stmt, Assign):
+        return [(stmt, 'value')]
+    if isinstance(stmt, (While, If)):
+        return [(stmt, 'condition')]
+    if isinstance(stmt, Print) and stmt.kind == 'int':
+        return [(stmt, 'value')]
+    return []
+
+
+def walk_statements(statements):
+    for stmt in statements:
+        yield stmt
+        if isinstance(stmt, While):
+            yield from walk_statements(stmt.body)
+        elif isinstance(stmt, If):
+            yield from walk_statements(stmt.body)
+            yield from walk_statements(stmt.orelse)
+
+
+class InductionVariableReducer:
+    """Strength-reduce `i % K` inside loops where i is a basic induction variable.
+
+    For a loop whose body ends each iteration with a single `i = i + c`
+    (c > 0) and where i enters the loop as a known non-negative constant,
+    every `i % K` with K >= c is replaced by a shadow variable r that is
+    initialised to start % K before the loop and advanced next to i:
+
+        r = r + c;  if (r >= K) { r = r - K; }
+
+    so each iteration costs an add and a compare instead of a divide.
+    """
+
+    def __init__(self):
+        self.counter = 0
+        self.replaced = 0
+
+    def run(self, statements):
+        index = 0
+        while index < len(statements):
+            stmt = statements[index]
+            if isinstance(stmt, While):
+                self.run(stmt.body)
+                index += self.reduce_loop(statements, index)
+            elif isinstance(stmt, If):
+                self.run(stmt.body)
+                self.run(stmt.orelse)
+            index += 1
+        return self.replaced
+
+    def reduce_loop(self, statements, index):
+        """Reduce the loop at statements[index]; return how many statements were inserted before it."""
+        loop = statements[index]
+        writes = assigned_names(loop.body, {})
+        inserted = 0
+
+        for position, stmt in enumerate(list(loop.body)):
+            induction = induction_step(stmt)
+            if induction is None:
+                continue
+            name, step = induction
+            if writes.get(name) != 1:
+                continue
+            start = known_start(statements[:index], name)
+            if start is None:
+                continue
+
+            divisors = collect_modulos(loop.condition, name, step, set())
+            for inner in walk_statements(loop.body):
+                for node, attr in statement_expressions(inner):
+                    collect_modulos(getattr(node, attr), name, step, divisors)
+            if not divisors:
+                continue
+
+            replacements = {}
+            updates = []
+            for divisor in sorted(divisors):
+                # The lexer never produces a name starting with '.', so
+                # shadows cannot collide with the program's variables
+                shadow = f".sr{self.counter}"
+                self.counter += 1
+                replacements[divisor] = shadow
+                line = stmt.line
+                statements.insert(index + inserted, VarDecl(shadow, Num(start % divisor, line), line))
+                inserted += 1
+                updates.append(Assign(shadow, BinOp('+', Var(shadow, line), Num(step, line), line), line))
+                updates.append(If(BinOp('>=', Var(shadow, line), Num(divisor, line), line),
+                                  [Assign(shadow, BinOp('+', Var(shadow, line), Num(-divisor, line), line), line)],
+                                  [], line))
+
+            self.replaced += self.rewrite_loop(loop, name, replacements)
+            update_at = loop.body.index(stmt) + 1
+            loop.body[update_at:update_at] = updates
+
+        return inserted
+
+    def rewrite_loop(self, loop, name, replacements):
+        count = len(collect_all(loop, name, replacements))
+        loop.condition = rewrite_expression(loop.condition, name, replacements)
+        for inner in walk_statements(loop.body):
+            for node, attr in statement_expressions(inner):
+                setattr(node, attr, rewrite_expression(getattr(node, attr), name, replacements))
+        return count
+
+
+def collect_all(loop, name, replacements):
+    """Every `name % K` node in the loop whose K has a shadow variable."""
+    found = []
+
+    def visit(node):
+        if isinstance(node, BinOp):
+            if isinstance(node.left, Var) and node.left.name == name and node.op == '%' \
+                    and isinstance(node.right, Num) and node.right.value in replacements:
+                found.append(node)
+            else:
+                visit(node.left)
+                visit(node.right)
+
+    visit(loop.condition)
+    for inner in walk_statements(loop.body):
+        for node, attr in statement_expressions(inner):
+            visit(getattr(node, attr))
+    return found
+
+
+def reduce_induction_variables(program):
+    """Apply induction-variable strength reduction to a program in place."""
+    return InductionVariableReducer().run(program.body)
@@ -0,0 +1,209 @@
+"""Lowering of multiply, divide and modulo by a constant.
+
+Each lowering returns the instruction records computing dest from src, or
+None when it needs more scratch registers than it was given. Sequences
+read src up to their last instruction and write dest only there, so dest
+may be src. Division and modulo truncate toward zero like C (and the
+hardware div): powers of two add a bias of |c| - 1 to negative dividends
+before shifting or masking, and other divisors use a multiply by a
+"magic" reciprocal (Hacker's Delight, chapter 10).
+
+lower() costs every applicable sequence, including the hardware
+instruction, with the scheduler's pipeline model and keeps the cheapest.
+"""
+from ir import instruction
+from optimizer import fits_imm16, wrap32
+from scheduler import estimate_cycles
+
+
+HARDWARE = {
+    '*': ("mult", "goldenpickaxe"),
+    '/': ("div", "goldenpickaxe"),
+    '%': ("div", "diamondpickaxe"),
+}
+
+
+def load_constant(reg, value):
+    """Instructions putting a 32-bit constant in reg (enderman alone takes 16 bits)."""
+    value = wrap32(value)
+    if fits_imm16(value):
+        return [instruction("enderman", reg, value)]
+    low = (value & 0xFFFF) - (0x10000 if value & 0x8000 else 0)
+    high = (((value - low) >> 16) + 0x8000 & 0xFFFF) - 0x8000
+    lines = [instruction("enderman", reg, high), instruction("piston", reg, reg, 16)]
+    if low:
+        lines.append(instruction("flint", reg, reg, low))
+    return lines
+
+
+def log2_exact(value):
+    """k when value == 2**k, else None."""
+    if value > 0 and value & (value - 1) == 0:
+        return value.bit_length() - 1
+    return None
+
+
+def magic_number(d):
+    """Multiplier M (unsigned 32-bit) and shift s for signed division by d >= 2."""
+    two31 = 1 << 31
+    anc = two31 - 1 - two31 % d
+    p = 31
+    q1, r1 = divmod(two31, anc)
+    q2, r2 = divmod(two31, d)
+    while True:
+        p += 1
+        q1, r1 = 2 * q1, 2 * r1
+        if r1 >= anc:
+            q1, r1 = q1 + 1, r1 - anc
+        q2, r2 = 2 * q2, 2 * r2
+        if r2 >= d:
+            q2, r2 = q2 + 1, r2 - d
+        delta = d - r2
+        if not (q1 < delta or (q1 == delta and r1 == 0)):
+            break
+    return (q2 + 1) & 0xFFFFFFFF, p - 32
+
+
+def hardware(op, dest, src, value, temps):
+    if not temps:
+        return None
+    first, move = HARDWARE[op]
+    return load_constant(temps[0], value) + [instruction(first, src, temps[0]), instruction(move, dest)]
+
+
+def multiply(dest, src, value, temps):
+    """x * c for c = 0, +-2**k, +-(2**a + 2**b) or +-(2**a - 2**b)."""
+    magnitude = abs(value)
+    if magnitude == 0:
+        return [instruction("enderman", dest, 0)]
+    negative = value < 0
+    k = log2_exact(magnitude)
+    if k is not None:
+        if k == 0:
+            return [instruction("mine", dest, "$zero", src)] if negative else [instruction("Teleport", dest, src)]
+        if not negative:
+            return [instruction("piston", dest, src, k)]
+        if not temps:
+            return None
+        return [instruction("piston", temps[0], src, k), instruction("mine", dest, "$zero", temps[0])]
+
+    low = (magnitude & -magnitude).bit_length() - 1
+    high = log2_exact(magnitude - (1 << low))
+    subtract = high is None
+    if subtract:
+        high = log2_exact(magnitude + (1 << low))
+        if high is None:
+            return None
+    needed = 1 if low == 0 else 2
+    if len(temps) < needed:
+        return None
+    lines = [instruction("piston", temps[0], src, high)]
+    low_reg = src
+    if low:
+        low_reg = temps[1]
+        lines.append(instruction("piston", low_reg, src, low))
+    if subtract:
+        first, second = (low_reg, temps[0]) if negative else (temps[0], low_reg)
+        return lines + [instruction("mine", dest, first, second)]
+    if negative:
+        return lines + [instruction("craft", temps[0], temps[0], low_reg),
+                        instruction("mine", dest, "$zero", temps[0])]
+    return lines + [instruction("craft", dest, temps[0], low_reg)]
+
+
+def bias(reg, src, k):
+    """Instructions leaving 2**k - 1 in reg when src is negative and 0 otherwise."""
+    if k == 1:
+        return [instruction("stickypiston", reg, src, 31)]
+    return [instruction("observer", reg, src, 31), instruction("stickypiston", reg, reg, 32 - k)]
+
+
+def divide(dest, src, value, temps):
+    """x / c truncating toward zero."""
+    magnitude = abs(value)
+    negative = value < 0
+    if magnitude == 1:
+        return [instruction("mine", dest, "$zero", src)] if negative else [instruction("Teleport", dest, src)]
+    k = log2_exact(magnitude)
+    if k is not None:
+        if not temps:
+            return None
+        t = temps[0]
+        lines = bias(t, src, k) + [instruction("craft", t, src, t)]
+        if negative:
+            return lines + [instruction("observer", t, t, k), instruction("mine", dest, "$zero", t)]
+        return lines + [instruction("observer", dest, t, k)]
+
+    if len(temps) < 2:
+        return None
+    multiplier, shift = magic_number(magnitude)
+    t, q = temps[0], temps[1]
+    lines = load_constant(t, multiplier) + [instruction("mult", src, t), instruction("diamondpickaxe", q)]
+    if multiplier & 0x80000000:
+        lines.append(instruction("craft", q, q, src))
+    if shift:
+        lines.append(instruction("observer", q, q, shift))
+    # Round negative quotients up toward zero
+    lines.append(instruction("stickypiston", t, src, 31))
+    if negative:
+        return lines + [instruction("craft", q, q, t), instruction("mine", dest, "$zero", q)]
+    return lines + [instruction("craft", dest, q, t)]
+
+
+def modulo(dest, src, value, temps):
+    """x % c with the sign of x, as C and the hardware div compute it."""
+    magnitude = abs(value)
+    if magnitude == 1:
+        return [instruction("enderman", dest, 0)]
+    k = log2_exact(magnitude)
+    if k is not None:
+        mask = magnitude - 1
+        needed = 2 if mask <= 0xFFFF else 3
+        if len(temps) < needed:
+            return None
+        t, u = temps[0], temps[1]
+        lines = bias(t, src, k) + [instruction("craft", u, src, t)]
+        if mask <= 0xFFFF:
+            lines.append(instruction("repeater", u, u, mask))
+        else:
+            lines += load_constant(temps[2], mask) + [instruction("comparator", u, u, temps[2])]
+        return lines + [instruction("mine", dest, u, t)]
+
+    # x - (x / c) * c
+    if len(temps) < 3:
+        return None
+    q = temps[0]
+    lines = divide(q, src, magnitude, temps[1:])
+    product = multiply(temps[1], q, magnitude, temps[2:]) or hardware('*', temps[1], q, magnitude, temps[2:])
+    return lines + product + [instruction("mine", dest, src, temps[1])]
+
+
+LOWERINGS = {
+    '*': multiply,
+    '/': divide,
+    '%': modulo,
+}
+
+
+def cost(lines, pipeline):
+    return estimate_cycles(lines, pipeline)
+
+
+def lower(op, dest, src, value, temps, pipeline):
+    """Cheapest instructions computing dest = src op value, or None if no sequence fits in temps.
+
+    Returns (lines, lowered) where lowered is False when the hardware
+    multiply or divide won.
+    """
+    candidates = []
+    if value != 0 and -(1 << 31) <= value < (1 << 31):
+        lines = LOWERINGS[op](dest, src, value, temps)
+        if lines is not None:
+            candidates.append((cost(lines, pipeline), len(lines), True, lines))
+    lines = hardware(op, dest, src, value, temps)
+    if lines is not None:
+        candidates.append((cost(lines, pipeline), len(lines), False, lines))
+    if not candidates:
+        return None
+    _, _, lowered, lines = min(candidates, key=lambda candidate: candidate[:2])
+    return lines, lowered
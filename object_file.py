@@ -0,0 +1,117 @@
+"""Packed object file format shared by the assembler, disassembler and simulator.
+
+Layout (all multi-byte fields in the byte order named in the prefix):
+
+    prefix   magic b"MCBN", version (1 byte), byte order (1 byte: 0 big, 1 little), 2 reserved
+    header   text_base, data_base, text word count, data byte count, symbol count (u32 each)
+    text     text word count 32-bit instruction words
+    data     data bytes, zero-padded to a multiple of 4
+    symbols  per symbol: address (u32), name length (u16), UTF-8 name
+"""
+import struct
+import sys
+from array import array
+
+
+MAGIC = b"MCBN"
+VERSION = 1
+PREFIX = struct.Struct("4sBBH")
+BYTE_ORDERS = {"big": 0, "little": 1}
+WORD_TYPE = "I" if array("I").itemsize == 4 else "L"
+
+
+def header_struct(byteorder):
+    return struct.Struct((">" if byteorder == "big" else "<") + "5I")
+
+
+def symbol_struct(byteorder):
+    return struct.Struct((">" if byteorder == "big" else "<") + "IH")
+
+
+class ObjectFile:
+    def __init__(self, text, data, symbols, text_base=0, data_base=0, byteorder="big"):
+        self.text = text            # array of 32-bit instruction words
+        self.data = data            # bytes of the .data segment
+        self.symbols = symbols      # label -> absolute address
+        self.text_base = text_base
+        self.data_base = data_base
+        self.byteorder = byteorder
+
+
+def words_to_bytes(words, byteorder):
+    if not isinstance(words, array) or words.typecode != WORD_TYPE:
+        words = array(WORD_TYPE, words)
+    if sys.byteorder != byteorder:
+        words = array(WORD_TYPE, words)
+        words.byteswap()
+    return words.tobytes()
+
+
+def bytes_to_words(raw, byteorder):
+    words = array(WORD_TYPE)
+    words.frombytes(raw)
+    if sys.byteorder != byteorder:
+        words.byteswap()
+    return words
+
+
+def write_object(output_file, text, data, symbols, text_base=0, data_base=0, byteorder="big"):
+    """Write a packed object to an open binary file."""
+    output_file.write(PREFIX.pack(MAGIC, VERSION, BYTE_ORDERS[byteorder], 0))
+    output_file.write(header_struct(byteorder).pack(text_base, data_base, len(text), len(data), len(symbols)))
+    output_file.write(words_to_bytes(text, byteorder))
+    output_file.write(bytes(data) + bytes(-len(data) % 4))
+    entry = symbol_struct(byteorder)
+    for name, address in symbols.items():
+        encoded = name.encode("utf-8")
+        output_file.write(entry.pack(address & 0xFFFFFFFF, len(encoded)))
+        output_file.write(encoded)
+
+
+def is_object_file(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_object(path):
+    with open(path, "rb") as f:
+        raw = f.read()
+    return parse_object(raw)
+
+
+def read_header(raw):
+    """Decode the prefix and header of an object file held in any buffer.
+
+    Returns (byteorder, text_base, data_base, text word count, data size,
+    symbol count, offset of the first text word).
+    """
+    magic, version, order_flag, _ = PREFIX.unpack_from(raw, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a packed object file (bad magic)")
+    if version != VERSION:
+        raise ValueError(f"Unsupported object file version {version}")
+    byteorder = "little" if order_flag == BYTE_ORDERS["little"] else "big"
+
+    header = header_struct(byteorder)
+    fields = header.unpack_from(raw, PREFIX.size)
+    return (byteorder,) + fields + (PREFIX.size + header.size,)
+
+
+def parse_object(raw):
+    byteorder, text_base, data_base, text_count, data_size, symbol_count, offset = read_header(raw)
+
+    text = bytes_to_words(raw[offset:offset + text_count * 4], byteorder)
+    offset += text_count * 4
+    data = raw[offset:offset + data_size]
+    offset += data_size + (-data_size % 4)
+
+    symbols = {}
+    entry = symbol_struct(byteorder)
+    for _ in range(symbol_count):
+        address, length = entry.unpack_from(raw, offset)
+        offset += entry.size
+        symbols[raw[offset:offset + length].decode("utf-8")] = address
+        offset += length
+
+    return ObjectFile(text, data, symbols, text_base, data_base, byteorder)
+
@@ -0,0 +1,766 @@
+"""Optimization passes over the instructions in Compiler.text_section.
+
+Instructions are the records of ir.py: (op, operand, ...) tuples, with
+labels as (':', name) and comment lines as ('#', line). Each pass takes a
+list of records and returns the rewritten list.
+"""
+import stats
+from ir import record, instruction
+
+
+# Operand roles per mnemonic: d = register written, u = register read,
+# i = immediate, m = memory address, l = label
+SIGNATURES = {
+    "craft": "duu",
+    "mine": "duu",
+    "flint": "dui",
+    "enderman": "di",
+    "elytra": "dm",
+    "pickaxe": "um",
+    "Teleport": "du",
+    "TheNether": "dl",
+    "div": "uu",
+    "mult": "uu",
+    "diamondpickaxe": "d",
+    "goldenpickaxe": "d",
+    "piston": "dui",
+    "stickypiston": "dui",
+    "observer": "dui",
+    "repeater": "dui",
+    "comparator": "duu",
+    "emerald": "uul",
+    "lapis": "uul",
+    "steel": "uul",
+    "obsidian": "uul",
+    "craftingTable": "l",
+    "syscall": "",
+    "Bedrock": "",
+}
+
+IMPLICIT_DEFS = {
+    "div": ("$hi", "$lo"),
+    "mult": ("$hi", "$lo"),
+}
+
+IMPLICIT_USES = {
+    "diamondpickaxe": ("$hi",),
+    "goldenpickaxe": ("$lo",),
+    "syscall": ("$v0", "$a0"),
+    "Bedrock": ("$v0", "$a0"),
+}
+
+# Instructions whose only effect is writing their destination registers
+PURE_OPS = {"craft", "mine", "flint", "enderman", "elytra", "Teleport", "TheNether", "div", "mult",
+            "diamondpickaxe", "goldenpickaxe", "piston", "stickypiston", "observer", "repeater", "comparator"}
+# Register-immediate operations constant folding evaluates: sll, srl, sra, andi
+IMMEDIATE_OPS = {
+    "piston": lambda a, k: wrap32(a << k),
+    "stickypiston": lambda a, k: wrap32((a & 0xFFFFFFFF) >> k),
+    "observer": lambda a, k: a >> k,
+    "repeater": lambda a, k: a & k,
+}
+# Conditional branches and the comparison under which each is taken
+BRANCH_OPS = {
+    "emerald": lambda a, b: a != b,
+    "lapis": lambda a, b: a == b,
+    "steel": lambda a, b: a >= b,
+    "obsidian": lambda a, b: a < b,
+}
+JUMP_OPS = {"craftingTable"}
+CONTROL_OPS = set(BRANCH_OPS) | JUMP_OPS
+# Instructions whose operands are only registers and immediates
+REGISTER_OPS = {op for op, sig in SIGNATURES.items() if set(sig) <= set("dui")}
+# Branch taken exactly when the keyed one is not, on the same operands
+INVERSE_BRANCHES = {"emerald": "lapis", "lapis": "emerald", "steel": "obsidian", "obsidian": "steel"}
+
+IMM16_MIN = -32768
+IMM16_MAX = 32767
+
+
+def is_instruction(instr):
+    return instr[0] != '#' and instr[0] != ':'
+
+
+def signature(instr):
+    sig = SIGNATURES.get(instr[0])
+    if sig is None or len(sig) != len(instr) - 1:
+        return None
+    return sig
+
+
+def defs_uses(instr):
+    """Return (registers written, registers read) by an instruction."""
+    op = instr[0]
+    if op == '#' or op == ':':
+        return (), ()
+    sig = signature(instr)
+    if sig is None:
+        # Unknown instruction: assume it reads and writes every register operand
+        regs = tuple(operand for operand in instr[1:] if operand.startswith('$'))
+        return regs, regs
+    defs = [instr[k + 1] for k, role in enumerate(sig) if role == 'd' and instr[k + 1] != "$zero"]
+    uses = [instr[k + 1] for k, role in enumerate(sig) if role == 'u']
+    defs.extend(IMPLICIT_DEFS.get(op, ()))
+    uses.extend(IMPLICIT_USES.get(op, ()))
+    return defs, uses
+
+
+def use_positions(instr):
+    sig = signature(instr)
+    if sig is None:
+        return ()
+    return [k + 1 for k, role in enumerate(sig) if role == 'u']
+
+
+def is_pure(instr):
+    return instr[0] in PURE_OPS and signature(instr) is not None
+
+
+def count_instructions(code):
+    return sum(1 for instr in code if is_instruction(instr))
+
+
+def fits_imm16(value):
+    return IMM16_MIN <= value <= IMM16_MAX
+
+
+def wrap32(value):
+    value &= 0xFFFFFFFF
+    return value - 0x100000000 if value & 0x80000000 else value
+
+
+def c_divmod(a, b):
+    """Quotient and remainder with C's truncating division."""
+    quotient = abs(a) // abs(b)
+    if (a < 0) != (b < 0):
+        quotient = -quotient
+    return quotient, a - quotient * b
+
+
+# ---------------------------------------------------------------------------
+# Control flow
+# ---------------------------------------------------------------------------
+
+class BasicBlock:
+    __slots__ = ("start", "end", "successors", "live_in", "live_out")
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.successors = []
+        self.live_in = set()
+        self.live_out = set()
+
+
+def build_cfg(code):
+    """Split code into basic blocks; return the block list in program order."""
+    leaders = {0}
+    for i, instr in enumerate(code):
+        op = instr[0]
+        if op == ':':
+            leaders.add(i)
+        elif op in BRANCH_OPS or op in JUMP_OPS:
+            leaders.add(i + 1)
+    leaders = sorted(index for index in leaders if index < len(code))
+
+    blocks = [BasicBlock(start, end) for start, end in zip(leaders, leaders[1:] + [len(code)])]
+    block_of_label = {}
+    for index, block in enumerate(blocks):
+        for i in range(block.start, block.end):
+            if code[i][0] == ':':
+                block_of_label[code[i][1]] = index
+
+    for index, block in enumerate(blocks):
+        last = None
+        for i in range(block.end - 1, block.start - 1, -1):
+            if is_instruction(code[i]):
+                last = code[i]
+                break
+        falls_through = index + 1 < len(blocks)
+        if last is not None:
+            if last[0] in JUMP_OPS:
+                falls_through = False
+            if last[0] in JUMP_OPS or last[0] in BRANCH_OPS:
+                target = block_of_label.get(last[-1])
+                if target is not None:
+                    block.successors.append(target)
+        if falls_through:
+            block.successors.append(index + 1)
+    return blocks
+
+
+def compute_liveness(code, blocks):
+    """Iterative backward liveness of registers over the CFG."""
+    gen_kill = []
+    for block in blocks:
+        gen = set()
+        kill = set()
+        for i in range(block.end - 1, block.start - 1, -1):
+            defs, uses = defs_uses(code[i])
+            gen.difference_update(defs)
+            kill.update(defs)
+            gen.update(uses)
+        gen_kill.append((gen, kill))
+
+    changed = True
+    while changed:
+        changed = False
+        for index in range(len(blocks) - 1, -1, -1):
+            block = blocks[index]
+            live_out = set()
+            for successor in block.successors:
+                live_out |= blocks[successor].live_in
+            gen, kill = gen_kill[index]
+            live_in = gen | (live_out - kill)
+            if live_in != block.live_in or live_out != block.live_out:
+                block.live_in = live_in
+                block.live_out = live_out
+                changed = True
+
+
+# ---------------------------------------------------------------------------
+# Passes
+# ---------------------------------------------------------------------------
+
+def constant_folding(code):
+    """Evaluate instructions whose register operands hold known constants.
+
+    Constants are tracked within straight-line code and forgotten at labels.
+    Adds with one constant operand become addi (flint), fully constant
+    arithmetic becomes a single li (enderman), and branches on constants
+    become an unconditional jump or disappear.
+    """
+    result = []
+    consts = {"$zero": 0}
+    for instr in code:
+        op = instr[0]
+        if op == ':':
+            consts = {"$zero": 0}
+            result.append(instr)
+            continue
+        if op == '#':
+            result.append(instr)
+            continue
+
+        new = instr
+        if op == "craft" and signature(instr):
+            rd, rs, rt = instr[1:]
+            if rs in consts and rt in consts and fits_imm16(wrap32(consts[rs] + consts[rt])):
+                new = instruction("enderman", rd, wrap32(consts[rs] + consts[rt]))
+            elif rt in consts and rt != "$zero" and fits_imm16(consts[rt]):
+                new = instruction("flint", rd, rs, consts[rt])
+            elif rs in consts and rs != "$zero" and fits_imm16(consts[rs]):
+                new = instruction("flint", rd, rt, consts[rs])
+        elif op == "mine" and signature(instr):
+            rd, rs, rt = instr[1:]
+            if rs in consts and rt in consts and fits_imm16(wrap32(consts[rs] - consts[rt])):
+                new = instruction("enderman", rd, wrap32(consts[rs] - consts[rt]))
+        elif op == "flint" and signature(instr):
+            rd, rs, imm = instr[1:]
+            if rs in consts and fits_imm16(wrap32(consts[rs] + int(imm))):
+                new = instruction("enderman", rd, wrap32(consts[rs] + int(imm)))
+        elif op in IMMEDIATE_OPS and signature(instr):
+            rd, rs, imm = instr[1:]
+            if rs in consts and fits_imm16(IMMEDIATE_OPS[op](consts[rs], int(imm))):
+                new = instruction("enderman", rd, IMMEDIATE_OPS[op](consts[rs], int(imm)))
+        elif op == "comparator" and signature(instr):
+            rd, rs, rt = instr[1:]
+            if rs in consts and rt in consts and fits_imm16(consts[rs] & consts[rt]):
+                new = instruction("enderman", rd, consts[rs] & consts[rt])
+        elif op == "Teleport" and signature(instr):
+            if instr[2] in consts:
+                new = instruction("enderman", instr[1], consts[instr[2]])
+        elif op == "diamondpickaxe" and signature(instr):
+            if "$hi" in consts:
+                new = instruction("enderman", instr[1], consts["$hi"])
+        elif op == "goldenpickaxe" and signature(instr):
+            if "$lo" in consts and fits_imm16(consts["$lo"]):
+                new = instruction("enderman", instr[1], consts["$lo"])
+        elif op in BRANCH_OPS and signature(instr):
+            a, b, label = instr[1:]
+            if a in consts and b in consts:
+                taken = BRANCH_OPS[op](consts[a], consts[b])
+                new = instruction("craftingTable", label) if taken else None
+            elif consts.get(a) == 0 or consts.get(b) == 0:
+                # Compare against $zero so the constant load can die
+                new = instruction(op, "$zero" if consts.get(a) == 0 else a, "$zero" if consts.get(b) == 0 else b, label)
+
+        if new is None:
+            continue
+        result.append(new)
+
+        defs, _ = defs_uses(new)
+        for reg in defs:
+            consts.pop(reg, None)
+        if new[0] == "enderman" and signature(new):
+            consts[new[1]] = int(new[2])
+        elif new[0] == "div" and signature(new):
+            a, b = new[1:]
+            if a in consts and b in consts and consts[b] != 0:
+                consts["$lo"], consts["$hi"] = c_divmod(consts[a], consts[b])
+        elif new[0] == "mult" and signature(new):
+            a, b = new[1:]
+            if a in consts and b in consts:
+                product = consts[a] * consts[b]
+                consts["$lo"], consts["$hi"] = wrap32(product), wrap32(product >> 32)
+    return result
+
+
+def copy_propagation(code):
+    """Replace reads of a move's destination with its source while both are unchanged."""
+    result = []
+    copies = {}
+    for instr in code:
+        op = instr[0]
+        if op == ':':
+            copies = {}
+            result.append(instr)
+            continue
+        if op == '#':
+            result.append(instr)
+            continue
+
+        positions = use_positions(instr)
+        if positions and copies:
+            operands = list(instr)
+            for k in positions:
+                operands[k] = copies.get(operands[k], operands[k])
+            instr = record(tuple(operands))
+
+        if op == "Teleport" and signature(instr) and instr[1] == instr[2]:
+            continue  # moving a register onto itself
+
+        defs, _ = defs_uses(instr)
+        for reg in defs:
+            copies.pop(reg, None)
+            for dest in [dest for dest, src in copies.items() if src == reg]:
+                del copies[dest]
+        if op == "Teleport" and signature(instr):
+            copies[instr[1]] = instr[2]
+        result.append(instr)
+    return result
+
+
+def redundant_load_elimination(code):
+    """Reuse a register that already holds a memory word instead of reloading it."""
+    result = []
+    holders = {}    # address -> register known to hold its value
+    for instr in code:
+        op = instr[0]
+        if op == ':':
+            holders = {}
+            result.append(instr)
+            continue
+        if op == '#':
+            result.append(instr)
+            continue
+
+        if op == "elytra" and signature(instr) and instr[2] in holders:
+            source = holders[instr[2]]
+            if source == instr[1]:
+                continue
+            instr = instruction("Teleport", instr[1], source)
+
+        if signature(instr) is None:
+            holders = {}
+        defs, _ = defs_uses(instr)
+        for reg in defs:
+            for address in [address for address, holder in holders.items() if holder == reg]:
+                del holders[address]
+
+        if op == "elytra" and signature(instr):
+            holders[instr[2]] = instr[1]
+        elif op == "pickaxe" and signature(instr):
+            holders[instr[2]] = instr[1]
+        result.append(instr)
+    return result
+
+
+def dead_store_elimination(code):
+    """Drop stores that no load can observe.
+
+    A store is dead when its address is never loaded anywhere in the
+    program, or when the same address is stored again later in the same
+    block with no load of it in between.
+    """
+    loaded = set()
+    for instr in code:
+        if instr[0] == "elytra" and signature(instr):
+            loaded.add(instr[2])
+        elif is_instruction(instr) and signature(instr) is None:
+            return code  # unknown instruction might read any address
+
+    dead = set()
+    pending = {}    # address -> index of the last store not yet observed
+    for i, instr in enumerate(code):
+        op = instr[0]
+        if op == ':' or op in BRANCH_OPS or op in JUMP_OPS:
+            pending = {}
+        elif op == "pickaxe" and signature(instr):
+            address = instr[2]
+            if address not in loaded:
+                dead.add(i)
+            else:
+                if address in pending:
+                    dead.add(pending[address])
+                pending[address] = i
+        elif op == "elytra" and signature(instr):
+            pending.pop(instr[2], None)
+
+    return [instr for i, instr in enumerate(code) if i not in dead]
+
+
+def dead_code_elimination(code):
+    """Remove unreachable blocks and pure instructions whose results are never read."""
+    blocks = build_cfg(code)
+    if not blocks:
+        return code
+
+    reachable = set()
+    pending = [0]
+    while pending:
+        index = pending.pop()
+        if index not in reachable:
+            reachable.add(index)
+            pending.extend(blocks[index].successors)
+
+    compute_liveness(code, blocks)
+
+    keep = [True] * len(code)
+    for index, block in enumerate(blocks):
+        if index not in reachable:
+            for i in range(block.start, block.end):
+                if code[i][0] != '#':
+                    keep[i] = False
+            continue
+        live = set(block.live_out)
+        for i in range(block.end - 1, block.start - 1, -1):
+            instr = code[i]
+            defs, uses = defs_uses(instr)
+            if is_pure(instr) and defs and not live.intersection(defs):
+                keep[i] = False
+                continue
+            live.difference_update(defs)
+            live.update(uses)
+
+    return [instr for i, instr in enumerate(code) if keep[i]]
+
+
+def next_instruction(code, i):
+    """Index of the first instruction at or after i, skipping labels and comments."""
+    while i < len(code) and (code[i][0] == ':' or code[i][0] == '#'):
+        i += 1
+    return i
+
+
+def is_control(instr):
+    return instr[0] in CONTROL_OPS and signature(instr) is not None
+
+
+def pinned_labels(code):
+    """Labels named by anything but the target of a branch or jump; they are left alone."""
+    labels = {instr[1] for instr in code if instr[0] == ':'}
+    pinned = set()
+    for instr in code:
+        op = instr[0]
+        if op in REGISTER_OPS and signature(instr) or op == ':' or op == '#':
+            continue
+        pinned.update(instr[1:-1] if is_control(instr) else instr[1:])
+    return pinned & labels
+
+
+def label_aliases(code):
+    """Map each label to the first label of the run it stands in (comments may sit between)."""
+    aliases = {}
+    first = None
+    for instr in code:
+        if instr[0] == ':':
+            first = first or instr[1]
+            aliases[instr[1]] = first
+        elif instr[0] != '#':
+            first = None
+    return aliases
+
+
+def labels_between(code, i, j):
+    """Labels among code[i:j]."""
+    return {code[k][1] for k in range(i, j) if code[k][0] == ':'}
+
+
+def thread_targets(code):
+    """Point every branch and jump past labels that only jump elsewhere.
+
+    Targets are first renamed to the first label of their run, then chased
+    through blocks whose first instruction is an unconditional jump.
+    """
+    aliases = label_aliases(code)
+    position = {instr[1]: i for i, instr in enumerate(code) if instr[0] == ':'}
+
+    def final_target(label):
+        seen = set()
+        while label in position and label not in seen:
+            seen.add(label)
+            j = next_instruction(code, position[label])
+            if j == len(code) or code[j][0] not in JUMP_OPS or not is_control(code[j]):
+                break
+            label = aliases.get(code[j][-1], code[j][-1])
+        return label
+
+    result = []
+    for instr in code:
+        if instr[0] in CONTROL_OPS and is_control(instr):
+            target = final_target(aliases.get(instr[-1], instr[-1]))
+            if target != instr[-1]:
+                stats.count("optimizer.jumps_threaded")
+                instr = record(instr[:-1] + (target,))
+        result.append(instr)
+    return result
+
+
+def simplify_branches(code):
+    """Drop branches and jumps to the next instruction and invert branches over a jump.
+
+        obsidian $t0, $t1, L1          steel $t0, $t1, L2
+        craftingTable L2        ->   L1:
+      L1:
+    """
+    result = []
+    skip = None
+    for i, instr in enumerate(code):
+        if i == skip:
+            continue
+        if instr[0] in CONTROL_OPS and is_control(instr):
+            j = next_instruction(code, i + 1)
+            if instr[-1] in labels_between(code, i + 1, j):
+                continue    # falls through to its own target
+            if (instr[0] in BRANCH_OPS and j < len(code) and code[j][0] in JUMP_OPS
+                    and is_control(code[j]) and not labels_between(code, i + 1, j)):
+                k = next_instruction(code, j + 1)
+                if instr[-1] in labels_between(code, j + 1, k):
+                    result.append(record((INVERSE_BRANCHES[instr[0]],) + instr[1:-1] + (code[j][-1],)))
+                    skip = j
+                    stats.count("optimizer.branches_inverted")
+                    continue
+        result.append(instr)
+    return result
+
+
+def remove_unreachable(code, pinned):
+    """Drop code no path from the entry (or a pinned label) reaches, and labels nothing branches to."""
+    position = {instr[1]: i for i, instr in enumerate(code) if instr[0] == ':'}
+    reached = [False] * len(code)
+    pending = [0] + [position[label] for label in pinned if label in position]
+    targets = set()
+    while pending:
+        i = pending.pop()
+        while i < len(code) and not reached[i]:
+            reached[i] = True
+            instr = code[i]
+            if instr[0] in CONTROL_OPS and is_control(instr):
+                targets.add(instr[-1])
+                if instr[-1] in position:
+                    pending.append(position[instr[-1]])
+                if instr[0] in JUMP_OPS:
+                    break
+            i += 1
+    return [instr for i, instr in enumerate(code)
+            if instr[0] == '#' or reached[i] and (instr[0] != ':' or instr[1] in targets or instr[1] in pinned)]
+
+
+def jump_threading(code):
+    """Clean up the control flow that nested ifs and loops leave behind.
+
+    Each construct places its own labels, so nested code ends up with runs
+    of labels, branches to jumps and jumps to the next line. Repeat to a
+    fixed point: thread branches and jumps through blocks that only jump on,
+    drop jumps to the next instruction, invert a branch that skips over a
+    jump, and remove unreachable blocks and labels nothing targets.
+    """
+    pinned = pinned_labels(code)
+    while True:
+        new_code = remove_unreachable(simplify_branches(thread_targets(code)), pinned)
+        if new_code == code:
+            return code
+        code = new_code
+
+
+def find_loops(code):
+    """Return (header index, back-edge index) of each loop, innermost first.
+
+    Codegen lays loops out contiguously, so a loop is the span from a label
+    to the last branch or jump back to it.
+    """
+    label_index = {}
+    back_edge = {}
+    for i, instr in enumerate(code):
+        op = instr[0]
+        if op == ':':
+            label_index[instr[1]] = i
+        elif (op in BRANCH_OPS or op in JUMP_OPS) and instr[-1] in label_index:
+            back_edge[instr[-1]] = i
+    loops = [(label_index[label], end) for label, end in back_edge.items()]
+    loops.sort(key=lambda loop: loop[1] - loop[0])
+    return loops
+
+
+def count_control_flow(code):
+    """Branches, jumps and labels in code."""
+    return sum(1 for instr in code if instr[0] == ':' or instr[0] in BRANCH_OPS or instr[0] in JUMP_OPS)
+
+
+def count_loop_instructions(code):
+    return sum(count_instructions(code[start:end + 1]) for start, end in find_loops(code))
+
+
+def loop_entries(code):
+    """Map each label to the indices of the branches and jumps that target it."""
+    entries = {}
+    for i, instr in enumerate(code):
+        if instr[0] in BRANCH_OPS or instr[0] in JUMP_OPS:
+            entries.setdefault(instr[-1], []).append(i)
+    return entries
+
+
+def invariant_instructions(code, header, end, blocks, block_at, entries):
+    """Indices of the invariant instructions of the loop code[header..end].
+
+    An instruction is hoisted when it is pure, none of its operands are
+    written inside the loop, its destination is written only by it, and the
+    destination is dead on entry to the loop and after it exits. blocks
+    carry liveness for the current code; block_at maps a block's start
+    index to its position in blocks.
+    """
+    if any(not header <= i <= end for i in entries.get(code[header][1], ())):
+        return []       # the header is entered from elsewhere; no single preheader
+
+    def_count = {}
+    stored = set()
+    for i in range(header, end + 1):
+        instr = code[i]
+        if is_instruction(instr) and signature(instr) is None:
+            return []
+        if instr[0] == "pickaxe":
+            stored.add(instr[2])
+        for reg in defs_uses(instr)[0]:
+            def_count[reg] = def_count.get(reg, 0) + 1
+
+    first = block_at[header]
+    live_outside = set(blocks[first].live_in)
+    index = first
+    while index < len(blocks) and blocks[index].start <= end:
+        for successor in blocks[index].successors:
+            if not header <= blocks[successor].start <= end:
+                live_outside |= blocks[successor].live_in
+        index += 1
+
+    hoisted = []
+    for i in range(header, end + 1):
+        instr = code[i]
+        if not is_pure(instr) or instr[0] in ("div", "diamondpickaxe"):
+            continue
+        if instr[0] == "elytra" and instr[2] in stored:
+            continue
+        defs, uses = defs_uses(instr)
+        if any(def_count.get(reg, 0) != 1 or reg in live_outside for reg in defs):
+            continue
+        if any(reg in def_count for reg in uses):
+            continue
+        hoisted.append(i)
+    return hoisted
+
+
+def loop_invariant_code_motion(code):
+    """Hoist loop-invariant instructions into each loop's preheader.
+
+    Each sweep computes liveness once and hoists from every loop that does
+    not enclose a loop already changed in that sweep; hoisting leaves
+    liveness outside the loop untouched, so the decisions stay valid. The
+    sweeps repeat so code hoisted out of an inner loop can leave the outer
+    one too.
+    """
+    changed = True
+    while changed:
+        changed = False
+        blocks = build_cfg(code)
+        compute_liveness(code, blocks)
+        block_at = {block.start: index for index, block in enumerate(blocks)}
+        entries = loop_entries(code)
+
+        moves = {}
+        moved = set()
+        for header, end in find_loops(code):
+            if any(header <= other <= end for other in moves):
+                continue
+            hoisted = invariant_instructions(code, header, end, blocks, block_at, entries)
+            if hoisted:
+                moves[header] = hoisted
+                moved.update(hoisted)
+
+        if moves:
+            changed = True
+            new_code = []
+            for i, instr in enumerate(code):
+                if i in moves:
+                    new_code.extend(code[j] for j in moves[i])
+                if i not in moved:
+                    new_code.append(instr)
+            code = new_code
+    return code
+
+
+PASSES = {
+    "loop-invariant": loop_invariant_code_motion,
+    "jump-threading": jump_threading,
+    "constant-folding": constant_folding,
+    "copy-propagation": copy_propagation,
+    "redundant-load": redundant_load_elimination,
+    "dead-store": dead_store_elimination,
+    "dead-code": dead_code_elimination,
+}
+
+# Passes run at each -O level; level 2 repeats its pipeline to a fixed point
+PIPELINES = {
+    0: [],
+    1: ["constant-folding", "copy-propagation", "dead-code", "jump-threading"],
+    # Jump threading runs after loop-invariant: merging a loop header with the
+    # label before it would give the loop a second entry and no preheader
+    2: ["constant-folding", "redundant-load", "copy-propagation", "dead-store", "dead-code",
+        "loop-invariant", "jump-threading"],
+}
+
+# Passes that move rather than delete instructions report what they took out of
+# loops; jump threading reports the branches, jumps and labels it removed
+PASS_METRICS = {
+    "loop-invariant": count_loop_instructions,
+    "jump-threading": count_control_flow,
+}
+MAX_ROUNDS = 4
+
+
+def optimize_code(code, opt_level):
+    """Run the pipeline for opt_level over a list of records.
+
+    Returns (optimized records, report) where report maps each pass name to
+    the number of instructions it removed.
+    """
+    pipeline = PIPELINES.get(opt_level, PIPELINES[max(PIPELINES)])
+    report = {name: 0 for name in pipeline}
+    if not pipeline:
+        return code, report
+
+    stats.count("optimizer.instructions_in", count_instructions(code))
+    rounds = MAX_ROUNDS if opt_level >= 2 else 1
+    for _ in range(rounds):
+        stats.count("optimizer.rounds")
+        before_round = code
+        for name in pipeline:
+            metric = PASS_METRICS.get(name, count_instructions)
+            before = metric(code)
+            with stats.phase(f"optimize.{name}"):
+                code = PASSES[name](code)
+            report[name] += before - metric(code)
+        if code == before_round:
+            break
+
+    stats.count("optimizer.instructions_out", count_instructions(code))
+    return code, report
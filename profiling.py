@@ -0,0 +1,142 @@
+"""Basic-block execution counters for compiled programs.
+
+With Compiler(instrument=True) every basic block the compiler opens (the
+program entry, each label it places and each if/else and loop body) starts
+by incrementing its own .word counter in .data:
+
+    elytra $k0, count_3
+    flint $k0, $k0, 1
+    pickaxe $k0, count_3
+
+$k0 is reserved for the kernel in the MIPS convention and never allocated
+by the compiler, so the increments clobber nothing the program uses. The
+counter map written next to the output records, for every counter, the
+line of the construct that opened the block and the lines of the
+statements whose code starts in it. After a run, a line's count is the
+largest count of the blocks it is recorded in.
+
+Usage: python profiling.py MAP COUNTS [--source FILE] [--top N]
+
+COUNTS is a JSON object of counter label -> value, such as the dump written
+by simulator.py --profile-dump; simulator.py --profile MAP prints the
+report directly.
+"""
+import sys
+import json
+import argparse
+
+from ir import instruction
+
+
+COUNTER_REGISTER = "$k0"
+
+
+class BlockCounter:
+    def __init__(self, label, kind, line):
+        self.label = label      # .data word holding the count
+        self.kind = kind        # entry, if-body, else-body, after-if, loop-header, ...
+        self.line = line        # source line of the construct that opened the block
+        self.lines = []         # statements whose code starts in the block
+
+
+def increment_instructions(label):
+    return [instruction("elytra", COUNTER_REGISTER, label),
+            instruction("flint", COUNTER_REGISTER, COUNTER_REGISTER, 1),
+            instruction("pickaxe", COUNTER_REGISTER, label)]
+
+
+def data_lines(counters):
+    return [f"{counter.label}: .word 0" for counter in counters]
+
+
+def write_counter_map(path, counters, source=None):
+    description = {
+        "source": source,
+        "counters": [{"label": counter.label, "kind": counter.kind, "line": counter.line,
+                      "lines": counter.lines} for counter in counters],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(description, f, indent=1)
+
+
+def read_counter_map(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_counts(symbols, read_word, counter_map):
+    """Counter label -> value, reading each counter's word at its symbol's address."""
+    counts = {}
+    for counter in counter_map["counters"]:
+        address = symbols.get(counter["label"])
+        if address is None:
+            raise ValueError(f"counter {counter['label']} is not in the program's symbols "
+                             f"(was it compiled with --instrument?)")
+        counts[counter["label"]] = read_word(address)
+    return counts
+
+
+def line_counts(counter_map, counts):
+    """Source line -> execution count."""
+    lines = {}
+    for counter in counter_map["counters"]:
+        value = counts.get(counter["label"], 0)
+        owned = counter["lines"] + ([counter["line"]] if counter["line"] is not None else [])
+        for line in owned:
+            lines[line] = max(lines.get(line, 0), value)
+    return lines
+
+
+def hotness_report(counter_map, counts, source_lines=None, top=None):
+    """Per-line execution counts, in source order or the top hottest lines."""
+    lines = line_counts(counter_map, counts)
+    if not lines:
+        return "Profile: no counters"
+    hottest = max(lines.values()) or 1
+    order = sorted(lines, key=lambda line: (-lines[line], line))[:top] if top else sorted(lines)
+    report = [f"Profile: {len(counter_map['counters'])} block counters, "
+              f"{sum(counts.values()):,} block entries",
+              f"{'line':>6} {'count':>12} {'%max':>6}"]
+    for line in order:
+        text = ""
+        if source_lines and 0 < line <= len(source_lines):
+            text = "  " + source_lines[line - 1].rstrip()
+        report.append(f"{line:>6} {lines[line]:>12,} {lines[line] * 100 / hottest:>5.0f}%{text}")
+    return "\n".join(report)
+
+
+def read_source_lines(path):
+    if not path:
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().splitlines()
+    except OSError:
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Turn a counter dump into a per-line hotness report")
+    parser.add_argument("counter_map", help="map written by compiler3.py --instrument")
+    parser.add_argument("counts", help="JSON object of counter label -> value")
+    parser.add_argument("--source", help="C source to show next to the counts (default: from the map)")
+    parser.add_argument("--top", type=int, default=None, help="only the N hottest lines")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        counter_map = read_counter_map(args.counter_map)
+        with open(args.counts, "r", encoding="utf-8") as f:
+            counts = json.load(f)
+    except FileNotFoundError as e:
+        print(f"Error: Could not find file '{e.filename}'")
+        return 1
+    source_lines = read_source_lines(args.source or counter_map.get("source"))
+    print(hotness_report(counter_map, counts, source_lines, args.top))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+from c_parser import Parser, VarDecl, Assign, While, If, Print, Num, Var, BinOp, expr_to_str
+from assembler import parse_string_literal
+
+
+COMPARISONS = {'==', '!=', '<', '>=', '>', '<='}
+WRAPPED_OPS = {'+', '-', '*'}
+
+# Helpers shared by every generated module: 32-bit two's complement wrap and
+# C division / remainder, which truncate toward zero unlike Python's // and %
+PRELUDE = '''\
+import sys
+
+
+def _div(a, b):
+    q = abs(a) // abs(b)
+    q = -q if (a < 0) != (b < 0) else q
+    return (q + 0x80000000 & 0xFFFFFFFF) - 0x80000000
+
+
+def _mod(a, b):
+    return a - b * (abs(a) // abs(b) * (-1 if (a < 0) != (b < 0) else 1))
+'''
+
+
+def python_name(name):
+    """Local variable holding C variable name (prefixed so it never clashes with Python)."""
+    return f"v_{name}"
+
+
+class PythonBackend:
+    """Lower a parsed C-subset program to Python source.
+
+    Every C variable becomes a local of a generated main(write) function,
+    so the translated program runs at Python speed and prints exactly what
+    the Minecraft-MIPS code does under the simulator, which makes it an
+    oracle for the MIPS path: +, - and * wrap to 32 bits, / and % truncate
+    toward zero, print_int and print_str write without a newline and a
+    division by zero stops the program with the simulator's message.
+
+    CPython allows only 20 statically nested blocks per function and each
+    C loop takes one, so main's body is not wrapped in a try: the callers
+    of main (run_program and the generated __main__ block) catch
+    ZeroDivisionError.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.lines = []
+        self.code = None
+        self.indent = 1
+        self.names = {}
+
+    def emit(self, line):
+        self.lines.append("    " * self.indent + line)
+
+    def compile(self, c_code, source_name="program.c", tokens=None):
+        self.reset()
+        program = Parser(c_code, tokens).parse_program()
+        self.collect_names(program.body)
+
+        self.compile_block(program.body)
+
+        header = [f"# Python translation of {source_name}", PRELUDE, "", "def main(write=sys.stdout.write):"]
+        if self.names:
+            header.append("    " + " = ".join(python_name(name) for name in self.names) + " = 0")
+        if not self.names and not self.lines:
+            header.append("    pass")
+        footer = ["", "", 'if __name__ == "__main__":', "    try:", "        main()",
+                  "    except ZeroDivisionError:", '        sys.stdout.write("Division by zero\\n")', ""]
+        source = "\n".join(header + self.lines + footer)
+        # Fail here rather than when the output is run
+        try:
+            self.code = compile(source, f"<{source_name}>", "exec")
+        except SyntaxError as e:
+            raise SyntaxError(f"the Python translation of {source_name} does not compile: {e.msg}") from None
+        return source
+
+    def collect_names(self, statements):
+        """Every variable the program mentions, in first-use order; all start at 0."""
+        for stmt in statements:
+            if isinstance(stmt, VarDecl):
+                self.names.setdefault(stmt.name)
+                if stmt.init is not None:
+                    self.collect_expression_names(stmt.init)
+            elif isinstance(stmt, Assign):
+                self.names.setdefault(stmt.target)
+                self.collect_expression_names(stmt.value)
+            elif isinstance(stmt, (While, If)):
+                self.collect_expression_names(stmt.condition)
+                self.collect_names(stmt.body)
+                if isinstance(stmt, If):
+                    self.collect_names(stmt.orelse)
+            elif isinstance(stmt, Print) and stmt.kind == 'int':
+                self.collect_expression_names(stmt.value)
+
+    def collect_expression_names(self, node):
+        if isinstance(node, Var):
+            self.names.setdefault(node.name)
+        elif isinstance(node, BinOp):
+            self.collect_expression_names(node.left)
+            self.collect_expression_names(node.right)
+
+    def expression(self, node):
+        """Python expression for the int value of node."""
+        if isinstance(node, Num):
+            return str(node.value) if node.value >= 0 else f"({node.value})"
+        if isinstance(node, Var):
+            return python_name(node.name)
+        if node.op in COMPARISONS or node.op in ('&&', '||'):
+            return f"int({self.condition(node)})"
+        left, right = self.expression(node.left), self.expression(node.right)
+        if node.op == '/':
+            return f"_div({left}, {right})"
+        if node.op == '%':
+            return f"_mod({left}, {right})"
+        if node.op in WRAPPED_OPS:
+            return f"((({left} {node.op} {right}) + 0x80000000 & 0xFFFFFFFF) - 0x80000000)"
+        raise SyntaxError(f"Unsupported operator '{node.op}' on line {node.line}")
+
+    def condition(self, node):
+        """Python expression for the truth of node."""
+        if isinstance(node, BinOp):
+            if node.op == '&&':
+                return f"({self.condition(node.left)} and {self.condition(node.right)})"
+            if node.op == '||':
+                return f"({self.condition(node.left)} or {self.condition(node.right)})"
+            if node.op in COMPARISONS:
+                return f"{self.expression(node.left)} {node.op} {self.expression(node.right)}"
+        return f"{self.expression(node)} != 0"
+
+    def compile_block(self, statements):
+        for stmt in statements:
+            self.compile_statement(stmt)
+
+    def compile_body(self, statements):
+        self.indent += 1
+        start = len(self.lines)
+        self.compile_block(statements)
+        if len(self.lines) == start:
+            self.emit("pass")
+        self.indent -= 1
+
+    def compile_statement(self, node):
+        if isinstance(node, VarDecl):
+            if node.init is not None:
+                self.emit(f"{python_name(node.name)} = {self.expression(node.init)}")
+        elif isinstance(node, Assign):
+            self.emit(f"{python_name(node.target)} = {self.expression(node.value)}")
+        elif isinstance(node, While):
+            self.emit(f"while {self.condition(node.condition)}:  # line {node.line}")
+            self.compile_body(node.body)
+        elif isinstance(node, If):
+            self.emit(f"if {self.condition(node.condition)}:  # line {node.line}")
+            self.compile_body(node.body)
+            if node.orelse:
+                self.emit("else:")
+                self.compile_body(node.orelse)
+        elif isinstance(node, Print):
+            if node.kind == 'str':
+                text = parse_string_literal(f'"{node.value}"').decode("utf-8")
+                self.emit(f"write({text!r})")
+            else:
+                self.emit(f"write(str({self.expression(node.value)}))  # print_int({expr_to_str(node.value)})")
+
+
+def load_program(c_code, source_name="program.c"):
+    """Compile C source to a Python code object defining main(write)."""
+    backend = PythonBackend()
+    backend.compile(c_code, source_name)
+    return backend.code
+
+
+def run_program(c_code, write, source_name="program.c"):
+    """Run C source through the Python backend, sending its output to write."""
+    namespace = {"__name__": "c_program"}
+    exec(load_program(c_code, source_name), namespace)
+    try:
+        namespace["main"](write)
+    except ZeroDivisionError:
+        write("Division by zero\n")
@@ -0,0 +1,186 @@
+from c_parser import VarDecl, Assign, While, If, Print, Var, BinOp
+
+
+# Registers that hold program variables for their whole live range. The
+# $t registers stay reserved for expression temporaries from get_temp_reg.
+VARIABLE_REGISTERS = ["$s0", "$s1", "$s2", "$s3", "$s4", "$s5", "$s6", "$s7"]
+
+
+class LiveInterval:
+    __slots__ = ("name", "start", "end", "first_ref", "needs_init")
+
+    def __init__(self, name, position):
+        self.name = name
+        self.start = position
+        self.end = position
+        self.first_ref = position
+        self.needs_init = True
+
+    def __repr__(self):
+        return f"LiveInterval({self.name}, {self.start}-{self.end})"
+
+
+def expression_vars(node, out):
+    """Collect the variable names read by an expression."""
+    if isinstance(node, Var):
+        out.add(node.name)
+    elif isinstance(node, BinOp):
+        expression_vars(node.left, out)
+        expression_vars(node.right, out)
+    return out
+
+
+class IntervalBuilder:
+    """Number statements in pre-order and compute each variable's live interval.
+
+    Positions match the order in which Compiler.compile_statement visits the
+    statements. Live ranges are over-approximated on that linear order:
+    an interval spans every position between the first and last reference,
+    is widened to cover any loop the variable is referenced in (values flow
+    around the back edge), and is widened to its top-level statement when
+    the first reference is not an unconditional definition, so the register
+    can be zeroed where the variable would otherwise read memory's zero.
+    """
+
+    def __init__(self):
+        self.position = 0
+        self.intervals = {}
+        self.loop_spans = []        # [start, end] of each loop, filled in as loops close
+        self.outer_loop = {}        # variable -> index of outermost loop referencing it
+        self.loop_stack = []
+        self.top_level_start = 0
+
+    def build(self, statements):
+        for stmt in statements:
+            self.top_level_start = self.position
+            self.visit(stmt, top_level=True)
+
+        for interval in self.intervals.values():
+            loop = self.outer_loop.get(interval.name)
+            if loop is not None:
+                start, end = self.loop_spans[loop]
+                interval.start = min(interval.start, start)
+                interval.end = max(interval.end, end)
+        return self.intervals
+
+    def reference(self, name, defines=False, reads_self=False, top_level=False):
+        interval = self.intervals.get(name)
+        if interval is None:
+            interval = LiveInterval(name, self.position)
+            self.intervals[name] = interval
+            if defines and top_level and not reads_self:
+                interval.needs_init = False
+            else:
+                interval.start = self.top_level_start
+        interval.end = self.position
+        if self.loop_stack and name not in self.outer_loop:
+            self.outer_loop[name] = self.loop_stack[0]
+
+    def visit(self, node, top_level=False):
+        position = self.position
+        self.position += 1
+
+        if isinstance(node, (VarDecl, Assign)):
+            target = node.name if isinstance(node, VarDecl) else node.target
+            value = node.init if isinstance(node, VarDecl) else node.value
+            if value is None:
+                return
+            reads = expression_vars(value, set())
+            for name in reads:
+                self.reference(name)
+            self.reference(target, defines=True, reads_self=target in reads, top_level=top_level)
+
+        elif isinstance(node, Print):
+            if node.kind == 'int':
+                for name in expression_vars(node.value, set()):
+                    self.reference(name)
+
+        elif isinstance(node, While):
+            loop = len(self.loop_spans)
+            self.loop_spans.append([position, position])
+            self.loop_stack.append(loop)
+            for name in expression_vars(node.condition, set()):
+                self.reference(name)
+            for stmt in node.body:
+                self.visit(stmt)
+            self.loop_stack.pop()
+            self.loop_spans[loop][1] = self.position - 1
+
+        elif isinstance(node, If):
+            for name in expression_vars(node.condition, set()):
+                self.reference(name)
+            for stmt in node.body:
+                self.visit(stmt)
+            for stmt in node.orelse:
+                self.visit(stmt)
+
+
+def linear_scan(intervals, registers=VARIABLE_REGISTERS):
+    """Assign registers to live intervals; return (assignment, spilled names).
+
+    Classic linear scan: walk intervals by start position, free registers of
+    intervals that ended strictly before, and when none is free spill
+    whichever interval ends last.
+    """
+    assignment = {}
+    spilled = []
+    free = list(reversed(registers))
+    active = []     # intervals holding a register, sorted by end
+
+    for interval in sorted(intervals, key=lambda iv: (iv.start, iv.end)):
+        while active and active[0].end < interval.start:
+            free.append(assignment[active.pop(0).name])
+
+        if free:
+            assignment[interval.name] = free.pop()
+        else:
+            victim = active[-1]
+            if victim.end > interval.end:
+                assignment[interval.name] = assignment.pop(victim.name)
+                spilled.append(victim.name)
+                active.pop()
+            else:
+                spilled.append(interval.name)
+                continue
+
+        active.append(interval)
+        active.sort(key=lambda iv: iv.end)
+
+    return assignment, spilled
+
+
+def allocate_registers(program, declared=None):
+    """Run interval construction and linear scan over a parsed program.
+
+    Returns (assignment, spilled, init_at) where init_at maps a statement
+    position to the registers that must be zeroed before that statement.
+    Only names in `declared` (when given) are considered.
+    """
+    intervals = IntervalBuilder().build(program.body)
+    if declared is not None:
+        intervals = {name: iv for name, iv in intervals.items() if name in declared}
+
+    assignment, spilled = linear_scan(intervals.values())
+
+    init_at = {}
+    for name, reg in assignment.items():
+        interval = intervals[name]
+        if interval.needs_init:
+            init_at.setdefault(interval.start, []).append(reg)
+    return assignment, spilled, init_at
+
+
+def declared_names(program):
+    """Return the names declared anywhere in the program."""
+    names = set()
+    pending = list(program.body)
+    while pending:
+        node = pending.pop()
+        if isinstance(node, VarDecl):
+            names.add(node.name)
+        elif isinstance(node, While):
+            pending.extend(node.body)
+        elif isinstance(node, If):
+            pending.extend(node.body)
+            pending.extend(node.orelse)
+    return names
@@ -0,0 +1,293 @@
+"""Pipeline-aware instruction scheduling over ir.py instruction records.
+
+The machine is an in-order, single-issue pipeline described by a Pipeline:
+how many cycles after issue each kind of result can be consumed, how much
+earlier a branch needs its operands (branches compare in decode on the
+classic 5-stage MIPS) and how many cycles each branch or jump costs. A
+consumer issued before its operand is ready stalls until it is.
+
+schedule() reorders the movable instructions inside each basic block with a
+list scheduler so that independent work fills those stall cycles. Labels,
+branches, jumps and instructions with side effects (syscalls, unknown
+mnemonics) stay where they are; comment lines travel with the instruction
+that follows them.
+"""
+import json
+
+import stats
+from optimizer import is_instruction, is_pure, defs_uses, BRANCH_OPS, JUMP_OPS
+
+
+# Longest run of movable instructions scheduled as one unit; keeps the
+# scheduler linear in program size on long straight-line code
+SCHEDULE_WINDOW = 64
+
+
+class Pipeline:
+    """Latencies of an in-order pipeline, in cycles."""
+
+    FIELDS = ("alu_latency", "load_latency", "mult_latency", "div_latency",
+              "branch_operand_delay", "branch_penalty")
+
+    def __init__(self, name, alu_latency=1, load_latency=2, mult_latency=4, div_latency=32,
+                 branch_operand_delay=1, branch_penalty=1):
+        self.name = name
+        self.alu_latency = alu_latency                    # ALU result -> next consumer
+        self.load_latency = load_latency                  # elytra result -> consumer (load-use hazard)
+        self.mult_latency = mult_latency                  # mult -> goldenpickaxe reading $lo
+        self.div_latency = div_latency                    # div -> diamondpickaxe / goldenpickaxe
+        self.branch_operand_delay = branch_operand_delay  # extra wait when a branch reads the result
+        self.branch_penalty = branch_penalty              # cycles lost on every branch or jump
+
+    def latency(self, instr):
+        op = instr[0]
+        if op == "elytra":
+            return self.load_latency
+        if op == "div":
+            return self.div_latency
+        if op == "mult":
+            return self.mult_latency
+        return self.alu_latency
+
+    def operand_delay(self, instr):
+        return self.branch_operand_delay if instr[0] in BRANCH_OPS else 0
+
+    def describe(self):
+        return ", ".join(f"{field}={getattr(self, field)}" for field in self.FIELDS)
+
+
+PIPELINES = {
+    # Classic 5-stage MIPS with forwarding; branches resolve in decode
+    "classic5": Pipeline("classic5"),
+    # Branches resolve in execute: no extra operand wait but a longer flush
+    "late-branch": Pipeline("late-branch", branch_operand_delay=0, branch_penalty=2),
+    # No forwarding paths: every result waits for write-back
+    "no-forwarding": Pipeline("no-forwarding", alu_latency=3, load_latency=3, branch_operand_delay=0),
+}
+DEFAULT_PIPELINE = "classic5"
+
+
+def load_pipeline(spec):
+    """A Pipeline from a built-in name or a JSON file of Pipeline fields.
+
+    Fields missing from the file keep their classic5 values.
+    """
+    if spec is None:
+        return PIPELINES[DEFAULT_PIPELINE]
+    if spec in PIPELINES:
+        return PIPELINES[spec]
+    try:
+        with open(spec, 'r') as f:
+            description = json.load(f)
+    except FileNotFoundError:
+        raise ValueError(f"Unknown pipeline '{spec}' (built in: {', '.join(PIPELINES)})")
+    name = description.pop("name", spec)
+    unknown = set(description) - set(Pipeline.FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown pipeline field(s) in {spec}: {', '.join(sorted(unknown))}")
+    return Pipeline(name, **{field: int(value) for field, value in description.items()})
+
+
+# ---------------------------------------------------------------------------
+# Cycle estimate
+# ---------------------------------------------------------------------------
+
+def estimate_cycles(code, pipeline):
+    """Static cycle estimate for code run once top to bottom.
+
+    Every instruction issues one cycle after the previous one unless it
+    waits for an operand; each branch or jump adds the pipeline's branch
+    penalty. Operands are assumed ready at a label, whose predecessors are
+    not known here.
+    """
+    cycle = 0
+    ready = {}
+    for instr in code:
+        op = instr[0]
+        if op == ':':
+            ready.clear()
+            continue
+        if op == '#':
+            continue
+        defs, uses = defs_uses(instr)
+        issue = cycle + 1
+        delay = pipeline.operand_delay(instr)
+        for reg in uses:
+            issue = max(issue, ready.get(reg, 0) + delay)
+        cycle = issue
+        latency = pipeline.latency(instr)
+        for reg in defs:
+            ready[reg] = issue + latency
+        if op in BRANCH_OPS or op in JUMP_OPS:
+            cycle += pipeline.branch_penalty
+    return cycle
+
+
+# ---------------------------------------------------------------------------
+# List scheduling
+# ---------------------------------------------------------------------------
+
+def is_movable(instr):
+    """Instructions the scheduler may reorder: no side effects beyond registers and memory."""
+    if instr[0] == "pickaxe" or instr[0] == "elytra":
+        # Only literal addresses can be told apart
+        return len(instr) == 3 and instr[2].lstrip('-').isdigit()
+    return is_pure(instr)
+
+
+def dependences(instrs, pipeline):
+    """For each instruction, the (earlier index, latency) pairs it must follow."""
+    preds = [[] for _ in instrs]
+    last_def = {}
+    readers = {}
+    last_store = {}
+    loads_since_store = {}
+    for j, instr in enumerate(instrs):
+        defs, uses = defs_uses(instr)
+        delay = pipeline.operand_delay(instr)
+        for reg in uses:
+            if reg in last_def:
+                i = last_def[reg]
+                preds[j].append((i, pipeline.latency(instrs[i]) + delay))
+        for reg in defs:
+            if reg in last_def:
+                preds[j].append((last_def[reg], 0))
+            for i in readers.get(reg, ()):
+                preds[j].append((i, 0))
+        for reg in uses:
+            readers.setdefault(reg, []).append(j)
+        for reg in defs:
+            last_def[reg] = j
+            readers[reg] = []
+
+        if instr[0] == "elytra":
+            address = instr[2]
+            if address in last_store:
+                preds[j].append((last_store[address], 0))
+            loads_since_store.setdefault(address, []).append(j)
+        elif instr[0] == "pickaxe":
+            address = instr[2]
+            if address in last_store:
+                preds[j].append((last_store[address], 0))
+            for i in loads_since_store.pop(address, ()):
+                preds[j].append((i, 0))
+            last_store[address] = j
+    return preds
+
+
+def issue_times(order, instrs, preds):
+    """Issue cycle of each instruction when issued in order, stalling on operands."""
+    issue = {}
+    cycle = 0
+    for j in order:
+        cycle = max([cycle + 1] + [issue[i] + latency for i, latency in preds[j]])
+        issue[j] = cycle
+    return cycle
+
+
+def list_schedule(instrs, preds, terminator):
+    """Order instrs so that ready instructions fill operand stalls.
+
+    Among the instructions whose predecessors have all issued, pick the one
+    that can issue soonest, preferring the longest latency path to the end
+    of the block and then source order. The terminator, if any, goes last.
+    """
+    count = len(instrs)
+    succs = [[] for _ in instrs]
+    for j, edges in enumerate(preds):
+        for i, latency in edges:
+            succs[i].append((j, latency))
+    height = [0] * count
+    for i in range(count - 1, -1, -1):
+        height[i] = max([latency + height[j] for j, latency in succs[i]], default=0)
+
+    waiting = [len(preds[j]) for j in range(count)]
+    ready = [j for j in range(count) if not waiting[j] and j != terminator]
+    issue = {}
+    order = []
+    cycle = 0
+    while ready:
+        best = None
+        for j in ready:
+            earliest = max([cycle + 1] + [issue[i] + latency for i, latency in preds[j]])
+            key = (earliest, -height[j], j)
+            if best is None or key < best[0]:
+                best = (key, j)
+        (cycle, _, _), j = best
+        ready.remove(j)
+        issue[j] = cycle
+        order.append(j)
+        for k, _ in succs[j]:
+            waiting[k] -= 1
+            if not waiting[k] and k != terminator:
+                ready.append(k)
+    if terminator is not None:
+        order.append(terminator)
+    return order
+
+
+def schedule_region(items, pipeline):
+    """Reorder one run of movable instructions, each carrying its leading comments.
+
+    items is a list of (comments, instruction); the last item may be a
+    branch or jump, which stays last. Returns the items in the new order, or
+    the original list when reordering would not save a cycle.
+    """
+    instrs = [instr for _, instr in items]
+    last = instrs[-1][0]
+    terminator = len(instrs) - 1 if last in BRANCH_OPS or last in JUMP_OPS else None
+    preds = dependences(instrs, pipeline)
+    if terminator is not None:
+        preds[terminator] = preds[terminator] + [(i, 0) for i in range(terminator)]
+    order = list_schedule(instrs, preds, terminator)
+    if issue_times(order, instrs, preds) >= issue_times(range(len(instrs)), instrs, preds):
+        return items
+    return [items[j] for j in order]
+
+
+def schedule(code, pipeline):
+    """Schedule every basic block of code; returns the new instruction list."""
+    result = []
+    items = []
+    comments = []
+
+    def flush():
+        if len(items) > 1:
+            stats.count("scheduler.regions")
+            for leading, instr in schedule_region(items, pipeline):
+                result.extend(leading)
+                result.append(instr)
+        else:
+            for leading, instr in items:
+                result.extend(leading)
+                result.append(instr)
+        items.clear()
+
+    for instr in code:
+        op = instr[0]
+        if op == '#':
+            comments.append(instr)
+            continue
+        if is_instruction(instr) and (is_movable(instr) or op in BRANCH_OPS or op in JUMP_OPS):
+            items.append((comments, instr))
+            comments = []
+            if op in BRANCH_OPS or op in JUMP_OPS or len(items) >= SCHEDULE_WINDOW:
+                flush()
+            continue
+        # Labels and side effects end the region and keep their place
+        flush()
+        result.extend(comments)
+        comments = []
+        result.append(instr)
+    flush()
+    result.extend(comments)
+    return result
+
+
+def schedule_code(code, pipeline):
+    """Schedule a list of records; returns (scheduled records, cycles before, cycles after)."""
+    before = estimate_cycles(code, pipeline)
+    scheduled = schedule(code, pipeline)
+    after = estimate_cycles(scheduled, pipeline)
+    stats.count("scheduler.cycles_saved", before - after)
+    return scheduled, before, after
@@ -0,0 +1,340 @@
+import sys
+import json
+import time
+import argparse
+from array import array
+
+from assembler import DATA_BASE, DATA_BYTEORDER, TEXT_BASE, assemble_program, op_codes, func_codes, memory_op_codes
+from object_file import is_object_file, read_object
+from disassembler import read_words
+from profiling import read_counter_map, read_counts, read_source_lines, hotness_report
+import stats
+
+
+# Internal operation numbers; run() tests them roughly in order of how often compiled code executes them
+LW, ADD, SW, ADDI, LI, BGE, BLT, JUMP, MOVE, BEQ, BNE, DIV, MFHI, SUB, MULT, MFLO, \
+    SLL, SRL, SRA, AND, ANDI, LA, SYSCALL, BEDWARS, HAPPYGHAST, STEVE, REDSTONE, UNKNOWN = range(28)
+
+OPCODE_OPS = {
+    "flint": ADDI,
+    "enderman": LI,
+    "TheNether": LA,
+    "steel": BGE,
+    "obsidian": BLT,
+    "lapis": BEQ,
+    "emerald": BNE,
+    "CraftingTable": JUMP,
+    "BedWars": BEDWARS,
+    "HappyGhast": HAPPYGHAST,
+    "Steve": STEVE,
+    "RedStone": REDSTONE,
+    "Bedrock": SYSCALL,
+    "Repeater": ANDI,
+}
+MEMORY_OPS = {"elytra": LW, "pickaxe": SW}
+FUNCT_OPS = {
+    "craft": ADD,
+    "mine": SUB,
+    "elytra": DIV,
+    "DiamondPickAxe": MFHI,
+    "GoldenPickAxe": MFLO,
+    "Anvil": MULT,
+    "Piston": SLL,
+    "StickyPiston": SRL,
+    "Observer": SRA,
+    "Comparator": AND,
+    "BedWars": BEDWARS,
+    "Teleport": MOVE,
+}
+
+# 64-entry tables from the 6-bit opcode / funct fields to internal operations
+OPCODE_TABLE = [UNKNOWN] * 64
+for name, bits in op_codes.items():
+    if name in OPCODE_OPS:
+        OPCODE_TABLE[int(bits, 2)] = OPCODE_OPS[name]
+for name, bits in memory_op_codes.items():
+    OPCODE_TABLE[int(bits, 2)] = MEMORY_OPS[name]
+FUNCT_TABLE = [UNKNOWN] * 64
+for name, bits in func_codes.items():
+    FUNCT_TABLE[int(bits, 2)] = FUNCT_OPS[name]
+
+SIGNED_IMMEDIATE = {ADDI, LI, BGE, BLT, BEQ, BNE}
+
+HI, LO = 32, 33
+V0, A0 = 2, 4
+MEMORY_SIZE = 1 << 20
+
+if sys.byteorder != DATA_BYTEORDER:
+    raise ImportError("simulator.py needs a little-endian host for its word view of memory")
+
+# Simple timing model: one cycle per instruction plus these extra stalls
+DIV_LATENCY = 32
+MULT_LATENCY = 4
+TAKEN_BRANCH_PENALTY = 1
+
+
+def decode(word):
+    """Pre-decode a word into (operation, a, b, c) with operands ready to use."""
+    op = OPCODE_TABLE[word >> 26] if word >> 26 else FUNCT_TABLE[word & 63]
+    rs, rt, rd = word >> 21 & 31, word >> 16 & 31, word >> 11 & 31
+    imm = word & 0xFFFF
+    if op in SIGNED_IMMEDIATE and imm & 0x8000:
+        imm -= 0x10000
+    if op in (ADD, SUB, DIV, MULT, AND):
+        return op, rd, rs, rt
+    if op in (SLL, SRL, SRA):
+        return op, rd, rt, word >> 6 & 31
+    if op in (MOVE, BEDWARS):
+        return op, rd, rs, 0
+    if op == MFHI or op == MFLO:
+        return op, rd, 0, 0
+    if op == JUMP:
+        return op, (word & 0x3FFFFFF) >> 2, 0, 0
+    # I-type: branches compare rt (first operand) with rs and jump imm words past pc + 4
+    return op, rt, rs, imm
+
+
+class SimulationResult:
+    def __init__(self, steps, cycles, elapsed, exit_reason):
+        self.steps = steps
+        self.cycles = cycles
+        self.elapsed = elapsed
+        self.exit_reason = exit_reason
+
+    def instructions_per_second(self):
+        return self.steps / self.elapsed if self.elapsed else float("inf")
+
+
+class Simulator:
+    """Execute assembled Minecraft-MIPS code.
+
+    Registers live in an array of 34 signed 32-bit ints (the 32 general
+    registers plus hi and lo) and memory in a flat bytearray; the .data
+    segment is copied to data_base. Loads and stores go through a signed
+    32-bit word view of that bytearray, so they must be word aligned and
+    words are little-endian like the assembler's .word data.
+    """
+
+    def __init__(self, text, data=b"", text_base=TEXT_BASE, data_base=DATA_BASE,
+                 memory_size=MEMORY_SIZE, output=None, symbols=None):
+        self.program = [decode(word) for word in text]
+        self.text_base = text_base
+        self.symbols = symbols or {}
+        self.registers = array("i", [0] * 34)
+        size = max(memory_size, data_base + len(data))
+        self.memory = bytearray(size + (-size % 4))
+        self.memory[data_base:data_base + len(data)] = data
+        self.words = memoryview(self.memory).cast("i")
+        self.output = output if output is not None else sys.stdout
+
+    def read_word(self, address):
+        return self.words[address >> 2]
+
+    def read_string(self, address):
+        end = self.memory.index(0, address)
+        return self.memory[address:end].decode("utf-8", errors="replace")
+
+    def run(self, max_steps=None):
+        program = self.program
+        regs = self.registers
+        words = self.words
+        write = self.output.write
+        limit = max_steps if max_steps is not None else sys.maxsize
+        size = len(program)
+        base = self.text_base >> 2
+        pc = 0
+        steps = divides = multiplies = taken = 0
+        exit_reason = "end of program"
+        start = time.perf_counter()
+
+        while pc < size:
+            if steps >= limit:
+                exit_reason = "step limit"
+                break
+            op, a, b, c = program[pc]
+            steps += 1
+            pc += 1
+
+            if op == LW:
+                regs[a] = words[regs[b] + c >> 2]
+            elif op == ADD:
+                v = regs[b] + regs[c]
+                if not -0x80000000 <= v <= 0x7FFFFFFF:
+                    v = (v + 0x80000000 & 0xFFFFFFFF) - 0x80000000
+                regs[a] = v
+            elif op == SW:
+                words[regs[b] + c >> 2] = regs[a]
+            elif op == ADDI or op == LI:
+                v = regs[b] + c
+                if not -0x80000000 <= v <= 0x7FFFFFFF:
+                    v = (v + 0x80000000 & 0xFFFFFFFF) - 0x80000000
+                regs[a] = v
+            elif op == BGE:
+                if regs[a] >= regs[b]:
+                    pc += c
+                    taken += 1
+            elif op == BLT:
+                if regs[a] < regs[b]:
+                    pc += c
+                    taken += 1
+            elif op == JUMP:
+                pc = a - base
+                taken += 1
+            elif op == MOVE:
+                regs[a] = regs[b]
+            elif op == BEQ:
+                if regs[a] == regs[b]:
+                    pc += c
+                    taken += 1
+            elif op == BNE:
+                if regs[a] != regs[b]:
+                    pc += c
+                    taken += 1
+            elif op == DIV:
+                divides += 1
+                x, y = regs[b], regs[c]
+                if y == 0:
+                    write("Division by zero\n")
+                    exit_reason = "division by zero"
+                    break
+                q = abs(x) // abs(y)
+                if (x < 0) != (y < 0):
+                    q = -q
+                regs[HI] = x - q * y
+                # Only -2**31 / -1 overflows; it wraps back to -2**31
+                q = (q + 0x80000000 & 0xFFFFFFFF) - 0x80000000
+                regs[LO] = q
+                regs[a] = q
+            elif op == MFHI:
+                regs[a] = regs[HI]
+            elif op == SUB:
+                v = regs[b] - regs[c]
+                if not -0x80000000 <= v <= 0x7FFFFFFF:
+                    v = (v + 0x80000000 & 0xFFFFFFFF) - 0x80000000
+                regs[a] = v
+            elif op == MULT:
+                multiplies += 1
+                v = regs[b] * regs[c]
+                lo = (v + 0x80000000 & 0xFFFFFFFF) - 0x80000000
+                regs[LO] = lo
+                regs[HI] = v >> 32
+                regs[a] = lo
+            elif op == MFLO:
+                regs[a] = regs[LO]
+            elif op == SLL:
+                regs[a] = ((regs[b] << c) + 0x80000000 & 0xFFFFFFFF) - 0x80000000
+            elif op == SRL:
+                regs[a] = (((regs[b] & 0xFFFFFFFF) >> c) + 0x80000000 & 0xFFFFFFFF) - 0x80000000
+            elif op == SRA:
+                regs[a] = regs[b] >> c
+            elif op == AND:
+                regs[a] = regs[b] & regs[c]
+            elif op == ANDI:
+                regs[a] = regs[b] & c
+            elif op == LA:
+                regs[a] = regs[b] + c
+            elif op == SYSCALL:
+                service = regs[V0]
+                if service == 1:
+                    write(str(regs[A0]))
+                elif service == 4:
+                    write(self.read_string(regs[A0]))
+                elif service == 10:
+                    exit_reason = "exit"
+                    break
+                else:
+                    write(f"Unknown syscall: {service}\n")
+            elif op == BEDWARS:
+                v = regs[b] + 69
+                regs[a] = (v + 0x80000000 & 0xFFFFFFFF) - 0x80000000
+            elif op == HAPPYGHAST:
+                v = regs[a] + 42
+                regs[a] = (v + 0x80000000 & 0xFFFFFFFF) - 0x80000000
+                write(f"HappyGhast: {regs[a]}\n")
+            elif op == STEVE:
+                write("I am Steve\n")
+            elif op == REDSTONE:
+                write("\n")
+            else:
+                write(f"Unknown instruction at address {(base + pc - 1) * 4}\n")
+                exit_reason = "unknown instruction"
+                break
+            regs[0] = 0
+
+        elapsed = time.perf_counter() - start
+        cycles = (steps + divides * (DIV_LATENCY - 1) + multiplies * (MULT_LATENCY - 1)
+                  + taken * TAKEN_BRANCH_PENALTY)
+        stats.add_time("simulate.run", elapsed)
+        stats.count("simulator.instructions", steps)
+        stats.count("simulator.cycles", cycles)
+        stats.count("simulator.taken_branches", taken)
+        stats.count("simulator.divides", divides)
+        stats.count("simulator.multiplies", multiplies)
+        return SimulationResult(steps, cycles, elapsed, exit_reason)
+
+
+def load(path, output=None):
+    """Build a Simulator from a packed object, a text listing or assembly source."""
+    if is_object_file(path):
+        obj = read_object(path)
+        return Simulator(obj.text, obj.data, obj.text_base, obj.data_base, output=output, symbols=obj.symbols)
+    if path.endswith((".asm", ".mips", ".s")):
+        with open(path, "r", encoding="utf-8") as source:
+            program = assemble_program(source)
+        return Simulator(program.text, program.data, output=output, symbols=program.symbols)
+    return Simulator(read_words(path), output=output)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run an assembled Minecraft-MIPS program")
+    parser.add_argument("program", help="packed object file, '0'/'1' listing or .asm source")
+    parser.add_argument("--max-steps", type=int, default=None,
+                        help="stop after this many instructions")
+    parser.add_argument("--quiet", action="store_true",
+                        help="do not print the execution summary")
+    parser.add_argument("--profile", metavar="MAP",
+                        help="print per-line execution counts using the counter map "
+                             "from compiler3.py --instrument")
+    parser.add_argument("--profile-dump", metavar="PATH",
+                        help="write the counters named in the --profile map as JSON")
+    stats.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    stats.enable_from_args(args)
+    try:
+        with stats.phase("simulate.load"):
+            simulator = load(args.program)
+        result = simulator.run(args.max_steps)
+    except FileNotFoundError:
+        print(f"Error: Could not find file '{args.program}'")
+        return 1
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+
+    sys.stdout.flush()
+    if not args.quiet:
+        print(f"\n[{result.exit_reason}] {result.steps} instructions, {result.cycles} cycles "
+              f"in {result.elapsed:.3f}s ({result.instructions_per_second():,.0f} instructions/s)",
+              file=sys.stderr)
+    if args.profile:
+        try:
+            counter_map = read_counter_map(args.profile)
+            counts = read_counts(simulator.symbols, simulator.read_word, counter_map)
+        except (OSError, ValueError) as e:
+            print(f"Error: cannot read the profile: {e}")
+            return 1
+        if args.profile_dump:
+            with open(args.profile_dump, "w", encoding="utf-8") as f:
+                json.dump(counts, f, indent=1)
+        source_lines = read_source_lines(counter_map.get("source"))
+        print(hotness_report(counter_map, counts, source_lines), file=sys.stderr)
+    stats.publish_from_args(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
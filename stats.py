@@ -0,0 +1,124 @@
+"""Opt-in timing and counters shared by the compiler, assembler, disassembler and simulator.
+
+Instrumented code calls phase() around coarse steps and count() for
+events; both do nothing until enable() is called, so the cost when stats
+are off is one flag check. Tools expose this as --stats (a summary on
+stderr) and --stats-json PATH ("-" for stdout). Callers can also feed the
+numbers into their own metrics by registering a hook with add_hook(); every
+hook receives the snapshot dict when publish() runs at the end of a tool.
+"""
+import sys
+import json
+import time
+from contextlib import contextmanager
+
+
+_enabled = False
+_phases = {}        # phase name -> accumulated wall time in seconds
+_counters = {}      # counter name -> integer total
+_hooks = []
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    _phases.clear()
+    _counters.clear()
+
+
+def add_hook(hook):
+    """Register hook(snapshot) to be called by publish()."""
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+
+@contextmanager
+def phase(name):
+    """Accumulate the wall time spent inside the with block under name."""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases[name] = _phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def add_time(name, seconds):
+    """Accumulate time measured by the caller (for phases interleaved in one loop)."""
+    if _enabled:
+        _phases[name] = _phases.get(name, 0.0) + seconds
+
+
+def count(name, amount=1):
+    if _enabled:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def snapshot():
+    return {"phases": dict(_phases), "counters": dict(_counters)}
+
+
+def merge(data):
+    """Add a snapshot taken elsewhere (e.g. in a worker process) into the totals."""
+    for name, seconds in data["phases"].items():
+        _phases[name] = _phases.get(name, 0.0) + seconds
+    for name, value in data["counters"].items():
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def format_report(data=None):
+    data = data or snapshot()
+    # Phases may nest (compile.optimize contains the optimize.* passes)
+    lines = ["Phase timings:"]
+    for name, seconds in data["phases"].items():
+        lines.append(f"  {name:<32} {seconds * 1000:10.2f} ms")
+    lines.append("Counters:")
+    for name, value in sorted(data["counters"].items()):
+        lines.append(f"  {name:<32} {value:>13,}")
+    return "\n".join(lines)
+
+
+def publish(show=False, json_path=None):
+    """Deliver the collected stats: summary on stderr, JSON file and hooks."""
+    if not _enabled:
+        return
+    data = snapshot()
+    if show:
+        print(format_report(data), file=sys.stderr)
+    if json_path == "-":
+        json.dump(data, sys.stdout, indent=2)
+        print()
+    elif json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+    for hook in list(_hooks):
+        hook(data)
+
+
+def add_arguments(parser):
+    """Add the shared --stats / --stats-json options to an argparse parser."""
+    parser.add_argument("--stats", action="store_true",
+                        help="print per-phase timings and counters to stderr")
+    parser.add_argument("--stats-json", metavar="PATH",
+                        help="write timings and counters as JSON to PATH ('-' for stdout)")
+
+
+def enable_from_args(args):
+    if args.stats or args.stats_json:
+        enable()
+
+
+def publish_from_args(args):
+    publish(show=args.stats, json_path=args.stats_json)
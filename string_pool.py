@@ -0,0 +1,99 @@
+"""Layout of the program's string literals in the .data segment.
+
+Literals are laid out as one packed pool. A literal that is a suffix of
+another (including an exact duplicate after escape processing) gets no
+bytes of its own: its label points into the longer literal, which is
+split with .ascii so the label can sit at the right offset:
+
+    str_1: .ascii "all "
+    str_0: .asciiz "done\\n"
+
+Suffixes are found by sorting the literals by their reversed text; a
+literal is a suffix of another exactly when it is a suffix of the literal
+following it in that order. The pool ends with .align 2 so anything placed
+after it in .data starts on a word boundary.
+"""
+from assembler import parse_string_literal
+
+
+# Characters written back as escapes when splitting a literal
+ESCAPED = {"\n": "\\n", "\t": "\\t", "\r": "\\r", "\0": "\\0", "\\": "\\\\", '"': '\\"'}
+
+
+def literal_bytes(value):
+    """Bytes of a C string literal body, escapes processed as the assembler does."""
+    return parse_string_literal(f'"{value}"')
+
+
+def decode(value):
+    """Text of a C string literal body."""
+    return literal_bytes(value).decode("utf-8")
+
+
+def escape(text):
+    return "".join(ESCAPED.get(char, char) for char in text)
+
+
+def size(text):
+    """Bytes a literal occupies with its terminating NUL."""
+    return len(text.encode("utf-8")) + 1
+
+
+class PoolLayout:
+    def __init__(self, lines, literals, plain_bytes, pool_bytes):
+        self.lines = lines              # .data lines
+        self.literals = literals        # labels laid out
+        self.plain_bytes = plain_bytes  # one .asciiz per literal
+        self.pool_bytes = pool_bytes    # after suffix merging, before alignment
+
+    def bytes_saved(self):
+        return self.plain_bytes - self.pool_bytes
+
+
+def plain_layout(strings):
+    """One .asciiz per literal, as (label, value) pairs come."""
+    lines = [f'{label}: .asciiz "{value}"' for label, value in strings]
+    total = sum(size(decode(value)) for _, value in strings)
+    return PoolLayout(lines, len(strings), total, total)
+
+
+def merged_layout(strings):
+    """Suffix-merged pool of the (label, value) pairs, hosts in first-use order."""
+    labels = {}
+    plain_bytes = 0
+    for label, value in strings:
+        data = literal_bytes(value)
+        plain_bytes += len(data) + 1
+        labels.setdefault(data.decode("utf-8"), []).append(label)
+
+    # Each text's host is the longest literal it is a suffix of
+    by_suffix = sorted(labels, key=lambda text: text[::-1])
+    host = {}
+    for i in range(len(by_suffix) - 1, -1, -1):
+        text = by_suffix[i]
+        following = by_suffix[i + 1] if i + 1 < len(by_suffix) else None
+        host[text] = host[following] if following is not None and following.endswith(text) else text
+
+    members = {}
+    for text in labels:
+        members.setdefault(host[text], []).append(text)
+
+    lines = []
+    pool_bytes = 0
+    for root, texts in members.items():
+        offsets = {}
+        for text in texts:
+            offsets.setdefault(len(root) - len(text), []).extend(labels[text])
+        starts = sorted(offsets)
+        for k, start in enumerate(starts):
+            for label in offsets[start][:-1]:
+                lines.append(f"{label}:")
+            if k + 1 < len(starts):
+                lines.append(f'{offsets[start][-1]}: .ascii "{escape(root[start:starts[k + 1]])}"')
+            else:
+                lines.append(f'{offsets[start][-1]}: .asciiz "{escape(root[start:])}"')
+        pool_bytes += size(root)
+    if lines:
+        lines.append(".align 2")
+
+    return PoolLayout(lines, len(strings), plain_bytes, pool_bytes)